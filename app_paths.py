@@ -0,0 +1,11 @@
+# app_paths.py
+import os
+from pathlib import Path
+
+
+def get_app_dir(*parts):
+    """返回AnsPacker的本地数据目录（可用环境变量ANSPACKER_HOME覆盖），不存在时自动创建"""
+    base = os.environ.get("ANSPACKER_HOME") or str(Path.home() / ".anspacker")
+    path = Path(base).joinpath(*parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
@@ -0,0 +1,279 @@
+# async_packer.py
+import asyncio
+import subprocess
+import threading
+import time
+from packer_core import PackerCore
+from process_control import popen_group_kwargs, terminate_tree, terminate_tree_async
+from resource_sampler import ResourceSampler
+
+# 单行输出的上限（asyncio默认64KB，PyInstaller输出的模块列表可能更长）
+LINE_LIMIT = 1024 * 1024
+
+
+class _NullLog:
+    """没有提供日志回调时丢弃内部消息"""
+    
+    def log(self, message, level="info"):
+        pass
+
+
+class BuildResult:
+    """一次异步构建的结果"""
+    
+    def __init__(self, name, return_code, duration, artifacts, log_levels, cancelled=False,
+                 from_cache=False, report_path=None):
+        self.name = name
+        self.return_code = return_code
+        self.duration = duration
+        self.artifacts = artifacts
+        self.log_levels = log_levels
+        self.cancelled = cancelled
+        self.from_cache = from_cache
+        self.report_path = report_path
+    
+    @property
+    def success(self):
+        return self.return_code == 0 and not self.cancelled
+    
+    @property
+    def warnings(self):
+        return self.log_levels.get('warning', 0)
+    
+    @property
+    def errors(self):
+        return self.log_levels.get('error', 0)
+    
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'return_code': self.return_code,
+            'duration_s': round(self.duration, 3),
+            'artifacts': [str(path) for path in self.artifacts],
+            'warnings': self.warnings,
+            'errors': self.errors,
+            'cancelled': self.cancelled,
+            'from_cache': self.from_cache,
+            'report_path': str(self.report_path) if self.report_path else None
+        }
+    
+    def __repr__(self):
+        return f"BuildResult({self.name!r}, return_code={self.return_code}, duration={self.duration:.2f}s)"
+
+
+class AsyncBuild:
+    """正在运行的异步构建：async for 按行取得 (级别, 日志)，await wait() 得到 BuildResult
+    
+    构建前后的步骤（构建缓存、增量构建、spec缓存、多程序构建、UPX压缩、体积与启动分析、
+    构建报告、构建历史与日志文件）与同步构建共用 PackerCore 的实现，阻塞的部分在线程池中执行；
+    PyInstaller本身以asyncio子进程运行，使用常驻构建进程时由一个读取线程把输出逐行转给事件循环。
+    """
+    
+    def __init__(self, packer, config, log_callback):
+        self.packer = packer
+        self.config = config
+        self.log = log_callback or _NullLog()
+        self.run = None
+        self._lines = asyncio.Queue()
+        self._cancelled = threading.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    def __aiter__(self):
+        return self._iter_lines()
+    
+    async def _iter_lines(self):
+        while True:
+            item = await self._lines.get()
+            if item is None:
+                return
+            yield item
+    
+    @property
+    def process(self):
+        """当前正在运行的进程（asyncio子进程、常驻进程中的构建或启动分析的探针构建）"""
+        return self.run.process if self.run is not None else None
+    
+    async def wait(self):
+        """等待构建结束，返回 BuildResult"""
+        return await asyncio.shield(self._task)
+    
+    async def cancel(self):
+        """取消构建：结束整个进程组并移走未完成的输出，返回 BuildResult"""
+        await self._terminate()
+        return await self.wait()
+    
+    async def _terminate(self):
+        """记录停止请求并结束当前进程组，返回是否有进程被结束"""
+        self._cancelled.set()
+        process = self.run.request_stop() if self.run is not None else None
+        if process is None:
+            return False
+        if isinstance(process, asyncio.subprocess.Process):
+            if process.returncode is not None:
+                return False
+            await terminate_tree_async(process)
+            return True
+        if process.poll() is not None:
+            return False
+        await asyncio.to_thread(terminate_tree, process)
+        return True
+    
+    async def _start_process(self, run):
+        """启动PyInstaller：优先交给常驻构建进程，否则创建asyncio子进程；已取消时返回None"""
+        core = self.packer.core
+        if run.daemon_args is not None:
+            process = await asyncio.to_thread(run.attach, lambda: core.start_daemon_build(run.daemon_args, run.log))
+            if process is not None or run.cancelled.is_set():
+                return process
+        if run.cancelled.is_set():
+            return None
+        process = await asyncio.create_subprocess_exec(
+            *run.cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            limit=LINE_LIMIT,
+            **popen_group_kwargs()
+        )
+        if run.attach(lambda: process) is None:
+            # 创建子进程期间被取消
+            await terminate_tree_async(process)
+            return None
+        return process
+    
+    def _pump_lines(self, process, loop, lines):
+        """读取线程：把常驻进程中构建的输出逐行转给事件循环，结束时放入None"""
+        try:
+            for line in process.stdout:
+                loop.call_soon_threadsafe(lines.put_nowait, line)
+        except RuntimeError:
+            # 事件循环已关闭，没有人再读取
+            return
+        finally:
+            try:
+                loop.call_soon_threadsafe(lines.put_nowait, None)
+            except RuntimeError:
+                pass
+    
+    async def _read_lines(self, process):
+        """逐行读取构建输出"""
+        if not isinstance(process, asyncio.subprocess.Process):
+            lines = asyncio.Queue()
+            threading.Thread(
+                target=self._pump_lines, args=(process, asyncio.get_running_loop(), lines),
+                name="anspacker-async-reader", daemon=True
+            ).start()
+            while True:
+                line = await lines.get()
+                if line is None:
+                    return
+                yield line.strip()
+        while True:
+            try:
+                raw = await process.stdout.readline()
+            except ValueError:
+                # 超过LINE_LIMIT的行已被丢弃，继续读取之后的输出
+                self.run.log.log(f"构建输出中有一行超过 {LINE_LIMIT} 字节，已跳过", "warning")
+                continue
+            if not raw:
+                return
+            yield raw.decode('utf-8', errors='backslashreplace').strip()
+    
+    async def _run(self):
+        core = self.packer.core
+        run = self.run = core.open_run(self.config, self.log, self._cancelled)
+        start = time.perf_counter()
+        try:
+            # 缓存的指纹计算与复制、spec生成等是阻塞的磁盘操作，放到默认线程池中执行
+            if await asyncio.to_thread(core.prepare_run, run):
+                process = await self._start_process(run)
+                if process is None:
+                    run.log.log("打包已取消", "warning")
+                else:
+                    process_start = time.perf_counter()
+                    run.sampler = ResourceSampler(process.pid)
+                    run.sampler.start()
+                    read_start = time.perf_counter()
+                    async for line in self._read_lines(process):
+                        self._lines.put_nowait((run.feed(line), line))
+                    run.read_elapsed = time.perf_counter() - read_start
+                    if isinstance(process, asyncio.subprocess.Process):
+                        return_code = await process.wait()
+                    else:
+                        return_code = await asyncio.to_thread(process.wait)
+                    run.process_time = time.perf_counter() - process_start
+            
+                    if run.cancelled.is_set():
+                        run.return_code = return_code
+                        await asyncio.to_thread(core.discard_partial_output, run.config, run.log, run.started_at)
+                    else:
+                        await asyncio.to_thread(core.finish_run, run, return_code)
+            return await asyncio.to_thread(self._result, run, time.perf_counter() - start)
+        except BaseException:
+            # 任何异常（包括等待构建的任务被取消）都结束进程组，不留下在后台运行的构建
+            await asyncio.shield(self._abort(run))
+            raise
+        finally:
+            try:
+                # 写入构建历史、关闭日志文件（等待写入线程）都会阻塞，不能占用事件循环
+                await asyncio.shield(asyncio.to_thread(core.close_run, run))
+            finally:
+                self._lines.put_nowait(None)
+    
+    async def _abort(self, run):
+        """结束进程组并移走未完成的输出"""
+        if await self._terminate():
+            await asyncio.to_thread(self.packer.core.discard_partial_output, run.config, run.log, run.started_at)
+    
+    def _result(self, run, duration):
+        cancelled = run.cancelled.is_set()
+        artifacts = [] if cancelled or run.return_code != 0 else self.packer.core.get_current_artifacts(run.config)
+        return BuildResult(
+            self.packer.core.get_app_name(run.config), run.return_code, duration, artifacts,
+            run.classifier.summary(), cancelled=cancelled, from_cache=run.history['from_cache'],
+            report_path=run.report_path
+        )
+
+
+class AsyncPackerCore:
+    """基于asyncio子进程的打包接口，同一个事件循环中可同时运行多个构建
+    
+    PyInstaller的输出在事件循环中读取；每个构建另有资源采样与日志文件写入两个后台线程
+    （使用常驻构建进程时再加一个输出读取线程），构建前后的阻塞步骤在默认线程池中执行。
+    
+    与同步的 PackerCore 执行相同的构建流程（同一份配置得到相同的产物、报告与构建历史）。
+        
+        core = AsyncPackerCore()
+        result = await core.build(config)
+        
+        build = core.start(config)
+        async for level, line in build:
+            ...
+        result = await build.wait()
+    """
+    
+    def __init__(self, wheelhouse=None, index_url=None):
+        self.core = PackerCore(wheelhouse=wheelhouse, index_url=index_url)
+    
+    async def ensure_pyinstaller(self, log_callback=None):
+        """检查（必要时安装）PyInstaller，在线程池中执行"""
+        return await asyncio.to_thread(self.core.ensure_pyinstaller, log_callback or _NullLog())
+    
+    def start(self, config, log_callback=None):
+        """启动一个构建并立即返回 AsyncBuild（需在事件循环中调用）"""
+        return AsyncBuild(self, config, log_callback)
+    
+    async def build(self, config, log_callback=None):
+        """运行一个构建直到结束，返回 BuildResult；await 被取消时构建进程组一并结束"""
+        return await self.start(config, log_callback)._task
+    
+    async def build_many(self, configs, log_callback=None, limit=None):
+        """同时运行多个构建（limit 限制并发数），按输入顺序返回 BuildResult 列表"""
+        semaphore = asyncio.Semaphore(limit) if limit else None
+        
+        async def run(config):
+            if semaphore is None:
+                return await self.build(config, log_callback)
+            async with semaphore:
+                return await self.build(config, log_callback)
+        
+        return await asyncio.gather(*(run(config) for config in configs))
@@ -0,0 +1,321 @@
+# benchmarks/run_benchmarks.py
+"""AnsPacker 端到端基准测试
+
+用法:
+    python benchmarks/run_benchmarks.py                      # 全部基准，结果写入 benchmarks/results/
+    python benchmarks/run_benchmarks.py --skip-pack          # 跳过真实的PyInstaller打包
+    python benchmarks/run_benchmarks.py --compare old.json   # 与之前的结果对比
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from packer_core import PackerCore
+from log_pipeline import LogQueue
+from synthetic_projects import PROJECT_FACTORIES, generate_projects
+
+
+class NullLog:
+    """只计数不输出的日志接收端"""
+    
+    def __init__(self):
+        self.count = 0
+    
+    def log(self, message, level="info"):
+        self.count += 1
+
+
+def synthetic_log_lines(count, seed=0):
+    """生成与PyInstaller输出相似的日志行（包含带error/warn字样的模块路径等易误判的行）"""
+    rng = random.Random(seed)
+    templates = [
+        "{ms} INFO: Analyzing hidden import 'pkg{n}.module{n}'",
+        "{ms} INFO: Processing standard module hook 'hook-pkg{n}.py' from '/site-packages/PyInstaller/hooks'",
+        "{ms} INFO: Loading module hook 'hook-errorhandler{n}.py' from '/site-packages/_pyinstaller_hooks_contrib'",
+        "{ms} WARNING: Hidden import \"pkg{n}.missing\" not found!",
+        "{ms} INFO: Looking for dynamic libraries in /site-packages/warnings_lib{n}/core.so",
+        "{ms} DEBUG: Collecting data files for pkg{n}",
+        "{ms} ERROR: Failed to collect submodules for 'pkg{n}.broken'",
+        "  File \"/site-packages/pkg{n}/module.py\", line {n}, in <module>",
+        "{ms} INFO: Building PYZ (ZlibArchive) /build/PYZ-00.pyz completed successfully.",
+    ]
+    weights = [40, 20, 10, 8, 10, 5, 2, 2, 3]
+    lines = []
+    for i in range(count):
+        template = rng.choices(templates, weights)[0]
+        lines.append(template.format(ms=i, n=rng.randint(0, 999)))
+    return lines
+
+
+def measure(func, *args):
+    """运行func，返回 (结果, 耗时秒, tracemalloc峰值字节)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def bench_build_command(projects, iterations):
+    """build_command 构造耗时（每次调用的微秒数）"""
+    core = PackerCore()
+    results = {}
+    for name, config in projects.items():
+        start = time.perf_counter()
+        for _ in range(iterations):
+            cmd = core.build_command(config)
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            'us_per_call': elapsed * 1e6 / iterations,
+            'argv_length': len(cmd),
+            'argv_chars': sum(len(arg) + 1 for arg in cmd)
+        }
+    return results
+
+
+def bench_log_handling(line_count):
+    """日志处理吞吐：分类、队列、Tk文本控件（有显示环境时）"""
+    lines = synthetic_log_lines(line_count)
+    core = PackerCore()
+    results = {}
+    
+    def classify():
+        sink = NullLog()
+        for line in lines:
+            core._process_log_line(line, sink)
+        return sink.count
+    
+    _, elapsed, peak = measure(classify)
+    results['process_log_line'] = {
+        'lines': line_count,
+        'seconds': elapsed,
+        'lines_per_sec': line_count / elapsed,
+        'peak_bytes': peak
+    }
+    
+    def through_queue():
+        queue = LogQueue()
+        for line in lines:
+            core._process_log_line(line, queue)
+        drained = 0
+        while True:
+            batch = queue.drain()
+            if not batch:
+                break
+            drained += len(batch)
+        return drained
+    
+    _, elapsed, peak = measure(through_queue)
+    results['log_queue'] = {
+        'lines': line_count,
+        'seconds': elapsed,
+        'lines_per_sec': line_count / elapsed,
+        'peak_bytes': peak
+    }
+    
+    results['log_text_area'] = bench_log_text_area(lines, core)
+    return results
+
+
+def bench_log_text_area(lines, core):
+    """LogTextArea 批量渲染吞吐，没有显示环境时跳过"""
+    try:
+        import tkinter as tk
+        from gui import LogTextArea
+        root = tk.Tk()
+    except Exception as e:
+        return {'skipped': f"无可用的Tk显示环境: {e}"}
+    
+    try:
+        root.withdraw()
+        area = LogTextArea(root)
+        queue = LogQueue()
+        for line in lines:
+            core._process_log_line(line, queue)
+        
+        def render():
+            while True:
+                batch = queue.drain(area.batch_size)
+                if not batch:
+                    break
+                area.write_batch(batch)
+                root.update_idletasks()
+        
+        _, elapsed, peak = measure(render)
+        return {
+            'lines': len(lines),
+            'seconds': elapsed,
+            'lines_per_sec': len(lines) / elapsed,
+            'peak_bytes': peak,
+            'spilled_lines': area.model.spilled
+        }
+    finally:
+        root.destroy()
+
+
+def _tree_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def _children_max_rss_kb():
+    """子进程中的最大常驻内存（POSIX），不可用时返回None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+
+def bench_pack(projects, repeat):
+    """真实打包的总耗时、产物大小与峰值内存"""
+    core = PackerCore()
+    if not core.check_pyinstaller():
+        return {'skipped': "PyInstaller未安装"}
+    
+    results = {}
+    for name, config in projects.items():
+        runs = []
+        for _ in range(repeat):
+            sink = NullLog()
+            start = time.perf_counter()
+            return_code = core.run(config, sink)
+            elapsed = time.perf_counter() - start
+            runs.append({
+                'seconds': elapsed,
+                'return_code': return_code,
+                'log_lines': sink.count
+            })
+        dist_dir = Path(config['output_dir']) / "dist"
+        results[name] = {
+            'runs': runs,
+            'best_seconds': min(run['seconds'] for run in runs),
+            'output_bytes': _tree_size(dist_dir) if dist_dir.is_dir() else 0,
+            # ru_maxrss是到目前为止所有子进程的最大值，按项目顺序只增不减
+            'children_max_rss_kb': _children_max_rss_kb()
+        }
+    return results
+
+
+def environment():
+    """结果文件中记录的运行环境"""
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT, capture_output=True, text=True, timeout=5
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        revision = ""
+    
+    try:
+        from importlib import metadata
+        pyinstaller_version = metadata.version("pyinstaller")
+    except Exception:
+        pyinstaller_version = None
+    
+    return {
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'revision': revision,
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pyinstaller': pyinstaller_version
+    }
+
+
+def _flatten(data, prefix=""):
+    """把嵌套结果展开为 {路径: 数值}，用于对比"""
+    flat = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            flat.update(_flatten(value, f"{prefix}.{key}" if prefix else key))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        flat[prefix] = data
+    return flat
+
+
+def compare(baseline_path, results):
+    """与基线结果逐项对比，输出变化百分比"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = _flatten(json.load(f)['results'])
+    current = _flatten(results)
+    
+    print(f"与基线对比: {baseline_path}")
+    for key in sorted(current):
+        if key in baseline and baseline[key]:
+            change = (current[key] - baseline[key]) * 100 / baseline[key]
+            print(f"  {key:<60} {baseline[key]:>14.4g} -> {current[key]:>14.4g} ({change:+.1f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AnsPacker 基准测试")
+    parser.add_argument("--output", help="结果JSON路径（默认 benchmarks/results/<时间>.json）")
+    parser.add_argument("--workdir", help="合成项目目录（默认临时目录）")
+    parser.add_argument("--projects", nargs='*', choices=list(PROJECT_FACTORIES), help="只运行指定的合成项目")
+    parser.add_argument("--iterations", type=int, default=2000, help="build_command 重复次数")
+    parser.add_argument("--log-lines", type=int, default=100000, help="日志吞吐测试的行数")
+    parser.add_argument("--repeat", type=int, default=1, help="每个项目的打包次数")
+    parser.add_argument("--skip-pack", action="store_true", help="跳过真实打包")
+    parser.add_argument("--compare", help="与之前的结果文件对比")
+    args = parser.parse_args(argv)
+    
+    with tempfile.TemporaryDirectory(prefix="anspacker-bench-") as tmp:
+        workdir = Path(args.workdir or tmp)
+        workdir.mkdir(parents=True, exist_ok=True)
+        # 打包时的构建缓存写入独立目录，不影响本机缓存
+        os.environ.setdefault("ANSPACKER_HOME", str(workdir / "anspacker-home"))
+        
+        print(f"生成合成项目: {workdir}")
+        projects = generate_projects(workdir, args.projects)
+        
+        results = {}
+        print("基准: build_command 构造")
+        results['build_command'] = bench_build_command(projects, args.iterations)
+        print("基准: 日志处理吞吐")
+        results['log_handling'] = bench_log_handling(args.log_lines)
+        if not args.skip_pack:
+            print("基准: 完整打包")
+            results['pack'] = bench_pack(projects, args.repeat)
+        results['self_max_rss_kb'] = _self_max_rss_kb()
+    
+    output = Path(args.output) if args.output else (
+        Path(__file__).resolve().parent / "results" / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({'environment': environment(), 'results': results}, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入: {output}")
+    
+    if args.compare:
+        compare(args.compare, results)
+    return 0
+
+
+def _self_max_rss_kb():
+    """基准进程自身的最大常驻内存（POSIX），不可用时返回None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+if __name__ == "__main__":
+    sys.exit(main())
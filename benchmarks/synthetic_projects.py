@@ -0,0 +1,110 @@
+# benchmarks/synthetic_projects.py
+import os
+from pathlib import Path
+
+# 标准库中体量较大、钩子较多的模块，用于模拟"重依赖"项目
+HEAVY_STDLIB_IMPORTS = [
+    "asyncio", "concurrent.futures", "email.mime.multipart", "http.server",
+    "json", "logging.handlers", "multiprocessing", "sqlite3", "ssl",
+    "unittest", "urllib.request", "xml.dom.minidom", "xml.etree.ElementTree",
+    "zipfile", "decimal", "csv", "argparse", "pickle"
+]
+
+# 已安装时一并导入的第三方重量级包
+HEAVY_THIRD_PARTY_IMPORTS = ["numpy", "PIL", "requests", "yaml"]
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding='utf-8')
+
+
+def _base_config(main_file, output_dir, name):
+    """与 gather_config 结构一致的配置"""
+    return {
+        'main_file': str(main_file),
+        'icon_file': '',
+        'resources': [],
+        'output_dir': str(output_dir),
+        'name': name,
+        'onefile': False,
+        'noconsole': False,
+        'debug': False,
+        'clean': True,
+        'use_cache': False,
+        'incremental': False,
+        'extra_params': ''
+    }
+
+
+def make_small_script(root):
+    """只有一个脚本的最小项目"""
+    project = Path(root) / "small_script"
+    _write(project / "main.py", 'print("hello from small_script")\n')
+    (project / "out").mkdir(exist_ok=True)
+    return _base_config(project / "main.py", project / "out", "small_script")
+
+
+def make_many_modules(root, packages=10, modules_per_package=20):
+    """大量本地模块：packages个包，每个包modules_per_package个模块，互相导入"""
+    project = Path(root) / "many_modules"
+    imports = []
+    for p in range(packages):
+        pkg = project / f"pkg{p:02d}"
+        _write(pkg / "__init__.py", "")
+        for m in range(modules_per_package):
+            body = [f"VALUE = {p * modules_per_package + m}"]
+            if m > 0:
+                body.insert(0, f"from . import mod{m - 1:02d}")
+            body.append("def compute(x):\n    return x * VALUE\n")
+            _write(pkg / f"mod{m:02d}.py", "\n".join(body) + "\n")
+        imports.append(f"import pkg{p:02d}.mod{modules_per_package - 1:02d}")
+    _write(project / "main.py", "\n".join(imports) + '\nprint("many_modules ok")\n')
+    (project / "out").mkdir(exist_ok=True)
+    return _base_config(project / "main.py", project / "out", "many_modules")
+
+
+def make_many_resources(root, count=300, size=2048):
+    """数百个资源文件，分布在多级目录中"""
+    project = Path(root) / "many_resources"
+    resources = []
+    for i in range(count):
+        path = project / "assets" / f"group{i % 10}" / f"sub{i % 3}" / f"asset{i:04d}.bin"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(os.urandom(size))
+        resources.append(str(path))
+    _write(project / "main.py", 'print("many_resources ok")\n')
+    (project / "out").mkdir(exist_ok=True)
+    config = _base_config(project / "main.py", project / "out", "many_resources")
+    config['resources'] = resources
+    return config
+
+
+def make_heavy_imports(root):
+    """重量级导入：大量标准库模块，以及已安装的第三方大包"""
+    import importlib.util
+    
+    project = Path(root) / "heavy_imports"
+    third_party = [name for name in HEAVY_THIRD_PARTY_IMPORTS if importlib.util.find_spec(name)]
+    lines = [f"import {name}" for name in HEAVY_STDLIB_IMPORTS + third_party]
+    _write(project / "main.py", "\n".join(lines) + '\nprint("heavy_imports ok")\n')
+    (project / "out").mkdir(exist_ok=True)
+    return _base_config(project / "main.py", project / "out", "heavy_imports")
+
+
+PROJECT_FACTORIES = {
+    'small_script': make_small_script,
+    'many_modules': make_many_modules,
+    'many_resources': make_many_resources,
+    'heavy_imports': make_heavy_imports
+}
+
+
+def generate_projects(root, names=None):
+    """在root下生成合成项目，返回 {名称: 配置}"""
+    projects = {}
+    for name, factory in PROJECT_FACTORIES.items():
+        if names and name not in names:
+            continue
+        projects[name] = factory(root)
+    return projects
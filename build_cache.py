@@ -0,0 +1,191 @@
+# build_cache.py
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from app_paths import get_app_dir
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+def _tree_size(path):
+    """文件或目录的总字节数"""
+    path = Path(path)
+    if path.is_file():
+        return path.stat().st_size
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _link_or_copy(src, dst):
+    """优先硬链接（毫秒级恢复），跨分区等情况回退为复制"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _restore_tree(src, dst):
+    """把缓存中的文件/目录恢复到目标位置"""
+    if src.is_dir():
+        shutil.copytree(src, dst, copy_function=_link_or_copy)
+    else:
+        _link_or_copy(src, dst)
+
+
+def _remove_path(path):
+    """删除文件或目录"""
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path)
+    elif path.exists() or path.is_symlink():
+        path.unlink()
+
+
+class BuildCache:
+    """内容寻址的打包结果缓存：以输入指纹为键保存dist产物，按总大小做LRU淘汰
+    
+    恢复时尽量使用硬链接，恢复出的产物不应被原地修改。
+    """
+    
+    def __init__(self, root=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = Path(root) if root else get_app_dir("cache")
+        self.objects_dir = self.root / "objects"
+        self.index_path = self.root / "index.json"
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+    
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        index.setdefault('entries', {})
+        index.setdefault('stats', {'hits': 0, 'misses': 0, 'evictions': 0})
+        return index
+    
+    def _save_index(self, index):
+        # 先写临时文件再替换，避免中断时留下半个索引
+        tmp_path = self.index_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.index_path)
+    
+    def _entry_dir(self, key):
+        return self.objects_dir / key[:2] / key
+    
+    def restore(self, key, dist_dir):
+        """命中时把产物恢复到dist_dir并返回恢复的路径列表，未命中返回None"""
+        with self._lock:
+            index = self._load_index()
+            entry = index['entries'].get(key)
+            entry_dir = self._entry_dir(key)
+            if entry is None or not entry_dir.is_dir():
+                index['entries'].pop(key, None)
+                index['stats']['misses'] += 1
+                self._save_index(index)
+                return None
+            
+            dist_dir = Path(dist_dir)
+            dist_dir.mkdir(parents=True, exist_ok=True)
+            restored = []
+            for name in entry['artifacts']:
+                target = dist_dir / name
+                _remove_path(target)
+                _restore_tree(entry_dir / name, target)
+                restored.append(target)
+            
+            entry['last_used'] = time.time()
+            index['stats']['hits'] += 1
+            self._save_index(index)
+            return restored
+    
+    def store(self, key, artifacts, meta=None):
+        """保存一次成功构建的产物（dist中的文件或目录列表）"""
+        artifacts = [Path(p) for p in artifacts if Path(p).exists()]
+        if not artifacts:
+            return False
+        
+        with self._lock:
+            entry_dir = self._entry_dir(key)
+            tmp_dir = entry_dir.with_name(entry_dir.name + ".tmp")
+            if tmp_dir.exists():
+                shutil.rmtree(tmp_dir)
+            tmp_dir.mkdir(parents=True)
+            
+            # 缓存内保存独立副本，避免与dist中的文件共享inode后被覆盖
+            for artifact in artifacts:
+                if artifact.is_dir():
+                    shutil.copytree(artifact, tmp_dir / artifact.name)
+                else:
+                    shutil.copy2(artifact, tmp_dir / artifact.name)
+            
+            if entry_dir.exists():
+                shutil.rmtree(entry_dir)
+            os.replace(tmp_dir, entry_dir)
+            
+            index = self._load_index()
+            now = time.time()
+            index['entries'][key] = {
+                'artifacts': [artifact.name for artifact in artifacts],
+                'size': _tree_size(entry_dir),
+                'created': now,
+                'last_used': now,
+                'meta': meta or {}
+            }
+            self._evict(index, keep=key)
+            self._save_index(index)
+            return True
+    
+    def _evict(self, index, keep=None):
+        """总大小超过上限时按最近使用时间淘汰最旧的条目"""
+        entries = index['entries']
+        total = sum(entry['size'] for entry in entries.values())
+        for key, entry in sorted(entries.items(), key=lambda item: item[1]['last_used']):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            total -= entry['size']
+            del entries[key]
+            index['stats']['evictions'] += 1
+    
+    def stats(self):
+        """返回缓存统计：命中、未命中、淘汰次数、条目数与总大小"""
+        with self._lock:
+            index = self._load_index()
+        stats = dict(index['stats'])
+        stats['entries'] = len(index['entries'])
+        stats['size'] = sum(entry['size'] for entry in index['entries'].values())
+        stats['max_size'] = self.max_bytes
+        return stats
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            shutil.rmtree(self.objects_dir, ignore_errors=True)
+            self.objects_dir.mkdir(parents=True, exist_ok=True)
+            self._save_index({})
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_build_cache():
+    """进程内共享的缓存实例，保证并行任务使用同一把锁"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = BuildCache()
+        return _shared_cache
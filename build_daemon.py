@@ -0,0 +1,312 @@
+# build_daemon.py
+"""常驻构建进程：预先导入PyInstaller，通过本地socket接收构建任务，每个任务在fork出的子进程中运行
+
+用法（通常由 PackerCore 自动启动）: python build_daemon.py <socket路径>
+"""
+import hashlib
+import json
+import os
+import queue
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+# 子进程输出中的控制行（以NUL开头，不会与PyInstaller的正常输出混淆）
+PID_MARKER = "\0ANSPACKER-PID "
+EXIT_MARKER = "\0ANSPACKER-EXIT "
+STALE_MARKER = "\0ANSPACKER-STALE"
+
+# 空闲超过该秒数后常驻进程自动退出
+IDLE_TIMEOUT = 30 * 60
+START_TIMEOUT = 30
+
+
+def supported():
+    """需要 fork 与 Unix domain socket（Windows下不可用）"""
+    return hasattr(os, 'fork') and hasattr(socket, 'AF_UNIX')
+
+
+def socket_path(python=None):
+    """每个解释器一个常驻进程，socket放在本地数据目录中"""
+    from app_paths import get_app_dir
+    
+    python = python or sys.executable
+    digest = hashlib.sha256(os.path.abspath(python).encode('utf-8')).hexdigest()[:12]
+    return get_app_dir("daemon") / f"{digest}.sock"
+
+
+def _pyinstaller_stamp():
+    """PyInstaller安装目录的修改时间，升级或重装后常驻进程需要重启"""
+    import PyInstaller
+    return os.stat(os.path.dirname(PyInstaller.__file__)).st_mtime_ns
+
+
+# ---------------------------------------------------------------- 常驻进程端
+
+def _redirect_output():
+    """重新创建指向fd 1/2的标准输出（socket不支持seek，不能直接reconfigure），
+    logging.basicConfig 创建的处理器仍指向旧的stderr对象，一并替换"""
+    import io
+    import logging
+    
+    old_streams = (sys.stdout, sys.stderr)
+    sys.stdout, sys.stderr = (
+        io.TextIOWrapper(open(fd, 'wb', closefd=False), encoding='utf-8', errors='backslashreplace', line_buffering=True)
+        for fd in (1, 2)
+    )
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.StreamHandler) and handler.stream in old_streams:
+            handler.setStream(sys.stderr)
+
+
+def _interpreter_path():
+    """常驻进程的sys.path去掉脚本所在目录（AnsPacker自身）与启动时的PYTHONPATH，只剩解释器自身的路径"""
+    own = {os.path.dirname(os.path.abspath(__file__))}
+    own.update(os.path.abspath(p) for p in os.environ.get('PYTHONPATH', '').split(os.pathsep) if p)
+    return [p for p in sys.path if p and os.path.abspath(p) not in own]
+
+
+def _job_path(cwd, env, base_path):
+    """与 `python -m PyInstaller` 相同的sys.path：工作目录在最前，其次任务环境中的PYTHONPATH"""
+    pythonpath = [os.path.abspath(os.path.join(cwd, p)) for p in env.get('PYTHONPATH', '').split(os.pathsep) if p]
+    return [cwd] + pythonpath + base_path
+
+
+def _run_job(conn, request, base_path):
+    """fork出的子进程：成为新会话的组长，输出重定向到连接，运行PyInstaller后退出
+    
+    环境变量与sys.path按任务重新设置（PyInstaller按sys.path解析导入），
+    构建看到的模块搜索路径与直接运行 python -m PyInstaller 时一致。
+    """
+    import signal
+    
+    exit_code = 1
+    try:
+        os.setsid()
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        fd = conn.fileno()
+        os.dup2(fd, 1)
+        os.dup2(fd, 2)
+        _redirect_output()
+        os.chdir(request['cwd'])
+        os.environ.clear()
+        os.environ.update(request['env'])
+        sys.path[:] = _job_path(os.getcwd(), request['env'], base_path)
+        sys.stdout.write(f"{PID_MARKER}{os.getpid()}\n")
+        
+        # PyInstaller日志中的毫秒数相对logging模块加载时刻，改为相对本次构建开始
+        import logging
+        logging._startTime = time.time()
+        from PyInstaller.__main__ import run
+        try:
+            run(request['args'])
+            exit_code = 0
+        except SystemExit as e:
+            # 与解释器处理未捕获的SystemExit相同：非整数的退出码是错误消息，输出到stderr
+            if e.code is None:
+                exit_code = 0
+            elif isinstance(e.code, int):
+                exit_code = e.code
+            else:
+                sys.stderr.write(f"{e.code}\n")
+                exit_code = 1
+    except BaseException:
+        import traceback
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            sys.stdout.write(f"\n{EXIT_MARKER}{exit_code}\n")
+            sys.stdout.flush()
+        finally:
+            os._exit(exit_code)
+
+
+def serve(path):
+    """常驻进程主循环：预导入PyInstaller后逐个接受连接并fork"""
+    import signal
+    # 预先导入构建过程中用到的主要模块，fork出的子进程直接复用
+    import PyInstaller.__main__
+    import PyInstaller.building.build_main
+    import PyInstaller.depend.analysis
+    import PyInstaller.utils.hooks
+    
+    stamp = _pyinstaller_stamp()
+    base_path = _interpreter_path()
+    path = Path(path)
+    path.unlink(missing_ok=True)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(str(path))
+    listener.listen(16)
+    listener.settimeout(IDLE_TIMEOUT)
+    # 子进程由系统自动回收，常驻进程不需要额外线程等待它们
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    
+    try:
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except socket.timeout:
+                break
+            conn.settimeout(None)
+            try:
+                with conn.makefile('r', encoding='utf-8') as reader:
+                    request = json.loads(reader.readline())
+            except (OSError, ValueError):
+                conn.close()
+                continue
+            
+            if _pyinstaller_stamp() != stamp:
+                # 先释放socket路径再回复，客户端随即启动的新常驻进程不会被误删
+                listener.close()
+                path.unlink(missing_ok=True)
+                conn.sendall(f"{STALE_MARKER}\n".encode('utf-8'))
+                conn.close()
+                return
+            
+            if os.fork() == 0:
+                listener.close()
+                _run_job(conn, request, base_path)
+            conn.close()
+    finally:
+        if listener.fileno() != -1:
+            listener.close()
+            path.unlink(missing_ok=True)
+
+
+# ---------------------------------------------------------------- 客户端
+
+class DaemonProcess:
+    """常驻进程中运行的一次构建，接口与 subprocess.Popen 中用到的部分一致
+    
+    pid 为构建子进程（进程组组长）的pid，可直接用于 process_control.terminate_tree；
+    stdout 按行迭代构建输出，returncode 在收到结束标记后设置，连接意外断开时为 -1。
+    """
+    
+    def __init__(self, conn, reader):
+        self._conn = conn
+        self._lines = queue.SimpleQueue()
+        self._done = threading.Event()
+        self.returncode = None
+        first = reader.readline()
+        if not first.startswith(PID_MARKER):
+            conn.close()
+            raise ConnectionError("常驻构建进程需要重启" if first.startswith(STALE_MARKER) else "常驻构建进程没有响应")
+        self.pid = int(first[len(PID_MARKER):])
+        self._thread = threading.Thread(target=self._read, args=(reader,), name="anspacker-daemon-reader", daemon=True)
+        self._thread.start()
+        self.stdout = iter(self._lines.get, None)
+    
+    def _read(self, reader):
+        returncode = -1
+        # 结束标记前补的换行不属于构建输出，遇到下一行时再放入
+        blank = False
+        try:
+            for line in reader:
+                if line.startswith(EXIT_MARKER):
+                    returncode = int(line[len(EXIT_MARKER):])
+                    break
+                if blank:
+                    self._lines.put("\n")
+                blank = line == "\n"
+                if not blank:
+                    self._lines.put(line)
+        except (OSError, ValueError):
+            pass
+        finally:
+            reader.close()
+            self._conn.close()
+            self.returncode = returncode
+            self._done.set()
+            self._lines.put(None)
+    
+    def poll(self):
+        return self.returncode if self._done.is_set() else None
+    
+    def wait(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise subprocess.TimeoutExpired("build_daemon", timeout)
+        return self.returncode
+
+
+def _connect(path):
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(str(path))
+    except OSError:
+        conn.close()
+        return None
+    return conn
+
+
+_start_lock = threading.Lock()
+
+
+def start_daemon(path, python=None):
+    """在后台启动常驻进程（独立会话，不随当前程序退出），等待socket可连接"""
+    with _start_lock:
+        # 并行构建时其他线程可能已经启动了常驻进程
+        conn = _connect(path)
+        if conn is not None:
+            conn.close()
+            return True
+        return _spawn_daemon(path, python)
+
+
+def _spawn_daemon(path, python):
+    subprocess.Popen(
+        [python or sys.executable, str(Path(__file__).resolve()), str(path)],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        conn = _connect(path)
+        if conn is not None:
+            conn.close()
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def ensure_daemon(python=None):
+    """确保常驻进程正在运行（首次使用时启动并等待就绪），返回是否可用"""
+    return start_daemon(socket_path(python), python)
+
+
+def _submit(path, args, cwd, env):
+    conn = _connect(path)
+    if conn is None:
+        return None
+    request = json.dumps({'args': list(args), 'cwd': cwd, 'env': env}, ensure_ascii=False)
+    conn.sendall(request.encode('utf-8') + b"\n")
+    reader = conn.makefile('r', encoding='utf-8', errors='backslashreplace')
+    return DaemonProcess(conn, reader)
+
+
+def run_build(args, cwd=None, env=None, python=None):
+    """把PyInstaller参数交给常驻进程执行（不存在或已过期时自动启动），返回 DaemonProcess"""
+    path = socket_path(python)
+    cwd = cwd or os.getcwd()
+    env = dict(os.environ if env is None else env)
+    for attempt in range(2):
+        try:
+            process = _submit(path, args, cwd, env)
+        except ConnectionError:
+            if attempt:
+                raise
+            process = None
+        if process is not None:
+            return process
+        if not start_daemon(path, python):
+            raise ConnectionError("常驻构建进程启动超时")
+    raise ConnectionError("无法连接常驻构建进程")
+
+
+if __name__ == "__main__":
+    sys.exit(serve(sys.argv[1]))
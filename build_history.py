@@ -0,0 +1,206 @@
+# build_history.py
+import hashlib
+import json
+import os
+import sqlite3
+import statistics
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from app_paths import get_app_dir
+from fingerprint import config_flags
+
+# 与最近多少次成功构建的中位数比较
+DEFAULT_WINDOW = 10
+# 至少有这么多次历史记录才判断回归
+MIN_HISTORY = 3
+# 超过中位数的比例视为回归
+DEFAULT_THRESHOLDS = {'duration': 0.25, 'artifact_size': 0.10}
+
+METRIC_NAMES = {'duration': "构建耗时", 'artifact_size': "产物体积"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    config_key TEXT NOT NULL,
+    name TEXT NOT NULL,
+    main_file TEXT NOT NULL,
+    layout TEXT NOT NULL,
+    fingerprint TEXT,
+    started_at REAL NOT NULL,
+    duration REAL NOT NULL,
+    return_code INTEGER,
+    cancelled INTEGER NOT NULL DEFAULT 0,
+    from_cache INTEGER NOT NULL DEFAULT 0,
+    artifact_size INTEGER,
+    errors INTEGER NOT NULL DEFAULT 0,
+    warnings INTEGER NOT NULL DEFAULT 0,
+    peak_rss INTEGER
+);
+CREATE INDEX IF NOT EXISTS builds_config ON builds (config_key, started_at);
+"""
+
+COLUMNS = (
+    'id', 'config_key', 'name', 'main_file', 'layout', 'fingerprint', 'started_at', 'duration',
+    'return_code', 'cancelled', 'from_cache', 'artifact_size', 'errors', 'warnings', 'peak_rss'
+)
+
+
+def config_key(config, dist_dir):
+    """同一配置的标识：主程序、影响产物的全部配置项（fingerprint.config_flags，含打包模式、UPX、
+    额外参数等）、资源列表、输出位置与是否 --clean（--clean 的构建必然比复用分析缓存的构建慢）"""
+    def normalize(path):
+        return os.path.normcase(os.path.abspath(path))
+    
+    data = {
+        'main_file': normalize(config['main_file']),
+        'flags': config_flags(config),
+        'resources': sorted(normalize(path) for path in config.get('resources') or []),
+        'icon': normalize(config['icon_file']) if config.get('icon_file') else None,
+        'dist_dir': normalize(dist_dir),
+        'clean': bool(config.get('clean'))
+    }
+    text = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+def path_size(path):
+    """文件或目录的总大小（字节）"""
+    path = Path(path)
+    if path.is_file():
+        return path.stat().st_size
+    total = 0
+    for current, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(current, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class BuildHistory:
+    """本地SQLite构建历史：每次打包（含失败、取消与缓存命中）一条记录
+    
+    每次操作单独打开连接（WAL模式），可在构建队列的多个工作线程中同时写入。
+    """
+    
+    def __init__(self, path=None):
+        self.path = Path(path) if path else get_app_dir() / "history.sqlite3"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+    
+    @contextmanager
+    def _connect(self):
+        """打开连接，正常结束时提交，最后关闭"""
+        conn = sqlite3.connect(str(self.path), timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def record(self, entry):
+        """写入一条记录（键为 COLUMNS 中除id外的字段），返回记录id"""
+        entry = dict(entry)
+        entry.setdefault('started_at', time.time())
+        columns = [column for column in COLUMNS[1:] if column in entry]
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"INSERT INTO builds ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                [entry[column] for column in columns]
+            )
+            return cursor.lastrowid
+    
+    def get(self, build_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM builds WHERE id = ?", (build_id,)).fetchone()
+        return dict(row) if row else None
+    
+    def query(self, config_key=None, name=None, successful=None, since=None, limit=100):
+        """按条件查询记录，按时间倒序返回字典列表"""
+        conditions = []
+        params = []
+        if config_key is not None:
+            conditions.append("config_key = ?")
+            params.append(config_key)
+        if name is not None:
+            conditions.append("name = ?")
+            params.append(name)
+        if successful is not None:
+            conditions.append(
+                "(return_code = 0 AND cancelled = 0)" if successful else "(return_code != 0 OR cancelled = 1)"
+            )
+        if since is not None:
+            conditions.append("started_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        params.append(limit)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM builds {where} ORDER BY started_at DESC, id DESC LIMIT ?", params
+            ).fetchall()
+        return [dict(row) for row in rows]
+    
+    def configs(self):
+        """记录过的配置：[{config_key, name, layout, builds, last_build}]，最近构建的在前"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT config_key, name, layout, COUNT(*) AS builds, MAX(started_at) AS last_build "
+                "FROM builds GROUP BY config_key ORDER BY last_build DESC"
+            ).fetchall()
+        return [dict(row) for row in rows]
+    
+    def baseline(self, config_key, before=None, window=DEFAULT_WINDOW):
+        """该配置在某次构建之前最近 window 次完整构建（成功、非缓存命中）的中位数"""
+        condition = "AND id < ?" if before is not None else ""
+        params = [config_key] + ([before] if before is not None else []) + [window]
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT duration, artifact_size FROM builds "
+                f"WHERE config_key = ? AND return_code = 0 AND cancelled = 0 AND from_cache = 0 {condition} "
+                "ORDER BY id DESC LIMIT ?",
+                params
+            ).fetchall()
+        baseline = {'count': len(rows)}
+        for metric in METRIC_NAMES:
+            values = [row[metric] for row in rows if row[metric] is not None]
+            baseline[metric] = statistics.median(values) if values else None
+        return baseline
+    
+    def regressions(self, entry, window=DEFAULT_WINDOW, thresholds=None):
+        """比较一条完整构建记录与之前的滚动中位数，返回 [{metric, value, median, ratio}]"""
+        if entry['return_code'] != 0 or entry['cancelled'] or entry['from_cache']:
+            return []
+        thresholds = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+        baseline = self.baseline(entry['config_key'], before=entry.get('id'), window=window)
+        if baseline['count'] < MIN_HISTORY:
+            return []
+        found = []
+        for metric, threshold in thresholds.items():
+            value, median = entry.get(metric), baseline.get(metric)
+            if value is None or not median:
+                continue
+            ratio = value / median - 1
+            if ratio > threshold:
+                found.append({'metric': metric, 'value': value, 'median': median, 'ratio': ratio})
+        return found
+    
+    def recent_with_regressions(self, limit=100, window=DEFAULT_WINDOW, thresholds=None):
+        """最近的记录及各自的回归判断，供界面显示：[(记录, 回归列表)]"""
+        return [(entry, self.regressions(entry, window, thresholds)) for entry in self.query(limit=limit)]
+
+
+def describe_regression(regression):
+    """日志/界面中显示的一条回归说明"""
+    metric = regression['metric']
+    if metric == 'artifact_size':
+        value = f"{regression['value'] / 1024 ** 2:.1f}MB"
+        median = f"{regression['median'] / 1024 ** 2:.1f}MB"
+    else:
+        value = f"{regression['value']:.1f}s"
+        median = f"{regression['median']:.1f}s"
+    return f"{METRIC_NAMES[metric]} {value}，比最近中位数 {median} 高 {regression['ratio'] * 100:.0f}%"
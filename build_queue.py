@@ -0,0 +1,222 @@
+# build_queue.py
+import hashlib
+import itertools
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from packer_core import PackerCore
+
+
+def default_worker_count():
+    """默认并行度：PyInstaller的分析过程基本是单线程的，每个任务按一个CPU核计算"""
+    return max(1, os.cpu_count() or 1)
+
+
+class PrefixedLog:
+    """给日志加上任务前缀后转发到目标日志，作为单个任务的独立日志流"""
+    
+    def __init__(self, target, prefix):
+        self.target = target
+        self.prefix = prefix
+    
+    def log(self, message, level="info"):
+        """转发一条日志"""
+        self.target.log(f"{self.prefix} {message}", level)
+
+
+class BuildJob:
+    """构建队列中的单个打包任务"""
+    
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCESS = "success"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+    
+    def __init__(self, job_id, config, log_callback, core=None):
+        self.job_id = job_id
+        self.config = config
+        self.log = log_callback
+        self.core = core or PackerCore()
+        self.state = self.PENDING
+        self.return_code = None
+        self.future = None
+        self.cancel_requested = False
+        # 与共用同一构建目录的其他任务互斥
+        self.dir_lock = threading.Lock()
+    
+    @property
+    def name(self):
+        """任务名称：优先使用程序名称，否则使用主程序文件名"""
+        return self.config.get('name') or Path(self.config['main_file']).stem
+    
+    def cancel(self):
+        """取消任务：排队中的直接移除，运行中的停止其打包进程，返回是否记录了取消"""
+        if self.done():
+            return False
+        self.cancel_requested = True
+        if self.future is not None and self.future.cancel():
+            self.state = self.CANCELLED
+            return True
+        # 打包进程尚未启动（如正在检查PyInstaller）时只记录停止请求，启动前会检查
+        self.core.stop()
+        return True
+    
+    def done(self):
+        """任务是否已结束"""
+        return self.state in (self.SUCCESS, self.FAILED, self.CANCELLED)
+
+
+class BuildQueue:
+    """并行构建队列：在有界线程池中同时运行多个打包配置"""
+    
+    def __init__(self, max_workers=None, log_factory=None, on_job_done=None, core_options=None):
+        self.max_workers = max_workers or default_worker_count()
+        # 传给每个任务PackerCore的参数（如wheelhouse、index_url）
+        self.core_options = core_options or {}
+        self.log_factory = log_factory
+        self.on_job_done = on_job_done
+        self.jobs = []
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="anspacker-build"
+        )
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # 构建目录 -> 锁，共用同一构建目录的任务依次运行
+        self._dir_locks = {}
+        self._ensure_lock = threading.Lock()
+        self._pyinstaller_ok = None
+    
+    def submit(self, config, log_callback=None):
+        """提交一个打包配置（gather_config生成的字典），返回BuildJob"""
+        with self._lock:
+            job_id = next(self._ids)
+            job = BuildJob(
+                job_id,
+                self.isolate_config(config),
+                None,
+                core=PackerCore(**self.core_options)
+            )
+            job.dir_lock = self._dir_locks.setdefault(job.config['workpath'], threading.Lock())
+            if log_callback is None and self.log_factory is not None:
+                log_callback = self.log_factory(job)
+            job.log = log_callback
+            
+            # 同名任务会写入同一个dist目标，提前提示
+            for other in self.jobs:
+                if not other.done() and other.name == job.name:
+                    job.log.log(f"警告: 任务 #{other.job_id} 与本任务输出同名 '{job.name}'，dist中的产物会相互覆盖", "warning")
+                    break
+            
+            self.jobs.append(job)
+            job.future = self._executor.submit(self._run_job, job)
+        
+        job.log.log(f"已加入构建队列 (任务 #{job_id}, 并行度 {self.max_workers})", "info")
+        return job
+    
+    def submit_many(self, configs, log_callback=None):
+        """批量提交多个打包配置"""
+        return [self.submit(config, log_callback) for config in configs]
+    
+    def isolate_config(self, config):
+        """为每个配置分配固定的workpath/specpath，避免并行构建互相覆盖中间文件
+        
+        目录由程序名与主程序路径决定，同一配置再次排队时复用上次的Analysis缓存与增量构建记录；
+        共用同一目录的任务不会同时运行。
+        """
+        job_config = dict(config)
+        base_dir = Path(config['output_dir']) if config['output_dir'] else Path.cwd()
+        name = config.get('name') or Path(config['main_file']).stem
+        safe_name = re.sub(r'[^\w.-]+', '_', name)
+        main_file = os.path.normcase(os.path.abspath(config['main_file']))
+        digest = hashlib.sha256(main_file.encode('utf-8')).hexdigest()[:8]
+        job_dir = base_dir / "build" / "jobs" / f"{safe_name}-{digest}"
+        job_config['workpath'] = str(job_dir)
+        job_config['specpath'] = str(job_dir)
+        return job_config
+    
+    def _ensure_pyinstaller(self, log_callback):
+        """整个队列只检查一次PyInstaller，其余任务等待并复用结果"""
+        with self._ensure_lock:
+            if self._pyinstaller_ok is None:
+                self._pyinstaller_ok = PackerCore(**self.core_options).ensure_pyinstaller(log_callback)
+            return self._pyinstaller_ok
+    
+    def _run_job(self, job):
+        """工作线程：执行单个任务"""
+        try:
+            if job.cancel_requested:
+                job.state = BuildJob.CANCELLED
+                return
+            
+            if not self._ensure_pyinstaller(job.log):
+                job.log.log("无法继续打包，请先手动安装PyInstaller", "error")
+                job.state = BuildJob.FAILED
+                return
+            
+            # 检查PyInstaller期间可能已被取消
+            if job.cancel_requested:
+                job.state = BuildJob.CANCELLED
+                job.log.log("打包已取消", "warning")
+                return
+            
+            if not job.dir_lock.acquire(blocking=False):
+                job.log.log("同一配置的上一个任务仍在构建，等待其结束后再开始", "info")
+                job.dir_lock.acquire()
+            try:
+                if job.cancel_requested:
+                    job.state = BuildJob.CANCELLED
+                    job.log.log("打包已取消", "warning")
+                    return
+                job.state = BuildJob.RUNNING
+                # 每个任务有独立的PackerCore，保留开始前记录的停止请求
+                job.return_code = job.core.run(job.config, job.log, keep_stop_request=True)
+            finally:
+                job.dir_lock.release()
+            
+            if job.cancel_requested:
+                job.state = BuildJob.CANCELLED
+            elif job.return_code == 0:
+                job.state = BuildJob.SUCCESS
+            else:
+                job.state = BuildJob.FAILED
+        except Exception as e:
+            job.state = BuildJob.FAILED
+            job.log.log(f"任务异常: {str(e)}", "error")
+        finally:
+            if self.on_job_done is not None:
+                self.on_job_done(job)
+    
+    def active_jobs(self):
+        """返回尚未结束的任务"""
+        return [job for job in self.jobs if not job.done()]
+    
+    def cancel_all(self):
+        """取消所有未结束的任务"""
+        cancelled = 0
+        for job in self.active_jobs():
+            if job.cancel():
+                cancelled += 1
+        return cancelled
+    
+    def wait_all(self, timeout=None):
+        """等待所有已提交的任务结束，返回是否全部结束"""
+        futures = [job.future for job in self.jobs if job.future is not None]
+        _, not_done = wait(futures, timeout=timeout)
+        return not not_done
+    
+    def summary(self):
+        """按状态统计任务数"""
+        counts = {}
+        for job in self.jobs:
+            counts[job.state] = counts.get(job.state, 0) + 1
+        return counts
+    
+    def shutdown(self, cancel_pending=True):
+        """关闭线程池"""
+        if cancel_pending:
+            self.cancel_all()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,151 @@
+# build_report.py
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+# PyInstaller日志行格式: "<启动后毫秒数> <级别>: <消息>"
+LINE_PATTERN = re.compile(r'^(\d+) ([A-Z]+): (.*)$')
+
+# 构建阶段：每个 "checking X" 开始一个新阶段
+PHASE_PATTERN = re.compile(r'^checking (Analysis|PYZ|PKG|EXE|COLLECT|MERGE|BUNDLE|Splash)\b')
+
+# Analysis 阶段内的主要步骤
+STEP_PATTERN = re.compile(
+    r'^(Initializing module dependency graph'
+    r'|Analyzing modules for base_library\.zip'
+    r'|Caching module dependency graph'
+    r'|Analyzing (?!modules for|run-time hooks)\S.*'
+    r'|Processing module hooks'
+    r'|Performing binary vs\. data reclassification'
+    r'|Looking for ctypes DLLs'
+    r'|Analyzing run-time hooks'
+    r'|Creating base_library\.zip'
+    r'|Looking for dynamic libraries'
+    r'|Warnings written to)'
+)
+
+# 钩子处理：Processing standard module hook 'hook-xxx.py' / Loading module hook 'hook-xxx.py'
+HOOK_PATTERN = re.compile(r"^(?:Processing|Loading) (.*?)hook '([^']+)'")
+
+BUILD_COMPLETE = "Build complete!"
+
+
+class BuildTimeline:
+    """从PyInstaller输出中解析出的构建时间线：阶段与分析步骤的耗时、处理过的钩子
+    
+    PyInstaller不输出结束时间，阶段与步骤的耗时按到下一个阶段/步骤开始为止计算。
+    钩子只有开始的日志，之后紧接着的依赖图扫描无法与钩子本身区分，因此只记录
+    处理了哪些钩子及开始时刻，不计算单个钩子的耗时（钩子时间计入所在的分析步骤）。
+    """
+    
+    def __init__(self):
+        self.phases = []
+        self.steps = []
+        self.hooks = []
+        self.last_ms = 0
+        self._open = {'phase': None, 'step': None}
+    
+    def _close(self, kind, ms):
+        entry = self._open[kind]
+        if entry is not None:
+            entry['end_ms'] = ms
+            entry['duration_ms'] = ms - entry['start_ms']
+            self._open[kind] = None
+    
+    def _start(self, kind, target, entry):
+        self._close(kind, entry['start_ms'])
+        target.append(entry)
+        self._open[kind] = entry
+    
+    def feed(self, line):
+        """解析一行输出，返回 (毫秒, 级别, 消息)，不是PyInstaller日志格式时返回None"""
+        match = LINE_PATTERN.match(line)
+        if match is None:
+            return None
+        ms, level, message = int(match.group(1)), match.group(2), match.group(3)
+        self.feed_parsed(ms, message)
+        return ms, level, message
+    
+    def feed_parsed(self, ms, message):
+        """处理已拆分好时间戳的一条日志"""
+        self.last_ms = max(self.last_ms, ms)
+        
+        phase = PHASE_PATTERN.match(message)
+        if phase is not None:
+            self._close('step', ms)
+            self._start('phase', self.phases, {'name': phase.group(1), 'start_ms': ms})
+            return
+        
+        if message.startswith(BUILD_COMPLETE):
+            self._close('step', ms)
+            self._close('phase', ms)
+            return
+        
+        step = STEP_PATTERN.match(message)
+        if step is not None:
+            self._start('step', self.steps, {'name': step.group(1), 'start_ms': ms})
+            return
+        
+        hook = HOOK_PATTERN.match(message)
+        if hook is not None:
+            self.hooks.append({
+                'hook': hook.group(2),
+                'kind': hook.group(1).strip() or 'module',
+                'start_ms': ms
+            })
+    
+    def finish(self):
+        """构建结束（包括失败）时关闭所有未结束的计时段"""
+        for kind in ('step', 'phase'):
+            self._close(kind, self.last_ms)
+    
+    def to_dict(self):
+        """结构化的时间模型，写入JSON报告"""
+        startup_ms = self.phases[0]['start_ms'] if self.phases else self.last_ms
+        return {
+            'total_ms': self.last_ms,
+            'startup_ms': startup_ms,
+            'phases': self.phases,
+            'analysis_steps': sorted(self.steps, key=lambda s: s.get('duration_ms', 0), reverse=True),
+            'hooks': self.hooks
+        }
+    
+    def summary_lines(self, top_steps=5):
+        """日志中显示的耗时摘要"""
+        total = self.last_ms or 1
+        lines = [f"PyInstaller总耗时: {self.last_ms / 1000:.2f}s"]
+        
+        startup_ms = self.phases[0]['start_ms'] if self.phases else self.last_ms
+        lines.append(f"  启动与参数解析: {startup_ms / 1000:.2f}s ({startup_ms * 100 / total:.0f}%)")
+        for phase in self.phases:
+            duration = phase.get('duration_ms', 0)
+            lines.append(f"  {phase['name']:<10} {duration / 1000:>8.2f}s ({duration * 100 / total:.0f}%)")
+        
+        steps = sorted(self.steps, key=lambda s: s.get('duration_ms', 0), reverse=True)[:top_steps]
+        if steps:
+            lines.append("最慢的分析步骤:")
+            for step in steps:
+                lines.append(f"  {step.get('duration_ms', 0) / 1000:>8.2f}s  {step['name'][:80]}")
+        
+        if self.hooks:
+            lines.append(f"处理的钩子: {len(self.hooks)} 个（耗时计入所在的分析步骤）")
+        return lines
+
+
+def report_path(output_dir, name):
+    """构建报告的位置：输出目录（未指定时为当前目录）下的 <名称>-build-report.json"""
+    return Path(output_dir or ".") / f"{name}-build-report.json"
+
+
+def write_report(path, sections):
+    """写入构建报告（整体覆盖上一次的报告）"""
+    report = {'generated_at': time.strftime('%Y-%m-%d %H:%M:%S')}
+    report.update(sections)
+    path = Path(path)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return path
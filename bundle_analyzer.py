@@ -0,0 +1,348 @@
+# bundle_analyzer.py
+"""打包产物体积分析：以内存映射方式直接读取PyInstaller的CArchive与其中的PYZ，不解压到磁盘
+
+用法:
+    python bundle_analyzer.py dist/MyApp.exe
+    python bundle_analyzer.py dist/MyApp
+"""
+import hashlib
+import json
+import marshal
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+import zlib
+from pathlib import Path
+from app_paths import get_app_dir
+
+# CArchive末尾的cookie: magic, 包长度, TOC偏移, TOC长度, Python版本, Python库名
+COOKIE_MAGIC = b'MEI\014\013\012\013\016'
+COOKIE_FORMAT = '!8sIIII64s'
+COOKIE_LENGTH = struct.calcsize(COOKIE_FORMAT)
+
+# TOC条目: 条目长度, 数据偏移, 压缩后长度, 原始长度, 是否压缩, 类型码, 名称（补齐到16字节）
+TOC_ENTRY_FORMAT = '!IIIIBc'
+TOC_ENTRY_LENGTH = struct.calcsize(TOC_ENTRY_FORMAT)
+
+PYZ_MAGIC = b'PYZ\0'
+
+# CArchive类型码 -> 分类；PYZ（z/Z）会展开为其中的模块
+TYPECODE_KINDS = {
+    'b': 'binary',
+    'x': 'data',
+    's': 'script',
+    'm': 'python',
+    'M': 'python',
+    'l': 'data',
+    'd': 'other'
+}
+
+BINARY_PATTERN = re.compile(r'\.(?:so(?:\.[\w.]+)?|dll|pyd|dylib)$', re.IGNORECASE)
+
+
+class ArchiveReader:
+    """只读打开PyInstaller生成的可执行文件，通过mmap按需读取TOC与PYZ"""
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"空文件: {self.path}")
+        
+        cookie_pos = self._map.rfind(COOKIE_MAGIC)
+        if cookie_pos == -1:
+            self.close()
+            raise ValueError(f"不是PyInstaller生成的可执行文件: {self.path}")
+        
+        _, pkg_length, toc_offset, toc_length, _, _ = struct.unpack_from(COOKIE_FORMAT, self._map, cookie_pos)
+        self.start = cookie_pos + COOKIE_LENGTH - pkg_length
+        self.toc, self.options = self._parse_toc(self.start + toc_offset, toc_length)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def close(self):
+        """释放内存映射与文件句柄"""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+    
+    def _parse_toc(self, pos, length):
+        """解析TOC，返回 ([(名称, 偏移, 压缩后长度, 原始长度, 类型码)], 运行时选项)"""
+        toc = []
+        options = []
+        end = pos + length
+        while pos < end:
+            entry_length, offset, data_length, raw_length, _, typecode = struct.unpack_from(
+                TOC_ENTRY_FORMAT, self._map, pos
+            )
+            name = self._map[pos + TOC_ENTRY_LENGTH:pos + entry_length].rstrip(b'\0').decode('utf-8')
+            pos += entry_length
+            typecode = typecode.decode('ascii')
+            if typecode == 'o':
+                options.append(name)
+            else:
+                toc.append((name, offset, data_length, raw_length, typecode))
+        return toc, options
+    
+    def iter_pyz(self, offset, length, measure=True):
+        """遍历嵌入的PYZ中的模块，返回 (模块名, 压缩后长度, 原始长度)
+        
+        PYZ中的模块单独压缩，TOC里没有原始长度，measure为真时在内存中解压求得。
+        """
+        pyz_start = self.start + offset
+        if self._map[pyz_start:pyz_start + 4] != PYZ_MAGIC:
+            raise ValueError("PYZ magic 不匹配")
+        toc_offset, = struct.unpack_from('!i', self._map, pyz_start + 8)
+        pyz_toc = marshal.loads(self._map[pyz_start + toc_offset:pyz_start + length])
+        
+        view = memoryview(self._map)
+        try:
+            for name, entry in pyz_toc:
+                # PyInstaller 6: (类型, 偏移, 长度)；更早的版本: (是否包, 偏移, 长度)
+                _, entry_offset, entry_length = entry
+                if entry_length <= 0:
+                    continue
+                raw_length = entry_length
+                if measure:
+                    blob = view[pyz_start + entry_offset:pyz_start + entry_offset + entry_length]
+                    try:
+                        raw_length = len(zlib.decompress(blob))
+                    except zlib.error:
+                        pass
+                    finally:
+                        blob.release()
+                yield name, entry_length, raw_length
+        finally:
+            view.release()
+
+
+def _new_report(path, layout):
+    return {
+        'artifact': str(path),
+        'layout': layout,
+        'disk_size': 0,
+        'kinds': {},
+        'packages': {},
+        'files': {}
+    }
+
+
+def _add_file(report, name, kind, compressed, size):
+    report['files'][name] = {'kind': kind, 'compressed': compressed, 'size': size}
+    _add_kind(report, kind, compressed, size)
+
+
+def _add_kind(report, kind, compressed, size):
+    totals = report['kinds'].setdefault(kind, {'count': 0, 'compressed': 0, 'size': 0})
+    totals['count'] += 1
+    totals['compressed'] += compressed
+    totals['size'] += size
+
+
+def _analyze_archive(report, reader, measure):
+    """把CArchive中的条目计入报告，PYZ按顶层包汇总"""
+    for name, offset, data_length, raw_length, typecode in reader.toc:
+        if typecode in ('z', 'Z'):
+            for module, compressed, size in reader.iter_pyz(offset, data_length, measure):
+                package = report['packages'].setdefault(
+                    module.split('.', 1)[0], {'count': 0, 'compressed': 0, 'size': 0}
+                )
+                package['count'] += 1
+                package['compressed'] += compressed
+                package['size'] += size
+                _add_kind(report, 'python', compressed, size)
+        else:
+            _add_file(report, name, TYPECODE_KINDS.get(typecode, 'other'), data_length, raw_length)
+
+
+def _find_executable(path):
+    """onedir目录中的主可执行文件（与目录同名，Windows下为.exe）"""
+    for candidate in (path / path.name, path / f"{path.name}.exe"):
+        if candidate.is_file():
+            return candidate
+    for candidate in sorted(path.iterdir()):
+        if candidate.is_file() and os.access(candidate, os.X_OK):
+            return candidate
+    return None
+
+
+def analyze_artifact(path, measure=True):
+    """分析onefile可执行文件或onedir目录，返回可序列化的体积报告"""
+    path = Path(path)
+    if path.is_dir():
+        exe_path = _find_executable(path)
+        if exe_path is None:
+            raise ValueError(f"目录中没有可执行文件: {path}")
+        report = _new_report(path, 'onedir')
+        with ArchiveReader(exe_path) as reader:
+            _analyze_archive(report, reader, measure)
+            # 内容目录（PyInstaller 6 默认为 _internal，旧版本没有）
+            prefix = ''
+            for option in reader.options:
+                if option.startswith('pyi-contents-directory '):
+                    prefix = option.split(' ', 1)[1].strip('./')
+                    prefix = f"{prefix}/" if prefix else ''
+        
+        # 其余文件直接按磁盘大小统计
+        for root, _, files in os.walk(path):
+            for file_name in files:
+                file_path = Path(root) / file_name
+                size = file_path.stat().st_size
+                report['disk_size'] += size
+                if file_path == exe_path:
+                    continue
+                name = file_path.relative_to(path).as_posix()
+                if prefix and name.startswith(prefix):
+                    name = name[len(prefix):]
+                if name.endswith('base_library.zip'):
+                    kind = 'python'
+                elif BINARY_PATTERN.search(name):
+                    kind = 'binary'
+                else:
+                    kind = 'data'
+                _add_file(report, name, kind, size, size)
+    else:
+        report = _new_report(path, 'onefile')
+        report['disk_size'] = path.stat().st_size
+        with ArchiveReader(path) as reader:
+            _analyze_archive(report, reader, measure)
+    return report
+
+
+def _entries(report):
+    """报告中可比较的条目: {键: 大小}"""
+    entries = {f"package:{name}": item['compressed'] for name, item in report['packages'].items()}
+    entries.update({f"{item['kind']}:{name}": item['compressed'] for name, item in report['files'].items()})
+    return entries
+
+
+def diff_reports(old, new, top=15):
+    """与上一次报告对比，返回总大小变化与变化最大的条目"""
+    old_entries = _entries(old)
+    new_entries = _entries(new)
+    changes = []
+    for key in set(old_entries) | set(new_entries):
+        before = old_entries.get(key, 0)
+        after = new_entries.get(key, 0)
+        if before != after:
+            status = 'added' if key not in old_entries else 'removed' if key not in new_entries else 'changed'
+            changes.append({'entry': key, 'status': status, 'before': before, 'after': after, 'delta': after - before})
+    changes.sort(key=lambda c: abs(c['delta']), reverse=True)
+    return {
+        'previous_generated_at': old.get('generated_at'),
+        'disk_size_delta': new['disk_size'] - old['disk_size'],
+        'changed_entries': len(changes),
+        'top_changes': changes[:top]
+    }
+
+
+def _format_size(size):
+    sign = '-' if size < 0 else ''
+    size = abs(size)
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{sign}{size:.0f}{unit}" if unit == 'B' else f"{sign}{size:.1f}{unit}"
+        size /= 1024
+    return f"{sign}{size:.2f}GB"
+
+
+def summary_lines(report, diff=None, top=10):
+    """日志中显示的体积摘要"""
+    lines = [f"产物体积: {_format_size(report['disk_size'])} ({report['layout']})"]
+    for kind, totals in sorted(report['kinds'].items(), key=lambda item: item[1]['compressed'], reverse=True):
+        lines.append(
+            f"  {kind:<8} {_format_size(totals['compressed']):>10} 压缩 / {_format_size(totals['size']):>10} 原始"
+            f"  ({totals['count']} 项)"
+        )
+    
+    packages = sorted(report['packages'].items(), key=lambda item: item[1]['compressed'], reverse=True)[:top]
+    if packages:
+        lines.append("最大的Python包:")
+        for name, item in packages:
+            lines.append(f"  {_format_size(item['compressed']):>10}  {name} ({item['count']} 个模块)")
+    
+    files = sorted(report['files'].items(), key=lambda item: item[1]['compressed'], reverse=True)[:top]
+    if files:
+        lines.append("最大的二进制/数据文件:")
+        for name, item in files:
+            lines.append(f"  {_format_size(item['compressed']):>10}  {name} ({item['kind']})")
+    
+    if diff is not None:
+        lines.append(f"与上次构建相比: {_format_size(diff['disk_size_delta'])}，{diff['changed_entries']} 项变化")
+        for change in diff['top_changes'][:top]:
+            lines.append(f"  {_format_size(change['delta']):>10}  {change['entry']} ({change['status']})")
+    return lines
+
+
+def report_section(report, diff=None, top=30):
+    """写入构建报告的体积部分：总计、最大的包与文件以及对比结果"""
+    return {
+        'artifact': report['artifact'],
+        'layout': report['layout'],
+        'disk_size': report['disk_size'],
+        'kinds': report['kinds'],
+        'top_packages': [
+            dict(item, name=name)
+            for name, item in sorted(report['packages'].items(), key=lambda i: i[1]['compressed'], reverse=True)[:top]
+        ],
+        'top_files': [
+            dict(item, name=name)
+            for name, item in sorted(report['files'].items(), key=lambda i: i[1]['compressed'], reverse=True)[:top]
+        ],
+        'diff': diff
+    }
+
+
+def history_path(config_id):
+    """同一配置上一次体积报告的保存位置"""
+    return get_app_dir("bundle-size") / f"{config_id}.json"
+
+
+def config_id(main_file, name, dist_dir):
+    """同一配置的标识：主程序、产物名称与输出位置"""
+    key = f"{Path(main_file).resolve()}|{name}|{Path(dist_dir).resolve()}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+def load_previous(path):
+    """读取上一次的报告，不存在或损坏时返回None"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_report(path, report):
+    """保存本次报告，作为下次对比的基准"""
+    report = dict(report, generated_at=time.strftime('%Y-%m-%d %H:%M:%S'))
+    tmp_path = Path(path).with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print(__doc__.strip(), file=sys.stderr)
+        return 2
+    for path in argv:
+        for line in summary_lines(analyze_artifact(path), top=20):
+            print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,429 @@
+# cli.py
+"""AnsPacker 命令行入口：无界面环境下直接驱动 PackerCore，不导入 tkinter
+
+用法:
+    python cli.py main.py --name MyApp --output-dir out --add-data logo.png
+    python cli.py --job-file jobs.json --jobs 4
+"""
+import time
+
+_START = time.perf_counter()
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+
+EXIT_OK = 0
+EXIT_BUILD_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+# 与 gather_config 一致的默认配置
+DEFAULT_CONFIG = {
+    'main_file': '',
+    'icon_file': '',
+    'resources': [],
+    'output_dir': '',
+    'name': '',
+    'onefile': True,
+    'noconsole': True,
+    'debug': False,
+    'clean': True,
+    'use_cache': False,
+    'incremental': False,
+    'resource_tree': False,
+    'upx_compress': False,
+    'profile_startup': False,
+    'build_daemon': False,
+    'spec_cache': False,
+    'build_log': True,
+    'group_members': [],
+    'group_mode': 'shared',
+    'extra_params': ''
+}
+
+
+class ConsoleLog:
+    """纯文本日志输出：写到标准输出，可同时写入日志文件，多线程安全"""
+    
+    LEVEL_PREFIX = {
+        'error': '[ERROR] ',
+        'warning': '[WARN] ',
+        'success': '[OK] ',
+        'info': ''
+    }
+    
+    def __init__(self, stream=None, log_file=None, quiet=False):
+        self.stream = stream or sys.stdout
+        self.quiet = quiet
+        self._file = open(log_file, 'a', encoding='utf-8') if log_file else None
+        self._lock = threading.Lock()
+    
+    def log(self, message, level="info"):
+        """输出一条日志，quiet模式下只输出警告与错误"""
+        line = f"{self.LEVEL_PREFIX.get(level, '')}{message}\n"
+        with self._lock:
+            if not self.quiet or level in ('warning', 'error'):
+                self.stream.write(line)
+                self.stream.flush()
+            if self._file is not None:
+                self._file.write(line)
+    
+    def close(self):
+        """关闭日志文件"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def create_parser():
+    """命令行参数，与GUI中的配置项一一对应"""
+    parser = argparse.ArgumentParser(
+        prog="anspacker",
+        description="AnsPacker 命令行打包工具（PyInstaller 前端）"
+    )
+    parser.add_argument("main_file", nargs='?', help="主程序文件 (*.py)")
+    parser.add_argument("--job-file", help="JSON/TOML 任务文件，可包含多个打包任务")
+    parser.add_argument("--name", help="程序名称")
+    parser.add_argument("--icon", dest="icon_file", help="图标文件")
+    parser.add_argument("--add-data", dest="resources", action="append", metavar="PATH", help="额外资源（可重复）")
+    parser.add_argument("--keep-resource-tree", dest="resource_tree", action="store_true", default=None,
+                        help="资源保留相对目录结构（默认全部放到程序根目录）")
+    parser.add_argument("--resource-root", help="保留目录结构时的基准目录（默认为主程序所在目录）")
+    parser.add_argument("--output-dir", help="输出目录")
+    parser.add_argument("--onefile", dest="onefile", action="store_true", default=None, help="单文件模式（默认）")
+    parser.add_argument("--onedir", dest="onefile", action="store_false", help="目录模式")
+    parser.add_argument("--noconsole", dest="noconsole", action="store_true", default=None, help="隐藏控制台（默认）")
+    parser.add_argument("--console", dest="noconsole", action="store_false", help="保留控制台")
+    parser.add_argument("--debug", action="store_true", default=None, help="调试模式 --debug=all")
+    parser.add_argument("--clean", dest="clean", action="store_true", default=None, help="清理临时文件（默认）")
+    parser.add_argument("--no-clean", dest="clean", action="store_false", help="不清理临时文件")
+    parser.add_argument("--cache", dest="use_cache", action="store_true", default=None, help="启用构建缓存")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false", help="禁用构建缓存（默认）")
+    parser.add_argument("--incremental", action="store_true", default=None, help="增量构建（按需 --clean）")
+    parser.add_argument("--upx-compress", action="store_true", default=None,
+                        help="构建后并行UPX压缩动态库（目录模式，按内容缓存结果）")
+    parser.add_argument("--profile-startup", action="store_true", default=None,
+                        help="打包成功后在沙箱中多次启动产物，测量冷/热启动、解压与导入耗时")
+    parser.add_argument("--daemon", dest="build_daemon", action="store_true", default=None,
+                        help="通过常驻构建进程运行（预先导入PyInstaller，连续构建省去启动开销；仅Linux/macOS）")
+    parser.add_argument("--spec-cache", dest="spec_cache", action="store_true", default=None,
+                        help="按配置缓存生成的 .spec 文件，之后直接构建spec")
+    parser.add_argument("--with", dest="group_members", action="append", metavar="PATH",
+                        help="与主程序一起构建的其他程序（可重复），在同一个PyInstaller进程中分析并共享依赖")
+    parser.add_argument("--group-mode", choices=("shared", "merge"), default=None,
+                        help="多程序组合方式：shared 放在同一目录共用依赖（默认），merge 使用PyInstaller的MERGE")
+    parser.add_argument("--extra-params", help="额外 PyInstaller 参数（整体作为一个字符串）")
+    parser.add_argument("--wheelhouse", help="本地wheel仓库目录，安装PyInstaller/依赖时完全离线 (--no-index)")
+    parser.add_argument("--index-url", help="本地包索引地址")
+    parser.add_argument("--requirements", help="构建前从wheel仓库/索引安装的依赖文件；不指定任务时仅安装依赖")
+    parser.add_argument("--suggest-imports", action="store_true",
+                        help="不打包，对比导入图与上一次的产物给出 --exclude-module/--hidden-import 建议")
+    parser.add_argument("--benchmark-layouts", action="store_true",
+                        help="分别以目录模式与单文件模式打包，对比体积与冷/热启动耗时并推荐打包模式")
+    parser.add_argument("--history", type=int, nargs='?', const=20, metavar="N",
+                        help="输出最近 N 次构建的历史记录（默认20）及耗时/体积回归，不进行打包")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="并行任务数（默认按CPU核数）")
+    parser.add_argument("--log-file", help="同时把日志写入该文件")
+    parser.add_argument("--no-build-log", dest="build_log", action="store_false", default=None,
+                        help="不在 ~/.anspacker/logs 中保存每次构建的日志")
+    parser.add_argument("--quiet", "-q", action="store_true", help="只输出警告与错误")
+    parser.add_argument("--timing", action="store_true", help="输出启动耗时")
+    return parser
+
+
+def _extra_params_text(value):
+    """任务文件中的 extra_params 可以是字符串或参数列表，统一为按空白分隔的字符串"""
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return value
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError("extra_params 应为字符串或字符串列表")
+    for item in value:
+        if not item or any(c.isspace() for c in item):
+            raise ValueError(f"extra_params 中的参数不能为空或包含空白: {item!r}")
+    return " ".join(value)
+
+
+def _load_job_file(path):
+    """读取任务文件：列表形式，或 {"defaults": {...}, "jobs": [...]}"""
+    if path.lower().endswith('.toml'):
+        try:
+            import tomllib
+        except ImportError:
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise ValueError("读取TOML任务文件需要 Python 3.11+ 或安装 tomli")
+        with open(path, 'rb') as f:
+            data = tomllib.load(f)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    
+    if isinstance(data, list):
+        defaults, jobs = {}, data
+    elif isinstance(data, dict):
+        defaults, jobs = data.get('defaults', {}), data.get('jobs', [])
+    else:
+        raise ValueError("任务文件格式错误：应为任务列表或包含 jobs 的对象")
+    
+    # 任务文件中的相对路径相对于任务文件所在目录
+    base_dir = os.path.dirname(os.path.abspath(path))
+    configs = []
+    for job in jobs:
+        config = dict(DEFAULT_CONFIG)
+        config.update(defaults)
+        config.update(job)
+        for key in ('main_file', 'icon_file', 'output_dir', 'resource_root'):
+            if config.get(key):
+                config[key] = os.path.join(base_dir, config[key])
+        config['resources'] = [os.path.join(base_dir, r) for r in config.get('resources', [])]
+        config['group_members'] = [os.path.join(base_dir, m) for m in config.get('group_members') or []]
+        config['extra_params'] = _extra_params_text(config.get('extra_params'))
+        configs.append(config)
+    return configs
+
+
+def _config_from_args(args):
+    """由命令行参数生成与 gather_config 相同结构的配置"""
+    config = dict(DEFAULT_CONFIG)
+    for key in DEFAULT_CONFIG:
+        value = getattr(args, key, None)
+        if value is not None:
+            config[key] = value
+    config['resources'] = list(args.resources or [])
+    if args.resource_root:
+        config['resource_root'] = args.resource_root
+    return config
+
+
+def validate_group(config):
+    """验证多程序构建的设置，返回错误信息，有效时返回None"""
+    members = config.get('group_members') or []
+    for path in members:
+        if not os.path.isfile(path):
+            return f"程序文件不存在：{path}"
+    if config.get('group_mode', 'shared') not in ("shared", "merge"):
+        return f"未知的多程序组合方式：{config['group_mode']}"
+    names = [config.get('name') or os.path.splitext(os.path.basename(config['main_file']))[0]]
+    names.extend(os.path.splitext(os.path.basename(path))[0] for path in members)
+    if len(set(names)) != len(names):
+        return "多程序构建中各程序的名称（文件名）不能重复"
+    return None
+
+
+def validate_config(config):
+    """验证配置有效性，返回错误信息，有效时返回None"""
+    if not config.get('main_file'):
+        return "缺少主程序文件"
+    if not os.path.isfile(config['main_file']):
+        return f"主程序文件不存在：{config['main_file']}"
+    if config.get('icon_file') and not os.path.isfile(config['icon_file']):
+        return f"图标文件不存在：{config['icon_file']}"
+    for resource in config.get('resources', []):
+        if not os.path.exists(resource):
+            return f"资源文件不存在：{resource}"
+    if config.get('output_dir') and not os.path.isdir(config['output_dir']):
+        return f"输出目录不存在：{config['output_dir']}"
+    if config.get('resource_root') and not os.path.isdir(config['resource_root']):
+        return f"资源基准目录不存在：{config['resource_root']}"
+    error = validate_group(config)
+    if error:
+        return error
+    if config.get('log_rules'):
+        from log_classifier import LogClassifier
+        try:
+            LogClassifier(rules=config['log_rules'])
+        except (ValueError, TypeError, re.error) as e:
+            return f"日志分级规则无效：{e}"
+    return None
+
+
+def _provision(args, sink):
+    """准备构建环境：安装PyInstaller与构建依赖，返回是否成功"""
+    from packer_core import PackerCore
+    
+    core = PackerCore(wheelhouse=args.wheelhouse, index_url=args.index_url)
+    if not core.ensure_pyinstaller(sink):
+        sink.log("无法继续打包，请先手动安装PyInstaller", "error")
+        return False
+    if args.requirements:
+        return core.install_build_dependencies(sink, requirements=args.requirements)
+    return True
+
+
+def _suggest_imports(configs, sink, core_options):
+    """只做导入分析：输出可直接用于 --extra-params 的建议参数"""
+    from packer_core import PackerCore
+    
+    core = PackerCore(**core_options)
+    exit_code = EXIT_OK
+    for config in configs:
+        suggestions = core.suggest_imports(config, sink)
+        if suggestions is None:
+            exit_code = EXIT_BUILD_FAILED
+        elif suggestions.as_params():
+            sink.log(f"建议参数: {suggestions.as_params()}", "success")
+    return exit_code
+
+
+def _benchmark_layouts(configs, sink, core_options):
+    """对每个任务分别构建两种模式并给出推荐"""
+    from packer_core import PackerCore
+    
+    core = PackerCore(**core_options)
+    if not core.ensure_pyinstaller(sink):
+        sink.log("无法继续打包，请先手动安装PyInstaller", "error")
+        return EXIT_BUILD_FAILED
+    exit_code = EXIT_OK
+    try:
+        for config in configs:
+            result = core.benchmark_layouts(config, sink)
+            if result is None or result['recommended'] is None:
+                exit_code = EXIT_BUILD_FAILED
+    except KeyboardInterrupt:
+        core.stop(wait=True)
+        sink.log("已中断", "warning")
+        return EXIT_INTERRUPTED
+    return exit_code
+
+
+def _show_history(limit):
+    """输出最近的构建历史，存在回归时返回非零退出码"""
+    from build_history import BuildHistory, describe_regression
+    
+    rows = BuildHistory().recent_with_regressions(limit=limit)
+    if not rows:
+        print("还没有构建历史")
+        return EXIT_OK
+    regressed = False
+    for entry, regressions in rows:
+        if entry['cancelled']:
+            result = "已取消"
+        elif entry['return_code'] == 0:
+            result = "缓存命中" if entry['from_cache'] else "成功"
+        else:
+            result = f"失败({entry['return_code']})"
+        size = entry['artifact_size']
+        size = f"{size / 1024 ** 2:.1f}MB" if size is not None else "-"
+        print(
+            f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['started_at']))}  {entry['name']} "
+            f"[{entry['layout']}]  {entry['duration']:.1f}s  {size}  "
+            f"错误 {entry['errors']} / 警告 {entry['warnings']}  {result}"
+        )
+        for regression in regressions:
+            regressed = True
+            print(f"    ⚠ 回归: {describe_regression(regression)}")
+    return EXIT_BUILD_FAILED if regressed else EXIT_OK
+
+
+def _run_single(config, sink, core_options):
+    """单个任务：在当前线程中同步打包"""
+    from packer_core import PackerCore
+    
+    core = PackerCore(**core_options)
+    if not core.ensure_pyinstaller(sink):
+        sink.log("无法继续打包，请先手动安装PyInstaller", "error")
+        return EXIT_BUILD_FAILED
+    try:
+        return_code = core.run(config, sink)
+    except KeyboardInterrupt:
+        core.stop(wait=True)
+        sink.log("已中断", "warning")
+        return EXIT_INTERRUPTED
+    return EXIT_OK if return_code == 0 else EXIT_BUILD_FAILED
+
+
+def _run_many(configs, sink, max_workers, core_options):
+    """多个任务：交给并行构建队列"""
+    from build_queue import BuildJob, BuildQueue, PrefixedLog
+    from process_control import STOP_GRACE_PERIOD
+    
+    queue = BuildQueue(
+        max_workers=max_workers,
+        log_factory=lambda job: PrefixedLog(sink, f"[#{job.job_id} {job.name}]"),
+        core_options=core_options
+    )
+    queue.submit_many(configs)
+    try:
+        # 分段等待，使 Ctrl+C 能及时生效
+        while not queue.wait_all(timeout=0.5):
+            pass
+    except KeyboardInterrupt:
+        queue.shutdown(cancel_pending=True)
+        sink.log("已中断，正在取消剩余任务", "warning")
+        # 等待各任务结束进程组并移走未完成的输出
+        queue.wait_all(timeout=STOP_GRACE_PERIOD + 5)
+        return EXIT_INTERRUPTED
+    
+    queue.shutdown(cancel_pending=False)
+    sink.log("="*50, "info")
+    for job in queue.jobs:
+        level = "success" if job.state == BuildJob.SUCCESS else "error"
+        sink.log(f"#{job.job_id} {job.name}: {job.state} (返回码 {job.return_code})", level)
+    failed = [job for job in queue.jobs if job.state != BuildJob.SUCCESS]
+    sink.log(f"共 {len(queue.jobs)} 个任务，成功 {len(queue.jobs) - len(failed)}，失败 {len(failed)}", "info")
+    return EXIT_OK if not failed else EXIT_BUILD_FAILED
+
+
+def main(argv=None):
+    """命令行入口，返回退出码"""
+    parser = create_parser()
+    args = parser.parse_args(argv)
+    
+    if args.history is not None:
+        return _show_history(args.history)
+    
+    try:
+        if args.job_file:
+            configs = _load_job_file(args.job_file)
+        elif args.main_file:
+            configs = [_config_from_args(args)]
+        elif args.requirements:
+            configs = []
+        else:
+            parser.print_usage(sys.stderr)
+            print("错误: 需要指定主程序文件或 --job-file", file=sys.stderr)
+            return EXIT_USAGE
+    except (OSError, ValueError) as e:
+        print(f"错误: 无法读取任务文件: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    
+    for config in configs:
+        error = validate_config(config)
+        if error:
+            print(f"错误: {error}", file=sys.stderr)
+            return EXIT_USAGE
+    
+    if args.timing:
+        print(f"启动耗时: {(time.perf_counter() - _START) * 1000:.1f}ms", file=sys.stderr)
+    
+    sink = ConsoleLog(log_file=args.log_file, quiet=args.quiet)
+    core_options = {'wheelhouse': args.wheelhouse, 'index_url': args.index_url}
+    try:
+        if args.requirements or not configs:
+            if not _provision(args, sink):
+                return EXIT_BUILD_FAILED
+            if not configs:
+                return EXIT_OK
+        
+        if args.suggest_imports:
+            return _suggest_imports(configs, sink, core_options)
+        if args.benchmark_layouts:
+            return _benchmark_layouts(configs, sink, core_options)
+        
+        if len(configs) == 1 and not args.jobs:
+            return _run_single(configs[0], sink, core_options)
+        return _run_many(configs, sink, args.jobs, core_options)
+    finally:
+        sink.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,352 @@
+# fingerprint.py
+import ast
+import glob
+import hashlib
+import json
+import os
+import platform
+import re
+import sys
+import threading
+from pathlib import Path
+
+# 不影响打包产物内容的配置项，不参与指纹计算
+VOLATILE_KEYS = {
+    'output_dir', 'distpath', 'workpath', 'specpath', 'clean', 'use_cache', 'incremental',
+    'log_rules', 'build_daemon', 'spec_cache', 'build_log', 'profile_startup'
+}
+
+# 额外参数中引用输入文件/目录的PyInstaller选项及其值的格式：
+# source 为 SRC:DEST（SRC可以是通配符），pathlist 为以os.pathsep分隔的多个路径，
+# resource 为 FILE[,TYPE[,NAME[,LANGUAGE]]]，path 为单个路径
+PATH_OPTIONS = {
+    '--add-data': 'source',
+    '--add-binary': 'source',
+    '--paths': 'pathlist',
+    '--additional-hooks-dir': 'path',
+    '--runtime-hook': 'path',
+    '--splash': 'path',
+    '--version-file': 'path',
+    '--manifest': 'path',
+    '--icon': 'path',
+    '--resource': 'resource'
+}
+OPTION_ALIASES = {'-p': '--paths', '-i': '--icon', '-r': '--resource'}
+
+_hash_cache = {}
+_import_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _stat_key(path):
+    """(路径, 大小, 修改时间) 作为文件内容缓存的键"""
+    st = os.stat(path)
+    return (str(path), st.st_size, st.st_mtime_ns)
+
+
+def hash_file(path):
+    """计算文件内容的SHA-256，同一进程内按大小和mtime缓存"""
+    key = _stat_key(path)
+    with _cache_lock:
+        cached = _hash_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    result = digest.hexdigest()
+    
+    with _cache_lock:
+        _hash_cache[key] = result
+    return result
+
+
+def hash_path(path):
+    """计算文件或目录的内容哈希，目录包含相对路径与每个文件的哈希"""
+    path = Path(path)
+    if path.is_file():
+        return hash_file(path)
+    
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d != '__pycache__')
+        for name in sorted(files):
+            file_path = Path(root) / name
+            rel = file_path.relative_to(path).as_posix()
+            digest.update(rel.encode('utf-8'))
+            digest.update(hash_file(file_path).encode('ascii'))
+    return digest.hexdigest()
+
+
+def iter_imports(path):
+    """解析文件中的导入语句，返回 [(模块名, 相对层级, 导入的名称列表)]，按mtime缓存"""
+    key = _stat_key(path)
+    with _cache_lock:
+        cached = _import_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    imports = []
+    try:
+        with open(path, 'rb') as f:
+            tree = ast.parse(f.read(), filename=str(path))
+    except (SyntaxError, ValueError):
+        tree = None
+    
+    if tree is not None:
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    imports.append((alias.name, 0, []))
+            elif isinstance(node, ast.ImportFrom):
+                names = [alias.name for alias in node.names if alias.name != '*']
+                imports.append((node.module or '', node.level, names))
+    
+    with _cache_lock:
+        _import_cache[key] = imports
+    return imports
+
+
+def _module_file(base, parts):
+    """在base目录下查找模块文件：parts.py 或 parts/__init__.py"""
+    target = base.joinpath(*parts) if parts else base
+    if parts:
+        py_file = target.parent / f"{target.name}.py"
+        if py_file.is_file():
+            return py_file
+    init_file = target / "__init__.py"
+    if init_file.is_file():
+        return init_file
+    return None
+
+
+def _resolve_import(path, module, level, names, roots):
+    """把一条导入语句解析为本地文件列表（找不到的视为标准库/第三方包）"""
+    parts = module.split('.') if module else []
+    if level:
+        base = path.parent
+        for _ in range(level - 1):
+            base = base.parent
+        bases = [base]
+    else:
+        bases = roots
+    
+    found = []
+    for base in bases:
+        module_file = _module_file(base, parts)
+        if module_file is None and parts:
+            continue
+        
+        # 父包的 __init__.py 同样会被执行
+        for i in range(1, len(parts)):
+            init_file = _module_file(base, parts[:i])
+            if init_file is not None:
+                found.append(init_file)
+        if module_file is not None:
+            found.append(module_file)
+        
+        # from pkg import submodule
+        for name in names:
+            sub_file = _module_file(base, parts + [name])
+            if sub_file is not None:
+                found.append(sub_file)
+        if found:
+            break
+    return found
+
+
+def find_local_modules(main_file, search_paths=None):
+    """从主程序出发沿导入图查找所有本地模块文件（标准库与第三方包不在搜索根目录中，自然被排除）"""
+    main_path = Path(main_file).resolve()
+    roots = [main_path.parent] + [Path(p).resolve() for p in (search_paths or [])]
+    
+    seen = set()
+    ordered = []
+    stack = [main_path]
+    while stack:
+        path = stack.pop()
+        if path in seen:
+            continue
+        seen.add(path)
+        ordered.append(path)
+        for module, level, names in iter_imports(path):
+            for found in _resolve_import(path, module, level, names, roots):
+                found = found.resolve()
+                if found not in seen:
+                    stack.append(found)
+    return ordered
+
+
+def _option_paths(kind, value):
+    """从一个选项值中取出输入路径"""
+    if kind == 'source':
+        # 与PyInstaller相同：唯一一个不属于Windows盘符的 : 或 os.pathsep 是分隔符
+        separators = [
+            m for m in re.finditer(rf"(^\w:[/\\])|[:{re.escape(os.pathsep)}]", value) if not m[1]
+        ]
+        if len(separators) != 1:
+            return []
+        source = value[:separators[0].start()]
+        return sorted(glob.glob(source)) or [source]
+    if kind == 'pathlist':
+        return [path for path in value.split(os.pathsep) if path]
+    if kind == 'resource':
+        return [value.split(',', 1)[0]]
+    return [value]
+
+
+def extra_param_paths(extra_params):
+    """解析额外参数中引用的输入文件/目录，返回 {选项: [路径]}（短选项归入对应的长选项）"""
+    tokens = (extra_params or '').split()
+    found = {}
+    index = 0
+    while index < len(tokens):
+        option, has_value, value = tokens[index].partition('=')
+        option = OPTION_ALIASES.get(option, option)
+        index += 1
+        kind = PATH_OPTIONS.get(option)
+        if kind is None:
+            continue
+        if not has_value:
+            if index >= len(tokens):
+                break
+            value = tokens[index]
+            index += 1
+        found.setdefault(option, []).extend(_option_paths(kind, value))
+    return found
+
+
+def environment_info():
+    """解释器与PyInstaller版本信息（不导入PyInstaller本身）"""
+    from importlib import metadata
+    
+    try:
+        pyinstaller_version = metadata.version("pyinstaller")
+    except metadata.PackageNotFoundError:
+        pyinstaller_version = None
+    
+    return {
+        'python': sys.version,
+        'executable': sys.executable,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'pyinstaller': pyinstaller_version
+    }
+
+
+def _site_packages_dirs():
+    """当前解释器的site-packages目录（含用户目录），不包括脚本所在目录与工作目录等其他sys.path条目"""
+    import site
+    
+    dirs = list(getattr(site, 'getsitepackages', lambda: [])())
+    if site.ENABLE_USER_SITE:
+        dirs.append(site.getusersitepackages())
+    return dirs
+
+
+def site_packages_mtime():
+    """site-packages目录的最新修改时间，安装/升级/卸载包都会增删其中的 .dist-info 目录而改变它"""
+    latest = 0
+    for entry in _site_packages_dirs():
+        try:
+            if entry and os.path.isdir(entry):
+                latest = max(latest, os.stat(entry).st_mtime_ns)
+        except OSError:
+            pass
+    return latest
+
+
+_dependency_cache = {}
+
+
+def dependency_versions():
+    """当前解释器已安装的所有发行包及版本的哈希，按site-packages修改时间缓存"""
+    key = (sys.executable, site_packages_mtime())
+    with _cache_lock:
+        cached = _dependency_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    from importlib import metadata
+    
+    versions = sorted(
+        f"{(dist.metadata['Name'] or '').lower()}=={dist.version}"
+        for dist in metadata.distributions()
+    )
+    result = hashlib.sha256("\n".join(versions).encode('utf-8')).hexdigest()
+    with _cache_lock:
+        _dependency_cache.clear()
+        _dependency_cache[key] = result
+    return result
+
+
+def _relative_name(path, base):
+    """相对于主程序目录的路径名，用于让指纹与项目所在位置无关"""
+    try:
+        return Path(path).resolve().relative_to(base).as_posix()
+    except ValueError:
+        return str(Path(path).resolve())
+
+
+def config_flags(config):
+    """影响产物的配置项（不含文件内容）"""
+    flags = {
+        key: value for key, value in config.items()
+        if key not in VOLATILE_KEYS and key not in ('main_file', 'icon_file', 'resources')
+    }
+    flags['name'] = config.get('name') or Path(config['main_file']).stem
+    base = Path(config['main_file']).resolve().parent
+    if flags.get('resource_root'):
+        flags['resource_root'] = _relative_name(flags['resource_root'], base)
+    if flags.get('group_members'):
+        flags['group_members'] = [_relative_name(path, base) for path in flags['group_members']]
+    return flags
+    
+
+def source_hashes(config):
+    """主程序（多程序构建时包括其余程序）及其导入的本地模块的内容哈希"""
+    main_path = Path(config['main_file']).resolve()
+    # --paths/-p 指定的目录与主程序目录一样是导入搜索路径
+    search_paths = extra_param_paths(config.get('extra_params')).get('--paths', [])
+    hashes = {}
+    for entry in [main_path] + [Path(path).resolve() for path in config.get('group_members') or []]:
+        for path in find_local_modules(entry, search_paths):
+            hashes[_relative_name(path, main_path.parent)] = hash_file(path)
+    return hashes
+    
+
+def resource_hashes(config):
+    """资源文件、图标以及额外参数中引用的文件和目录（如 --add-data、--paths、--additional-hooks-dir）的内容哈希"""
+    base = Path(config['main_file']).resolve().parent
+    hashes = {
+        _relative_name(resource, base): hash_path(resource)
+        for resource in config.get('resources', [])
+        if os.path.exists(resource)
+    }
+    if config.get('icon_file'):
+        hashes['<icon>'] = hash_file(config['icon_file'])
+    if config.get('extra_params'):
+        for token in config['extra_params'].split():
+            token = token.split('=', 1)[-1]
+            if token and os.path.isfile(token):
+                hashes[_relative_name(token, base)] = hash_file(token)
+        # 目录整体参与哈希；不存在的路径记为None，创建后指纹随之变化
+        for option, paths in extra_param_paths(config['extra_params']).items():
+            for path in paths:
+                hashes[f"{option} {_relative_name(path, base)}"] = hash_path(path) if os.path.exists(path) else None
+    return hashes
+    
+
+def build_fingerprint(config):
+    """计算打包输入的指纹，返回 (指纹键, 组成明细)"""
+    parts = {
+        'environment': environment_info(),
+        'dependencies': dependency_versions(),
+        'flags': config_flags(config),
+        'sources': source_hashes(config),
+        'resources': resource_hashes(config)
+    }
+    key = hashlib.sha256(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+    return key, parts
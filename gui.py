@@ -2,7 +2,9 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import os
+import time
 import webbrowser
+from log_pipeline import LogBuffer
 
 # 主题配置
 THEME_COLOR = "#b6da3e"
@@ -72,8 +74,8 @@ class PlaceholderEntry(ttk.Entry):
         return self.get()
 
 class LogTextArea(scrolledtext.ScrolledText):
-    """日志显示区域"""
-    def __init__(self, parent, **kwargs):
+    """日志显示区域（虚拟化：控件只显示日志模型中的一个窗口）"""
+    def __init__(self, parent, max_lines=20000, view_lines=5000, page_lines=1000, **kwargs):
         super().__init__(parent, **kwargs)
         self.tag_configure("error", foreground="red")
         self.tag_configure("success", foreground="green")
@@ -81,19 +83,153 @@ class LogTextArea(scrolledtext.ScrolledText):
         self.tag_configure("warning", foreground="orange")
         self.config(state='disabled')
     
+        self._log_queue = None
+        self.poll_interval = 50
+        self.batch_size = 2000
+    
+        # 日志模型：内存最多max_lines行，更早的行压缩溢出到磁盘
+        self.model = LogBuffer(capacity=max_lines)
+        self.view_lines = min(view_lines, max_lines)
+        self.page_lines = page_lines
+        self._view_start = 0
+        self._view_end = 0
+        self._following = True
+        self._paging = False
+        
+        # 接管滚动回调，滚动到窗口边缘时按页载入
+        self.configure(yscrollcommand=self._on_yscroll)
+    
     def log(self, message, level="info"):
-        """添加日志"""
+        """添加日志（仅限Tk主线程调用，工作线程请通过LogQueue入队）"""
+        self.write_batch([(message, level)])
+    
+    def write_batch(self, records):
+        """批量写入日志：先写入模型，跟随末尾时整批只调用一次insert"""
+        if not records:
+            return
+        
+        self.model.extend(records)
+        if not self._following:
+            # 用户正在回看历史，新日志只进入模型，不打断阅读位置
+            return
+        
         self.config(state='normal')
-        self.insert('end', f"{message}\n", level)
+        self.insert('end', *self._format_chunks(records))
+        self._view_end = len(self.model)
+        self._trim_top()
         self.see('end')
         self.config(state='disabled')
-        self.update()
+    
+    def _format_chunks(self, records):
+        """相邻同级别的行合并，生成 insert 所需的 text, tags 交替参数"""
+        chunks = []
+        current_level = records[0][1]
+        current_lines = []
+        for message, level in records:
+            if level != current_level:
+                chunks.extend(("\n".join(current_lines) + "\n", current_level))
+                current_level = level
+                current_lines = []
+            current_lines.append(message)
+        chunks.extend(("\n".join(current_lines) + "\n", current_level))
+        return chunks
+        
+    def _trim_top(self):
+        """控件行数超出窗口时删除顶部多余行"""
+        overflow = (self._view_end - self._view_start) - self.view_lines
+        if overflow > 0:
+            self.delete('1.0', f'{overflow + 1}.0')
+            self._view_start += overflow
+    
+    def _trim_bottom(self):
+        """控件行数超出窗口时删除底部多余行"""
+        overflow = (self._view_end - self._view_start) - self.view_lines
+        if overflow > 0:
+            self.delete(f'{self.view_lines + 1}.0', 'end')
+            self._view_end -= overflow
+    
+    def _on_yscroll(self, first, last):
+        """滚动回调：更新滚动条，到达窗口边缘时安排分页载入"""
+        self.vbar.set(first, last)
+        if self._paging:
+            return
+        
+        if float(first) <= 0.0 and self._view_start > 0:
+            self._paging = True
+            self.after_idle(self._page_up)
+        elif float(last) >= 1.0 and self._view_end < len(self.model):
+            self._paging = True
+            self.after_idle(self._page_down)
+        elif float(last) < 1.0:
+            self._following = False
+        elif self._view_end >= len(self.model):
+            self._following = True
+    
+    def _page_up(self):
+        """向上翻页：从模型（或磁盘溢出文件）载入更早的一页"""
+        try:
+            start = max(0, self._view_start - self.page_lines)
+            records = self.model.get_range(start, self._view_start)
+            if not records:
+                return
+            
+            self._following = False
+            self.config(state='normal')
+            self.insert('1.0', *self._format_chunks(records))
+            self._view_start = start
+            self._trim_bottom()
+            self.config(state='disabled')
+            # 保持原先顶部那一行仍在视野内
+            self.yview(f'{len(records) + 1}.0')
+        finally:
+            self._paging = False
+    
+    def _page_down(self):
+        """向下翻页：载入窗口之后的一页，到达末尾后恢复自动跟随"""
+        try:
+            end = min(len(self.model), self._view_end + self.page_lines)
+            records = self.model.get_range(self._view_end, end)
+            if not records:
+                return
+            
+            self.config(state='normal')
+            self.insert('end', *self._format_chunks(records))
+            self._view_end = end
+            self._trim_top()
+            self.config(state='disabled')
+            self._following = self._view_end >= len(self.model)
+        finally:
+            self._paging = False
+    
+    def attach_queue(self, log_queue):
+        """绑定日志队列，并在主循环中定时批量取出"""
+        self._log_queue = log_queue
+        self.after(self.poll_interval, self._poll_queue)
+    
+    def _poll_queue(self):
+        """定时器回调：取出一批日志并渲染"""
+        if self._log_queue is None:
+            return
+        
+        start = time.perf_counter()
+        records = self._log_queue.drain(self.batch_size)
+        if records:
+            self.write_batch(records)
+            self._log_queue.busy_time += time.perf_counter() - start
+        
+        # 积压较多时尽快处理下一批，但仍让出主循环处理界面事件
+        delay = 1 if len(records) >= self.batch_size else self.poll_interval
+        self.after(delay, self._poll_queue)
     
     def clear(self):
         """清空日志"""
         self.config(state='normal')
         self.delete(1.0, 'end')
         self.config(state='disabled')
+        self.model.clear()
+        self._view_start = 0
+        self._view_end = 0
+        self._following = True
 
 class AnsPackerGUI:
     """主窗口GUI"""
@@ -261,6 +397,14 @@ class AnsPackerGUI:
             width=8
         ).pack(fill='x', pady=2)
         
+        ttk.Button(
+            resource_btn_frame,
+            text="添加目录",
+            command=self.add_resource_dir,
+            style='Custom.TButton',
+            width=8
+        ).pack(fill='x', pady=2)
+        
         ttk.Button(
             resource_btn_frame,
             text="删除",
@@ -290,6 +434,43 @@ class AnsPackerGUI:
             style='Custom.TButton'
         ).grid(row=3, column=2, pady=5)
         
+        # 多程序构建：与主程序一起分析、共享依赖的其他程序
+        ttk.Label(
+            file_frame,
+            text="其他程序:",
+            style='Custom.TLabel'
+        ).grid(row=4, column=0, sticky='w', pady=5)
+        
+        self.group_list = tk.Listbox(file_frame, height=2, width=38)
+        self.group_list.grid(row=4, column=1, sticky='ew', pady=5, padx=5)
+        
+        group_btn_frame = ttk.Frame(file_frame, style='Custom.TFrame')
+        group_btn_frame.grid(row=4, column=2, sticky='ns')
+        
+        ttk.Button(
+            group_btn_frame,
+            text="添加",
+            command=self.add_group_members,
+            style='Custom.TButton',
+            width=8
+        ).pack(fill='x', pady=2)
+        
+        ttk.Button(
+            group_btn_frame,
+            text="删除",
+            command=self.remove_group_member,
+            style='Custom.TButton',
+            width=8
+        ).pack(fill='x', pady=2)
+        
+        self.group_merge_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            group_btn_frame,
+            text="MERGE",
+            variable=self.group_merge_var,
+            style='Custom.TCheckbutton'
+        ).pack(fill='x', pady=2)
+        
         # 配置列权重
         file_frame.columnconfigure(1, weight=1)
     
@@ -311,6 +492,7 @@ class AnsPackerGUI:
         self.noconsole_var = tk.BooleanVar(value=True)
         self.debug_var = tk.BooleanVar(value=False)
         self.clean_var = tk.BooleanVar(value=True)
+        self.spec_cache_var = tk.BooleanVar(value=False)
         
         ttk.Checkbutton(
             checkbox_frame,
@@ -340,6 +522,66 @@ class AnsPackerGUI:
             style='Custom.TCheckbutton'
         ).pack(side='left', padx=10)
         
+        ttk.Checkbutton(
+            checkbox_frame,
+            text="缓存spec文件",
+            variable=self.spec_cache_var,
+            style='Custom.TCheckbutton'
+        ).pack(side='left', padx=10)
+        
+        # 构建优化选项
+        option_frame = ttk.Frame(param_frame, style='Custom.TFrame')
+        option_frame.pack(fill='x', pady=5)
+        
+        self.cache_var = tk.BooleanVar(value=False)
+        self.incremental_var = tk.BooleanVar(value=False)
+        self.resource_tree_var = tk.BooleanVar(value=False)
+        self.upx_var = tk.BooleanVar(value=False)
+        self.profile_startup_var = tk.BooleanVar(value=False)
+        self.daemon_var = tk.BooleanVar(value=False)
+        
+        ttk.Checkbutton(
+            option_frame,
+            text="构建缓存（输入未变时跳过打包）",
+            variable=self.cache_var,
+            style='Custom.TCheckbutton'
+        ).pack(side='left', padx=10)
+        
+        ttk.Checkbutton(
+            option_frame,
+            text="增量构建（按需自动--clean）",
+            variable=self.incremental_var,
+            style='Custom.TCheckbutton'
+        ).pack(side='left', padx=10)
+        
+        ttk.Checkbutton(
+            option_frame,
+            text="资源保留目录结构",
+            variable=self.resource_tree_var,
+            style='Custom.TCheckbutton'
+        ).pack(side='left', padx=10)
+        
+        ttk.Checkbutton(
+            option_frame,
+            text="并行UPX压缩",
+            variable=self.upx_var,
+            style='Custom.TCheckbutton'
+        ).pack(side='left', padx=10)
+        
+        ttk.Checkbutton(
+            option_frame,
+            text="启动耗时分析",
+            variable=self.profile_startup_var,
+            style='Custom.TCheckbutton'
+        ).pack(side='left', padx=10)
+        
+        ttk.Checkbutton(
+            option_frame,
+            text="常驻构建进程",
+            variable=self.daemon_var,
+            style='Custom.TCheckbutton'
+        ).pack(side='left', padx=10)
+        
         # 高级参数
         advanced_frame = ttk.Frame(param_frame, style='Custom.TFrame')
         advanced_frame.pack(fill='x', pady=10)
@@ -358,6 +600,14 @@ class AnsPackerGUI:
         )
         self.name_entry.grid(row=0, column=1, sticky='w')
         
+        ttk.Button(
+            advanced_frame,
+            text="对比模式",
+            command=self.on_benchmark_layouts,
+            style='Custom.TButton',
+            width=10
+        ).grid(row=0, column=2, sticky='w', padx=(5, 0))
+        
         # 额外参数
         ttk.Label(
             advanced_frame,
@@ -389,6 +639,14 @@ class AnsPackerGUI:
         self.param_preset_combobox.grid(row=2, column=1, sticky='ew', pady=(0, 10))
         self.param_preset_combobox.set("选择常用参数...")
         
+        ttk.Button(
+            advanced_frame,
+            text="分析导入",
+            command=self.on_analyze_imports,
+            style='Custom.TButton',
+            width=10
+        ).grid(row=2, column=2, sticky='w', padx=(5, 0), pady=(0, 10))
+        
         # 绑定选择事件
         self.param_preset_combobox.bind("<<ComboboxSelected>>", self.on_preset_selected)
         
@@ -448,6 +706,16 @@ class AnsPackerGUI:
             style='Custom.TLabel'
         ).pack(side='right', padx=5)
     
+        # 构建进程组的实时资源占用
+        self.resource_status_var = tk.StringVar(value="")
+        ttk.Label(
+            log_btn_frame,
+            textvariable=self.resource_status_var,
+            style='Custom.TLabel',
+            foreground=THEME_DARK,
+            font=('Consolas', 9)
+        ).pack(side='left', padx=10)
+    
     def create_control_buttons(self, parent):
         """控制按钮"""
         btn_frame = ttk.Frame(parent, style='Custom.TFrame')
@@ -460,6 +728,13 @@ class AnsPackerGUI:
             style='Custom.TButton'
         ).pack(side='left', padx=5)
         
+        ttk.Button(
+            btn_frame,
+            text="加入队列",
+            command=self.on_enqueue_pack,
+            style='Custom.TButton'
+        ).pack(side='left', padx=5)
+        
         ttk.Button(
             btn_frame,
             text="停止打包",
@@ -474,6 +749,13 @@ class AnsPackerGUI:
             style='Custom.TButton'
         ).pack(side='left', padx=5)
         
+        ttk.Button(
+            btn_frame,
+            text="构建历史",
+            command=self.show_history,
+            style='Custom.TButton'
+        ).pack(side='right', padx=5)
+        
         ttk.Button(
             btn_frame,
             text="关于",
@@ -493,21 +775,133 @@ class AnsPackerGUI:
         
         if selected in PARAMETER_PRESETS:
             # 添加参数到输入框
-            current_value = self.extra_params_entry.get_real_value()
-            
-            # 如果输入框已有内容，添加空格分隔
-            if current_value:
-                new_value = f"{current_value} {selected}"
-            else:
-                new_value = selected
-            
-            self.extra_params_entry._hide_placeholder()
-            self.extra_params_entry.delete(0, 'end')
-            self.extra_params_entry.insert(0, new_value)
+            self.append_extra_params(selected)
             
             # 显示参数说明
             self.preset_desc_label.config(text=f"说明: {PARAMETER_PRESETS[selected]}")
     
+    def append_extra_params(self, params):
+        """把参数追加到额外参数输入框"""
+        current_value = self.extra_params_entry.get_real_value()
+        
+        # 如果输入框已有内容，添加空格分隔
+        if current_value:
+            new_value = f"{current_value} {params}"
+        else:
+            new_value = params
+        
+        self.extra_params_entry._hide_placeholder()
+        self.extra_params_entry.delete(0, 'end')
+        self.extra_params_entry.insert(0, new_value)
+    
+    def on_analyze_imports(self):
+        """分析导入按钮点击事件"""
+        config = self.gather_config()
+        if not config['main_file'] or not os.path.exists(config['main_file']):
+            self.show_error("请先选择主程序文件！")
+            return
+        self.controller.analyze_imports(config)
+    
+    def offer_import_suggestions(self, suggestions):
+        """显示导入分析建议，确认后一键加入额外参数"""
+        params = suggestions.as_params()
+        if not params:
+            messagebox.showinfo("导入分析", "没有需要排除或补充的模块")
+            return
+        
+        lines = [f"排除 {name} ({size / 1024:.0f}KB)" for name, size in suggestions.excludes]
+        lines.extend(f"隐式导入 {name}" for name in suggestions.hidden_imports)
+        if messagebox.askyesno(
+            "导入分析",
+            "建议调整以下模块（静态分析结果，动态加载的模块请自行确认）:\n\n"
+            + "\n".join(lines) + "\n\n是否加入额外参数？"
+        ):
+            self.append_extra_params(params)
+    
+    def set_resource_status(self, text):
+        """更新日志区域下方的资源占用状态"""
+        if self.resource_status_var.get() != text:
+            self.resource_status_var.set(text)
+    
+    def on_benchmark_layouts(self):
+        """对比模式按钮点击事件"""
+        config = self.gather_config()
+        if not config['main_file'] or not os.path.exists(config['main_file']):
+            self.show_error("请先选择主程序文件！")
+            return
+        self.controller.benchmark_layouts(config)
+    
+    def offer_layout_recommendation(self, result):
+        """显示单文件/目录模式的对比结果，确认后切换到推荐的模式"""
+        layout = result['recommended']
+        if layout is None:
+            messagebox.showinfo("模式对比", result['reason'])
+            return
+        
+        names = {'onefile': "单文件模式", 'onedir': "目录模式"}
+        lines = []
+        for name, item in result['layouts'].items():
+            size = f"{item['size'] / 1024 ** 2:.1f}MB" if item['size'] is not None else "-"
+            lines.append(f"{names[name]}: 体积 {size}，冷启动 {item['cold_ms']}ms，热启动 {item['warm_median_ms']}ms")
+        if messagebox.askyesno(
+            "模式对比",
+            "\n".join(lines) + f"\n\n推荐{names[layout]}：{result['reason']}\n\n是否切换到{names[layout]}？"
+        ):
+            self.onefile_var.set(layout == 'onefile')
+    
+    def show_history(self):
+        """构建历史窗口：最近的构建记录，耗时或体积超过同一配置滚动中位数阈值的行高亮显示"""
+        from build_history import BuildHistory, describe_regression
+        try:
+            rows = BuildHistory().recent_with_regressions()
+        except Exception as e:
+            self.show_error(f"读取构建历史失败: {str(e)}")
+            return
+        
+        window = tk.Toplevel(self.root)
+        window.title("构建历史")
+        window.geometry("900x420")
+        window.configure(bg=BG_COLOR)
+        
+        columns = ('time', 'name', 'layout', 'duration', 'size', 'warnings', 'result', 'regression')
+        headings = ("时间", "名称", "模式", "耗时", "体积", "错误/警告", "结果", "回归")
+        widths = (130, 110, 70, 70, 80, 80, 70, 270)
+        tree = ttk.Treeview(window, columns=columns, show='headings')
+        for column, heading, width in zip(columns, headings, widths):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width, anchor='w')
+        tree.tag_configure('regression', background="#ffd6d6")
+        tree.tag_configure('failed', foreground="#c0392b")
+        
+        for entry, regressions in rows:
+            if entry['cancelled']:
+                result = "已取消"
+            elif entry['return_code'] == 0:
+                result = "缓存命中" if entry['from_cache'] else "成功"
+            else:
+                result = f"失败({entry['return_code']})"
+            size = entry['artifact_size']
+            tags = ()
+            if regressions:
+                tags = ('regression',)
+            elif result.startswith("失败"):
+                tags = ('failed',)
+            tree.insert('', 'end', tags=tags, values=(
+                time.strftime("%Y-%m-%d %H:%M", time.localtime(entry['started_at'])),
+                entry['name'],
+                entry['layout'],
+                f"{entry['duration']:.1f}s",
+                f"{size / 1024 ** 2:.1f}MB" if size is not None else "-",
+                f"{entry['errors']}/{entry['warnings']}",
+                result,
+                "；".join(describe_regression(item) for item in regressions)
+            ))
+        
+        scrollbar = ttk.Scrollbar(window, orient='vertical', command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side='right', fill='y')
+        tree.pack(fill='both', expand=True, padx=10, pady=10)
+    
     # 事件处理方法
     def select_main_file(self):
         """选择主程序文件"""
@@ -523,6 +917,25 @@ class AnsPackerGUI:
             self.main_file_entry.delete(0, 'end')
             self.main_file_entry.insert(0, filename)
     
+    def add_group_members(self):
+        """添加与主程序一起构建的其他程序（共用一次构建与依赖，默认放在同一个目录中）"""
+        filenames = filedialog.askopenfilenames(
+            title="选择其他程序文件",
+            filetypes=[
+                ("Python文件", "*.py"),
+                ("所有文件", "*.*")
+            ]
+        )
+        existing = set(self.group_list.get(0, 'end'))
+        for filename in filenames:
+            if filename not in existing:
+                self.group_list.insert('end', filename)
+    
+    def remove_group_member(self):
+        """删除选中的其他程序"""
+        for index in reversed(self.group_list.curselection()):
+            self.group_list.delete(index)
+    
     def select_icon(self):
         """选择图标文件"""
         filename = filedialog.askopenfilename(
@@ -556,6 +969,12 @@ class AnsPackerGUI:
         for file in files:
             self.resource_list.insert('end', file)
     
+    def add_resource_dir(self):
+        """添加资源目录（整个目录只生成一条 --add-data）"""
+        directory = filedialog.askdirectory(title="选择资源目录")
+        if directory:
+            self.resource_list.insert('end', directory)
+    
     def remove_resource(self):
         """删除选中的资源文件"""
         selection = self.resource_list.curselection()
@@ -573,6 +992,15 @@ class AnsPackerGUI:
         
         self.controller.start_packaging(config)
     
+    def on_enqueue_pack(self):
+        """加入队列按钮点击事件：当前配置进入并行构建队列"""
+        config = self.gather_config()
+        
+        if not self.validate_config(config):
+            return
+        
+        self.controller.enqueue_packaging(config)
+    
     def on_stop_pack(self):
         """停止打包按钮点击事件"""
         self.controller.stop_packaging()
@@ -588,6 +1016,8 @@ class AnsPackerGUI:
             self.icon_entry._show_placeholder()
             
             self.resource_list.delete(0, 'end')
+            self.group_list.delete(0, 'end')
+            self.group_merge_var.set(False)
             
             self.output_entry.delete(0, 'end')
             self.output_entry._show_placeholder()
@@ -603,6 +1033,13 @@ class AnsPackerGUI:
             self.noconsole_var.set(True)
             self.debug_var.set(False)
             self.clean_var.set(True)
+            self.spec_cache_var.set(False)
+            self.cache_var.set(False)
+            self.incremental_var.set(False)
+            self.resource_tree_var.set(False)
+            self.upx_var.set(False)
+            self.profile_startup_var.set(False)
+            self.daemon_var.set(False)
             
             # 重置预设选择
             self.param_preset_combobox.set("选择常用参数...")
@@ -629,6 +1066,15 @@ class AnsPackerGUI:
             'noconsole': self.noconsole_var.get(),
             'debug': self.debug_var.get(),
             'clean': self.clean_var.get(),
+            'use_cache': self.cache_var.get(),
+            'incremental': self.incremental_var.get(),
+            'resource_tree': self.resource_tree_var.get(),
+            'upx_compress': self.upx_var.get(),
+            'profile_startup': self.profile_startup_var.get(),
+            'build_daemon': self.daemon_var.get(),
+            'spec_cache': self.spec_cache_var.get(),
+            'group_members': list(self.group_list.get(0, 'end')),
+            'group_mode': 'merge' if self.group_merge_var.get() else 'shared',
             'extra_params': self.extra_params_entry.get_real_value()
         }
     
@@ -655,6 +1101,17 @@ class AnsPackerGUI:
             self.show_error(f"输出目录不存在：{config['output_dir']}")
             return False
         
+        for member in config['group_members']:
+            if not os.path.isfile(member):
+                self.show_error(f"程序文件不存在：{member}")
+                return False
+        
+        names = [config['name'] or os.path.splitext(os.path.basename(config['main_file']))[0]]
+        names.extend(os.path.splitext(os.path.basename(member))[0] for member in config['group_members'])
+        if len(set(names)) != len(names):
+            self.show_error("多程序构建中各程序的名称（文件名）不能重复")
+            return False
+        
         return True
     
     def show_error(self, message):
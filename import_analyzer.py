@@ -0,0 +1,271 @@
+# import_analyzer.py
+import ast
+import re
+import sys
+import threading
+from importlib.machinery import PathFinder
+from pathlib import Path
+from fingerprint import _stat_key
+
+# 小于该大小（压缩后）的未使用包不值得排除
+DEFAULT_MIN_EXCLUDE_SIZE = 64 * 1024
+
+# PyInstaller引导程序所在的源码，必须计入可达模块，否则会建议排除引导依赖的标准库
+LOADER_MODULES = (
+    "pyimod01_archive", "pyimod02_importers", "pyimod03_ctypes", "pyimod04_pywin32", "pyiboot01_bootstrap"
+)
+
+# 自测函数（pickle._test、multiprocessing.util._cleanup_tests）与测试类（TestFoo、FooTests）
+TEST_FUNCTION_PATTERN = re.compile(r'(?:^|_)tests?(?:_|$)')
+TEST_CLASS_PATTERN = re.compile(r'^Test|Tests?$')
+
+_scan_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _find_spec(name, search_path, cache):
+    """不导入模块，仅按路径查找模块规格；找不到时返回None"""
+    if name in cache:
+        return cache[name]
+    spec = None
+    parent, _, _ = name.rpartition('.')
+    try:
+        if not parent:
+            if name in sys.builtin_module_names:
+                spec = False
+            else:
+                spec = PathFinder.find_spec(name, search_path)
+        else:
+            parent_spec = _find_spec(parent, search_path, cache)
+            locations = parent_spec.submodule_search_locations if parent_spec else None
+            if locations:
+                spec = PathFinder.find_spec(name, list(locations))
+    except (ImportError, ValueError):
+        spec = None
+    cache[name] = spec
+    return spec
+
+
+def _is_main_guard(test):
+    """if __name__ == "__main__":"""
+    return (
+        isinstance(test, ast.Compare) and isinstance(test.left, ast.Name) and test.left.id == '__name__'
+        and len(test.comparators) == 1 and isinstance(test.comparators[0], ast.Constant)
+        and test.comparators[0].value == '__main__'
+    )
+
+
+def _is_type_checking(test):
+    """if TYPE_CHECKING: / if typing.TYPE_CHECKING:"""
+    return (isinstance(test, ast.Name) and test.id == 'TYPE_CHECKING') or \
+        (isinstance(test, ast.Attribute) and test.attr == 'TYPE_CHECKING')
+
+
+def _walk_imports(nodes, scope, imports, dynamic):
+    """只遍历语句（不进入表达式），记录每条导入所在的作用域"""
+    for node in nodes:
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imports.append((alias.name, 0, [], scope))
+        elif isinstance(node, ast.ImportFrom):
+            names = [alias.name for alias in node.names if alias.name != '*']
+            imports.append((node.module or '', node.level, names, scope))
+        elif isinstance(node, ast.If) and _is_main_guard(node.test):
+            _walk_imports(node.body, 'main', imports, dynamic)
+            _walk_imports(node.orelse, scope, imports, dynamic)
+        elif isinstance(node, ast.If) and _is_type_checking(node.test):
+            _walk_imports(node.orelse, scope, imports, dynamic)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            pattern = TEST_CLASS_PATTERN if isinstance(node, ast.ClassDef) else TEST_FUNCTION_PATTERN
+            _walk_imports(node.body, 'test' if pattern.search(node.name) else scope, imports, dynamic)
+        else:
+            if isinstance(node, (ast.Expr, ast.Assign)) and isinstance(node.value, ast.Call):
+                name = _dynamic_import_name(node.value)
+                if name is not None:
+                    dynamic.append((name, scope))
+            for field in ('body', 'orelse', 'finalbody', 'handlers', 'cases'):
+                children = getattr(node, field, None)
+                if children:
+                    _walk_imports(children, scope, imports, dynamic)
+
+
+def _dynamic_import_name(call):
+    """importlib.import_module("x") / __import__("x") 中的模块名"""
+    func = call.func
+    func_name = func.attr if isinstance(func, ast.Attribute) else getattr(func, 'id', None)
+    if func_name not in ('import_module', '__import__') or not call.args:
+        return None
+    arg = call.args[0]
+    if isinstance(arg, ast.Constant) and isinstance(arg.value, str) and not arg.value.startswith('.'):
+        return arg.value
+    return None
+
+
+def scan_imports(path):
+    """解析文件中的导入，返回 ([(模块名, 相对层级, 导入的名称, 作用域)], [(动态导入的模块名, 作用域)])，按mtime缓存
+    
+    作用域: 'module' 普通导入，'main' 位于 if __name__ == "__main__" 中，'test' 位于测试函数/类中；
+    if TYPE_CHECKING 中的导入运行时不会执行，直接忽略。
+    """
+    key = _stat_key(path)
+    with _cache_lock:
+        cached = _scan_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    imports = []
+    dynamic = []
+    try:
+        with open(path, 'rb') as f:
+            tree = ast.parse(f.read(), filename=str(path))
+        _walk_imports(tree.body, 'module', imports, dynamic)
+    except (SyntaxError, ValueError, RecursionError):
+        pass
+    
+    with _cache_lock:
+        _scan_cache[key] = (imports, dynamic)
+    return imports, dynamic
+
+
+def reachable_modules(entry_files, search_paths=None):
+    """从入口文件出发，用AST沿导入图查找所有可静态到达的模块，返回 {模块名: 源文件或None}
+    
+    try/except 与函数内部的导入同样计入，结果偏保守；其他模块的自测代码
+    （__main__ 块与测试函数）中的导入不计入；C扩展模块的导入无法分析。
+    """
+    search_path = [str(Path(p).resolve()) for p in (search_paths or [])] + [p for p in sys.path if p]
+    spec_cache = {}
+    modules = {}
+    queue = []
+    
+    def add(name, optional=False):
+        """加入模块及其父包；optional为真时找不到不记录（from x import 属性）"""
+        parts = name.split('.')
+        for i in range(1, len(parts) + 1):
+            module = '.'.join(parts[:i])
+            if module in modules:
+                continue
+            spec = _find_spec(module, search_path, spec_cache)
+            if spec is None and (optional and i == len(parts)):
+                return
+            origin = spec.origin if spec else None
+            is_package = bool(spec and spec.submodule_search_locations)
+            modules[module] = origin
+            if origin and origin.endswith('.py'):
+                queue.append((module, Path(origin), is_package))
+    
+    entry_names = set()
+    for name, path in entry_files:
+        modules[name] = str(path)
+        entry_names.add(name)
+        queue.append((name, Path(path), False))
+    
+    while queue:
+        name, path, is_package = queue.pop()
+        imports, dynamic = scan_imports(path)
+        for module, level, names, scope in imports:
+            if scope != 'module' and name not in entry_names:
+                continue
+            if level:
+                package = name if is_package else name.rpartition('.')[0]
+                for _ in range(level - 1):
+                    package = package.rpartition('.')[0]
+                target = '.'.join(p for p in (package, module) if p)
+                if not target:
+                    continue
+            else:
+                target = module
+            add(target)
+            for imported in names:
+                add(f"{target}.{imported}", optional=True)
+        for module, scope in dynamic:
+            if scope == 'module' or name in entry_names:
+                add(module, optional=True)
+    return modules
+
+
+def _loader_entries():
+    """PyInstaller引导模块的源码路径（通过规格查找，不导入PyInstaller）"""
+    spec = PathFinder.find_spec("PyInstaller", [p for p in sys.path if p])
+    if spec is None or not spec.submodule_search_locations:
+        return [], None
+    root = Path(list(spec.submodule_search_locations)[0])
+    entries = []
+    for name in LOADER_MODULES:
+        path = root / "loader" / f"{name}.py"
+        if path.is_file():
+            entries.append((name, path))
+    return entries, root / "hooks" / "rthooks"
+
+
+class ImportSuggestions:
+    """静态导入分析结果：建议排除的包与建议显式声明的隐式导入"""
+    
+    def __init__(self, reachable, collected, excludes, hidden_imports):
+        self.reachable = reachable
+        self.collected = collected
+        self.excludes = excludes
+        self.hidden_imports = hidden_imports
+    
+    def as_params(self):
+        """可直接追加到额外参数中的PyInstaller参数"""
+        params = [f"--exclude-module {name}" for name, _ in self.excludes]
+        params.extend(f"--hidden-import {name}" for name in self.hidden_imports)
+        return " ".join(params)
+    
+    def summary_lines(self):
+        """日志中显示的分析结果"""
+        lines = [f"静态可达模块: {len(self.reachable)} 个，产物中的Python包: {len(self.collected)} 个"]
+        if self.excludes:
+            total = sum(size for _, size in self.excludes)
+            lines.append(f"未被代码导入的包（可排除，约 {total / 1024:.0f}KB）:")
+            for name, size in self.excludes:
+                lines.append(f"  {size / 1024:>8.1f}KB  {name}")
+        if self.hidden_imports:
+            lines.append("动态导入但未被收集的模块（建议 --hidden-import）:")
+            for name in self.hidden_imports:
+                lines.append(f"  {name}")
+        if not self.excludes and not self.hidden_imports:
+            lines.append("没有需要调整的导入")
+        return lines
+
+
+def suggest_imports(main_file, bundle_report, search_paths=None, min_size=DEFAULT_MIN_EXCLUDE_SIZE):
+    """对比静态导入图与上一次构建实际收集的内容，给出排除/隐式导入建议
+    
+    bundle_report 为 bundle_analyzer.analyze_artifact 的结果；只建议排除体积较大且
+    从主程序、本地模块及PyInstaller引导/运行时钩子都无法到达的顶层包。
+    """
+    main_path = Path(main_file).resolve()
+    search_paths = [main_path.parent] + [Path(p) for p in (search_paths or [])]
+    
+    entries = [('__main__', main_path)]
+    loader_entries, rthooks_dir = _loader_entries()
+    entries.extend(loader_entries)
+    # 产物中的运行时钩子脚本（pyi_rth_*）
+    if rthooks_dir is not None:
+        for name, item in bundle_report['files'].items():
+            if item['kind'] == 'script' and (rthooks_dir / f"{name}.py").is_file():
+                entries.append((name, rthooks_dir / f"{name}.py"))
+    
+    reachable = reachable_modules(entries, search_paths)
+    reachable_top = {name.split('.', 1)[0] for name in reachable}
+    
+    collected = bundle_report['packages']
+    excludes = sorted(
+        ((name, item['compressed']) for name, item in collected.items()
+         if name not in reachable_top and item['compressed'] >= min_size),
+        key=lambda item: item[1],
+        reverse=True
+    )
+    
+    # 项目代码中以字符串动态导入、但没有被收集的模块
+    roots = tuple(str(p.resolve()) for p in search_paths)
+    hidden_imports = []
+    for origin in reachable.values():
+        if not origin or not origin.endswith('.py') or not origin.startswith(roots):
+            continue
+        for name, _ in scan_imports(Path(origin))[1]:
+            if name.split('.', 1)[0] not in collected and name not in hidden_imports:
+                hidden_imports.append(name)
+    return ImportSuggestions(reachable, collected, excludes, hidden_imports)
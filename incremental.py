@@ -0,0 +1,82 @@
+# incremental.py
+import json
+import os
+from pathlib import Path
+from fingerprint import (
+    config_flags, dependency_versions, environment_info, resource_hashes, source_hashes
+)
+
+STATE_FILE_NAME = "anspacker-state.json"
+
+
+class IncrementalPlan:
+    """一次增量构建的决策：是否需要 --clean，以及自上次构建以来的变化"""
+    
+    def __init__(self, state_path, state, clean_required, reasons, changed_sources, changed_resources):
+        self.state_path = state_path
+        self.state = state
+        self.clean_required = clean_required
+        self.reasons = reasons
+        self.changed_sources = changed_sources
+        self.changed_resources = changed_resources
+    
+    def save(self):
+        """构建成功后保存本次状态，作为下次增量构建的基准"""
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.state_path)
+
+
+def _changed_keys(old, new):
+    """两个 {名称: 哈希} 字典之间新增、删除或修改的名称"""
+    return sorted(name for name in set(old) | set(new) if old.get(name) != new.get(name))
+
+
+def load_state(state_path):
+    """读取上次构建保存的状态，不存在或损坏时返回None"""
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def plan_incremental_build(config, work_dir, name):
+    """对比上次构建状态，决定是否需要让PyInstaller清理分析缓存
+    
+    源码与资源的变化由PyInstaller自身按时间戳增量处理，只有解释器、依赖版本
+    或打包参数变化时旧的分析缓存才可能产出错误的二进制，此时才需要 --clean。
+    """
+    state_path = Path(work_dir) / name / STATE_FILE_NAME
+    state = {
+        'environment': environment_info(),
+        'dependencies': dependency_versions(),
+        'flags': config_flags(config),
+        'sources': source_hashes(config),
+        'resources': resource_hashes(config)
+    }
+    
+    previous = load_state(state_path)
+    reasons = []
+    if previous is None:
+        reasons.append("没有上次构建的记录")
+    else:
+        if previous.get('environment') != state['environment']:
+            reasons.append("Python解释器或PyInstaller版本已变化")
+        if previous.get('dependencies') != state['dependencies']:
+            reasons.append("已安装的依赖包版本已变化")
+        if previous.get('flags') != state['flags']:
+            changed_flags = _changed_keys(previous.get('flags', {}), state['flags'])
+            reasons.append(f"打包参数已变化: {', '.join(changed_flags)}")
+    
+    previous = previous or {}
+    return IncrementalPlan(
+        state_path,
+        state,
+        clean_required=bool(reasons),
+        reasons=reasons,
+        changed_sources=_changed_keys(previous.get('sources', {}), state['sources']),
+        changed_resources=_changed_keys(previous.get('resources', {}), state['resources'])
+    )
@@ -0,0 +1,86 @@
+# layout_benchmark.py
+from pathlib import Path
+
+LAYOUTS = ('onedir', 'onefile')
+
+# 单文件模式热启动不超过目录模式的该倍数加该毫秒数时，仍推荐便于分发的单文件模式
+ONEFILE_SLOWDOWN_RATIO = 1.25
+ONEFILE_SLOWDOWN_MS = 150
+
+
+def variant_config(config, layout, dist_root, clean):
+    """某一打包模式的配置：产物输出到 dist/<模式>，两次构建共用workpath以复用Analysis结果
+    
+    多程序配置只对比主程序：共享目录构建会强制目录模式，两种模式会测到同一个布局。
+    """
+    return dict(
+        config,
+        onefile=(layout == 'onefile'),
+        group_members=[],
+        distpath=str(Path(dist_root) / layout),
+        clean=clean,
+        profile_startup=True,
+        use_cache=False,
+        incremental=False
+    )
+
+
+def measurement(return_code, report):
+    """从构建报告中取出对比所需的数据"""
+    report = report or {}
+    bundle = report.get('bundle') or {}
+    startup = report.get('startup') or {}
+    resources = report.get('resources') or {}
+    return {
+        'return_code': return_code,
+        'build_time_s': report.get('wall_time_s'),
+        'size': bundle.get('disk_size'),
+        'peak_rss': resources.get('peak_rss'),
+        'cold_ms': startup.get('cold_ms'),
+        'warm_median_ms': startup.get('warm_median_ms'),
+        'extract_median_ms': startup.get('extract_median_ms')
+    }
+
+
+def recommend(results):
+    """根据实测数据推荐打包模式，返回 (模式, 原因)；数据不完整时返回 (None, 原因)"""
+    onedir = results.get('onedir') or {}
+    onefile = results.get('onefile') or {}
+    if onedir.get('return_code') != 0 or onefile.get('return_code') != 0:
+        return None, "至少有一种模式构建失败，无法比较"
+    if onedir.get('warm_median_ms') is None or onefile.get('warm_median_ms') is None:
+        return None, "没有得到启动耗时数据，无法比较"
+    
+    limit = onedir['warm_median_ms'] * ONEFILE_SLOWDOWN_RATIO + ONEFILE_SLOWDOWN_MS
+    extra = onefile['warm_median_ms'] - onedir['warm_median_ms']
+    if onefile['warm_median_ms'] <= limit:
+        return 'onefile', f"单文件模式每次启动多 {extra:.0f}ms，影响不大，分发只需一个文件"
+    return 'onedir', f"单文件模式每次启动需要解压，比目录模式慢 {extra:.0f}ms"
+
+
+def summary_lines(results, layout, reason):
+    """日志中显示的对比表"""
+    def fmt(value, unit="ms"):
+        if value is None:
+            return "-"
+        if unit == "MB":
+            return f"{value / 1024 ** 2:.1f}MB"
+        if unit == "s":
+            return f"{value:.1f}s"
+        return f"{value:.0f}ms"
+    
+    # 中文表头每个字占两列，按显示宽度手工对齐
+    lines = ["模式          体积     构建   冷启动   热启动     解压"]
+    for name in LAYOUTS:
+        item = results.get(name)
+        if item is None:
+            continue
+        if item['return_code'] != 0:
+            lines.append(f"{name:<8}  构建失败（返回码 {item['return_code']}）")
+            continue
+        lines.append(
+            f"{name:<8}{fmt(item['size'], 'MB'):>10}{fmt(item['build_time_s'], 's'):>9}"
+            f"{fmt(item['cold_ms']):>9}{fmt(item['warm_median_ms']):>9}{fmt(item['extract_median_ms']):>9}"
+        )
+    lines.append(f"推荐: {layout}（{reason}）" if layout else f"无法推荐: {reason}")
+    return lines
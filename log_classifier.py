@@ -0,0 +1,99 @@
+# log_classifier.py
+import re
+
+LEVELS = ("error", "warning", "success", "info")
+
+# PyInstaller日志行前缀: "<启动后毫秒数> <级别>: "，绝大多数输出行只需这一次匹配
+PREFIX_PATTERN = re.compile(r'(\d+) ([A-Z]+): ')
+
+PREFIX_LEVELS = {
+    'TRACE': 'info', 'DEBUG': 'info', 'INFO': 'info',
+    'DEPRECATION': 'warning', 'WARNING': 'warning',
+    'ERROR': 'error', 'CRITICAL': 'error', 'FATAL': 'error'
+}
+
+# INFO级别中表示某一步成功结束的消息
+SUCCESS_PREFIX = "Build complete!"
+SUCCESS_SUFFIX = "completed successfully."
+
+# 无前缀的行（Python回溯、pip输出等）在小写后的整行中查找第一个关键字。
+# 按首字母展开以便正则引擎快速跳过无关字符；关键字前后不能紧贴路径分隔符或点号，
+# 避免把 errorhandler/、hook-error.py 之类的路径误判（异常与警告类名如 SyntaxError、DeprecationWarning 允许前接字母）
+_END = r'(?!\w|[/\\.]\w)'
+KEYWORD_PATTERN = re.compile(
+    r'e(?<![/\\.]e)(?:rrors?|xceptions?)' + _END
+    + r'|t(?<![/\\.\w]t)raceback' + _END
+    + r'|f(?<![/\\.\w]f)(?:ailed|atal|inished)' + _END
+    + r'|w(?<![/\\.]w)arn(?:ings?|s|ed)?' + _END
+    + r'|s(?<![/\\.\w]s)uccess(?:ful(?:ly)?)?' + _END
+    + r'|c(?<![/\\.\w]c)ompleted?' + _END
+)
+
+# 关键字前两个字母 -> 级别
+KEYWORD_LEVELS = {
+    'er': 'error', 'ex': 'error', 'tr': 'error', 'fa': 'error',
+    'wa': 'warning',
+    'su': 'success', 'co': 'success', 'fi': 'success'
+}
+
+
+class LogClassifier:
+    """日志分级引擎：优先读取PyInstaller的级别前缀，其余行用一个预编译的关键字正则分类
+    
+    rules 为可选的自定义规则 [(正则, 级别), ...]，优先于内置分类，多条规则都匹配时取靠前的一条；
+    所有自定义规则合并成一个正则，没有配置规则时不产生任何额外开销。
+    """
+    
+    def __init__(self, rules=None, default_level="info"):
+        self.default_level = default_level
+        self.counts = dict.fromkeys(LEVELS, 0)
+        self._rule_pattern = None
+        self._rule_levels = {}
+        if rules:
+            self._compile_rules(rules)
+    
+    def _compile_rules(self, rules):
+        """把自定义规则编译为一个带命名分组的正则
+        
+        每个分支都从行首以 .*? 开始，分支在尝试完整行之后才轮到下一个，
+        因此按规则顺序而不是匹配位置的先后决定结果。
+        """
+        parts = []
+        for i, (pattern, level) in enumerate(rules):
+            if level not in LEVELS:
+                raise ValueError(f"未知的日志级别: {level}")
+            re.compile(pattern)  # 提前暴露单条规则的语法错误
+            parts.append(f".*?(?P<r{i}>{pattern})")
+            self._rule_levels[f"r{i}"] = level
+        self._rule_pattern = re.compile("|".join(parts), re.DOTALL)
+    
+    def classify(self, line):
+        """返回 (级别, PyInstaller时间戳毫秒或None, 去掉前缀的消息)"""
+        match = PREFIX_PATTERN.match(line)
+        level = PREFIX_LEVELS.get(match.group(2)) if match is not None else None
+        if level is not None:
+            ms = int(match.group(1))
+            message = line[match.end():]
+            if level == 'info' and (message.endswith(SUCCESS_SUFFIX) or message.startswith(SUCCESS_PREFIX)):
+                level = 'success'
+        else:
+            ms = None
+            message = line
+            keyword = KEYWORD_PATTERN.search(line.lower())
+            level = KEYWORD_LEVELS[keyword.group()[:2]] if keyword is not None else self.default_level
+        
+        if self._rule_pattern is not None:
+            rule = self._rule_pattern.match(line)
+            if rule is not None:
+                level = self._rule_levels[rule.lastgroup]
+        
+        self.counts[level] += 1
+        return level, ms, message
+    
+    def summary(self):
+        """各级别的行数统计"""
+        return dict(self.counts)
+    
+    def reset(self):
+        """清零统计"""
+        self.counts = dict.fromkeys(LEVELS, 0)
@@ -0,0 +1,386 @@
+# log_pipeline.py
+import collections
+import gzip
+import itertools
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# 构建日志目录中保留的压缩日志数量
+MAX_LOG_ARCHIVES = 100
+# 单次写入的最大行数
+WRITE_BATCH_LINES = 5000
+
+
+class LogQueue:
+    """线程安全的日志队列：工作线程只负责入队，由GUI主循环定时批量取出"""
+    
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self.drained_lines = 0
+        self.batches = 0
+        self.busy_time = 0.0
+        self._first_drain = None
+        self._last_drain = None
+    
+    def log(self, message, level="info"):
+        """入队一条日志，可在任意线程调用，永不阻塞"""
+        self._queue.put((message, level))
+    
+    def drain(self, max_items=2000):
+        """取出最多max_items条日志，返回[(message, level), ...]"""
+        records = []
+        try:
+            while len(records) < max_items:
+                records.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        
+        if records:
+            now = time.perf_counter()
+            if self._first_drain is None:
+                self._first_drain = now
+            self._last_drain = now
+            self.drained_lines += len(records)
+            self.batches += 1
+        return records
+    
+    def pending(self):
+        """队列中尚未取出的日志条数（近似值）"""
+        return self._queue.qsize()
+    
+    def clear(self):
+        """丢弃队列中所有未取出的日志"""
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+    
+    def reset_stats(self):
+        """重置吞吐统计"""
+        self.drained_lines = 0
+        self.batches = 0
+        self.busy_time = 0.0
+        self._first_drain = None
+        self._last_drain = None
+    
+    def stats(self):
+        """返回吞吐统计：总行数、批次数、平均批大小、行/秒、渲染耗时"""
+        elapsed = 0.0
+        if self._first_drain is not None:
+            elapsed = self._last_drain - self._first_drain
+        return {
+            'lines': self.drained_lines,
+            'batches': self.batches,
+            'avg_batch': self.drained_lines / self.batches if self.batches else 0,
+            'lines_per_sec': self.drained_lines / elapsed if elapsed > 0 else 0,
+            'render_time': self.busy_time
+        }
+
+
+class LogSpillFile:
+    """压缩的日志溢出文件：按固定行数分块，每块单独zlib压缩，支持按块随机读取"""
+    
+    def __init__(self, block_lines=1000, cache_blocks=4):
+        self.block_lines = block_lines
+        self.cache_blocks = cache_blocks
+        self._file = tempfile.TemporaryFile(prefix="anspacker-log-")
+        self._index = []  # 每块: (偏移, 压缩长度)
+        self._pending = []
+        self._cache = collections.OrderedDict()
+        self.total_lines = 0
+        self.compressed_bytes = 0
+    
+    def append(self, records):
+        """追加被淘汰的日志行，凑满一块即压缩写盘"""
+        self._pending.extend(records)
+        self.total_lines += len(records)
+        while len(self._pending) >= self.block_lines:
+            block = self._pending[:self.block_lines]
+            del self._pending[:self.block_lines]
+            self._write_block(block)
+    
+    def _write_block(self, block):
+        data = zlib.compress(json.dumps(block, ensure_ascii=False).encode('utf-8'), 6)
+        self._file.seek(0, 2)
+        offset = self._file.tell()
+        self._file.write(data)
+        self._index.append((offset, len(data)))
+        self.compressed_bytes += len(data)
+    
+    def _read_block(self, block_no):
+        """读取并解压一块，最近读取的块保存在小型LRU缓存中"""
+        if block_no in self._cache:
+            self._cache.move_to_end(block_no)
+            return self._cache[block_no]
+        
+        offset, length = self._index[block_no]
+        self._file.seek(offset)
+        block = [tuple(record) for record in json.loads(zlib.decompress(self._file.read(length)))]
+        self._cache[block_no] = block
+        if len(self._cache) > self.cache_blocks:
+            self._cache.popitem(last=False)
+        return block
+    
+    def get_range(self, start, end):
+        """按需读取 [start, end) 范围内的日志行"""
+        start = max(0, start)
+        end = min(end, self.total_lines)
+        records = []
+        flushed = len(self._index) * self.block_lines
+        pos = start
+        while pos < end:
+            if pos >= flushed:
+                records.extend(self._pending[pos - flushed:end - flushed])
+                break
+            block_no = pos // self.block_lines
+            block_start = block_no * self.block_lines
+            block = self._read_block(block_no)
+            take_end = min(end, block_start + self.block_lines)
+            records.extend(block[pos - block_start:take_end - block_start])
+            pos = take_end
+        return records
+    
+    def close(self):
+        """关闭并删除溢出文件"""
+        self._cache.clear()
+        self._pending = []
+        self._index = []
+        self._file.close()
+
+
+class LogBuffer:
+    """环形缓冲日志模型：内存中最多保留capacity行，更早的行压缩溢出到磁盘"""
+    
+    def __init__(self, capacity=20000, spill_block_lines=1000):
+        self.capacity = capacity
+        self.spill_block_lines = spill_block_lines
+        self._lines = collections.deque()
+        self._spill = None
+    
+    def __len__(self):
+        return self.spilled + len(self._lines)
+    
+    @property
+    def spilled(self):
+        """已溢出到磁盘的行数"""
+        return self._spill.total_lines if self._spill else 0
+    
+    def extend(self, records):
+        """追加日志行，超出容量的最旧行溢出到磁盘"""
+        self._lines.extend(records)
+        overflow = len(self._lines) - self.capacity
+        if overflow > 0:
+            if self._spill is None:
+                self._spill = LogSpillFile(self.spill_block_lines)
+            self._spill.append([self._lines.popleft() for _ in range(overflow)])
+    
+    def get_range(self, start, end):
+        """读取 [start, end) 范围内的日志行，必要时从溢出文件分页载入"""
+        start = max(0, start)
+        end = min(end, len(self))
+        if start >= end:
+            return []
+        
+        records = []
+        spilled = self.spilled
+        if start < spilled:
+            records.extend(self._spill.get_range(start, min(end, spilled)))
+        if end > spilled:
+            records.extend(itertools.islice(self._lines, max(start - spilled, 0), end - spilled))
+        return records
+    
+    def clear(self):
+        """清空内存与溢出文件"""
+        self._lines.clear()
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+
+class TeeLog:
+    """把每条日志同时转发给多个日志接收者"""
+    
+    def __init__(self, *targets):
+        self.targets = targets
+    
+    def log(self, message, level="info"):
+        for target in self.targets:
+            target.log(message, level)
+
+
+def _is_locked(path):
+    """日志是否仍被某个写入线程持有（POSIX下用flock判断；Windows下由 rotate_logs 改名失败来判断）"""
+    if fcntl is None:
+        return False
+    try:
+        with open(path, 'rb') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    except BlockingIOError:
+        return True
+    except OSError:
+        return False
+    return False
+
+
+def rotate_logs(directory, exclude=None, max_archives=MAX_LOG_ARCHIVES):
+    """把目录中已结束构建的 .log 压缩为 .log.gz，只保留最新的 max_archives 个压缩日志"""
+    directory = Path(directory)
+    for path in directory.glob("*.log"):
+        if path == exclude or _is_locked(path):
+            continue
+        # 压缩前先改名占用：Windows下仍被打开的日志不能改名，直接跳过而不是压缩完才发现删不掉；
+        # 同时运行的另一次压缩也不会再处理同一个文件
+        claimed = path.with_name(path.name + ".rotating")
+        try:
+            os.rename(path, claimed)
+        except OSError:
+            continue
+        archive = path.with_name(path.name + ".gz")
+        try:
+            with open(claimed, 'rb') as src, gzip.open(archive, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            claimed.unlink()
+        except OSError:
+            try:
+                archive.unlink()
+            except OSError:
+                pass
+            try:
+                os.rename(claimed, path)
+            except OSError:
+                pass
+    
+    archives = []
+    for path in directory.glob("*.log.gz"):
+        try:
+            archives.append((path.stat().st_mtime, path))
+        except OSError:
+            pass
+    archives.sort(reverse=True)
+    for _, path in archives[max_archives:]:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+class LogFileWriter:
+    """构建日志文件：log() 只入队，后台线程批量写入并在每批后flush
+    
+    构建输出的读取循环不会等待磁盘I/O；每批写完即flush，构建过程中可以用 tail -f 跟踪。
+    打开新日志时，之前构建的日志在后台线程中压缩为 .log.gz。
+    """
+    
+    LEVEL_NAMES = {'error': "ERROR", 'warning': "WARN", 'success': "OK", 'info': "INFO"}
+    
+    def __init__(self, path, rotate=True, batch_lines=WRITE_BATCH_LINES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_lines = batch_lines
+        self.lines = 0
+        self.batches = 0
+        self.error = None
+        self._queue = queue.SimpleQueue()
+        # 在调用线程中打开文件，路径无效等错误直接抛给调用者
+        self._file = self._open_locked()
+        self._thread = threading.Thread(
+            target=self._run, args=(rotate,), name="anspacker-log-writer", daemon=True
+        )
+        self._thread.start()
+    
+    def _open_locked(self):
+        """打开日志文件并加锁
+        
+        POSIX下新文件先以临时名创建并flock，加锁后再改为正式名称，rotate_logs 不会看到尚未加锁的日志；
+        Windows下打开着的文件不能改名，rotate_logs 据此跳过，直接打开即可。
+        """
+        def open_file(path):
+            return open(path, 'a', encoding='utf-8', errors='backslashreplace', buffering=1024 * 1024)
+        
+        if fcntl is None:
+            return open_file(self.path)
+        if self.path.exists():
+            f = open_file(self.path)
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return f
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+        f = open_file(tmp_path)
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            f.close()
+            tmp_path.unlink(missing_ok=True)
+            raise
+        return f
+    
+    @classmethod
+    def for_build(cls, name, directory=None):
+        """在构建日志目录（默认 ~/.anspacker/logs）中为一次构建创建日志文件"""
+        if directory is None:
+            from app_paths import get_app_dir
+            directory = get_app_dir("logs")
+        now = time.time()
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now))
+        safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+        path = Path(directory) / f"{safe_name}-{stamp}-{int(now * 1000) % 1000:03d}-{os.getpid()}.log"
+        return cls(path)
+    
+    def log(self, message, level="info"):
+        """入队一条日志，可在任意线程调用，永不阻塞"""
+        self._queue.put((time.time(), level, message))
+    
+    def _format(self, record):
+        timestamp, level, message = record
+        seconds = time.strftime("%H:%M:%S", time.localtime(timestamp))
+        return f"{seconds}.{int(timestamp * 1000) % 1000:03d} {self.LEVEL_NAMES.get(level, level.upper()):<5} {message}\n"
+    
+    def _run(self, rotate):
+        if rotate:
+            rotate_logs(self.path.parent, exclude=self.path)
+        closing = False
+        while not closing:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < self.batch_lines:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if None in batch:
+                batch = batch[:batch.index(None)]
+                closing = True
+            if batch and self.error is None:
+                try:
+                    self._file.write("".join(self._format(record) for record in batch))
+                    self._file.flush()
+                except OSError as e:
+                    # 磁盘写满等错误：之后的日志只丢弃，不影响构建
+                    self.error = e
+                self.lines += len(batch)
+                self.batches += 1
+        try:
+            self._file.close()
+        except OSError:
+            pass
+    
+    def close(self, timeout=10):
+        """写完已入队的日志后关闭文件"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
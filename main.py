@@ -1,15 +1,28 @@
 # main.py
-import tkinter as tk
-from gui import AnsPackerGUI
+import sys
+import threading
 from packer_core import PackerCore
+from log_pipeline import LogQueue
+from build_queue import BuildQueue, PrefixedLog
+from resource_sampler import format_sample
 
 class ApplicationController:
     """主控制器，协调GUI和核心逻辑"""
     
     def __init__(self):
+        # GUI相关模块在此导入，命令行模式不需要加载tkinter
+        import tkinter as tk
+        from gui import AnsPackerGUI
+        
         self.root = tk.Tk()
         self.packer = PackerCore()
+        # 后台预检查PyInstaller，点击“开始打包”时直接使用缓存结果
+        self.packer.prefetch_pyinstaller_check()
+        self.log_queue = LogQueue()
+        self.build_queue = None
         self.gui = AnsPackerGUI(self.root, self)
+        self.gui.log_area.attach_queue(self.log_queue)
+        self.root.after(1000, self._update_resource_status)
         
     def run(self):
         """启动应用"""
@@ -18,15 +31,102 @@ class ApplicationController:
     def start_packaging(self, config):
         """开始打包流程"""
         try:
+            self.log_queue.clear()
+            self.log_queue.reset_stats()
             self.gui.log_area.clear()
-            self.packer.pack(config, self.gui.log_area)
+            self.packer.pack(config, self.log_queue)
         except Exception as e:
             self.gui.show_error(f"打包启动失败: {str(e)}")
+    def enqueue_packaging(self, config):
+        """将配置加入并行构建队列"""
+        try:
+            if self.build_queue is None:
+                self.build_queue = BuildQueue(
+                    log_factory=lambda job: PrefixedLog(self.log_queue, f"[#{job.job_id} {job.name}]"),
+                    on_job_done=self._on_queue_job_done
+                )
+            self.build_queue.submit(config)
+        except Exception as e:
+            self.gui.show_error(f"加入构建队列失败: {str(e)}")
+    
+    def _on_queue_job_done(self, job):
+        """队列任务结束回调（在工作线程中调用，只通过日志队列通知界面）"""
+        summary = self.build_queue.summary()
+        active = len(self.build_queue.active_jobs())
+        job.log.log(f"任务结束: {job.state}，队列剩余 {active} 个任务，统计: {summary}", "info")
+    
+    def analyze_imports(self, config):
+        """后台分析导入，完成后由界面询问是否把建议加入额外参数"""
+        result = {}
+        
+        def worker():
+            result['suggestions'] = self.packer.suggest_imports(config, self.log_queue)
+        
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        
+        # Tk只能在主线程中操作，轮询等待后台结果
+        def check():
+            if thread.is_alive():
+                self.root.after(200, check)
+            elif result.get('suggestions') is not None:
+                self.gui.offer_import_suggestions(result['suggestions'])
+        
+        self.root.after(200, check)
+    
+    def benchmark_layouts(self, config):
+        """后台对比两种打包模式，完成后由界面询问是否采用推荐的模式"""
+        if self.packer.is_running:
+            self.gui.show_error("已有打包任务正在进行！")
+            return
+        self.log_queue.clear()
+        self.log_queue.reset_stats()
+        self.gui.log_area.clear()
+        result = {}
+        
+        def worker():
+            if self.packer.ensure_pyinstaller(self.log_queue):
+                result['benchmark'] = self.packer.benchmark_layouts(config, self.log_queue)
+        
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        
+        def check():
+            if thread.is_alive():
+                self.root.after(200, check)
+            elif result.get('benchmark') is not None:
+                self.gui.offer_layout_recommendation(result['benchmark'])
+        
+        self.root.after(200, check)
+    
+    def _update_resource_status(self):
+        """每秒汇总正在运行的构建（含队列中的任务）的资源占用，显示在状态栏"""
+        cores = [self.packer]
+        if self.build_queue is not None:
+            cores.extend(job.core for job in self.build_queue.active_jobs())
+        samples = [sample for sample in (core.current_resources() for core in cores) if sample]
+        if samples:
+            total = {key: sum(sample[key] for sample in samples) for key in ('cpu', 'rss', 'read', 'write', 'procs')}
+            text = format_sample(total)
+            if len(samples) > 1:
+                text = f"{len(samples)} 个构建 | {text}"
+        else:
+            text = ""
+        self.gui.set_resource_status(text)
+        self.root.after(1000, self._update_resource_status)
+    
     def stop_packaging(self):
         """停止打包"""
         self.packer.stop()
+        if self.build_queue is not None:
+            self.build_queue.cancel_all()
 
 if __name__ == "__main__":
+    # 带参数运行时进入命令行模式
+    if len(sys.argv) > 1:
+        from cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+    
     app = ApplicationController()
     app.run()
     
\ No newline at end of file
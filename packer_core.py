@@ -3,59 +3,256 @@ import subprocess
 import sys
 import os
 import platform
+import shutil
+import tempfile
 import threading
+import time
+from collections import deque
 from pathlib import Path
 import importlib.util
 import importlib
 import traceback
+import json
+from build_report import BuildTimeline, report_path, write_report
+from log_classifier import LogClassifier
+from log_pipeline import LogFileWriter, TeeLog
+from process_control import STOP_GRACE_PERIOD, modified_since, popen_group_kwargs, quarantine, terminate_tree
+from resource_layout import collapse_resources
+from resource_sampler import ResourceSampler
+
+# PyInstaller检查结果缓存：{解释器路径: (site-packages修改时间, 是否已安装)}
+_pyinstaller_status = {}
+_pyinstaller_lock = threading.Lock()
+
+# 命令行超过该长度时改用参数文件（Windows下cmd.exe上限8191、CreateProcess上限32767字符）
+ARGS_FILE_THRESHOLD = 8000
+
+# 在子进程内读取参数文件并调用PyInstaller，由PyInstaller按这些参数生成spec后构建
+PYINSTALLER_LAUNCHER = (
+    "import json, sys; from PyInstaller.__main__ import run; "
+    "run(json.load(open(sys.argv[1], encoding='utf-8')))"
+)
+
+class BuildRun:
+    """一次构建的状态，在同步与异步构建共用的构建前后步骤之间传递
+    
+    cancelled 为停止请求（threading.Event）；process 为当前正在运行的进程，
+    通过 attach() 在锁内检查停止请求后启动，request_stop() 记录停止请求并取得它。
+    """
+    
+    def __init__(self, config, log_callback, cancelled, build_log=None):
+        self.config = config
+        self.log = log_callback
+        self.cancelled = cancelled
+        self.build_log = build_log
+        self.started_at = time.time()
+        # 写入构建历史的信息
+        self.history = {'start': time.perf_counter(), 'from_cache': False, 'sections': {}}
+        self.cache_key = None
+        self.incremental_plan = None
+        self.cmd = None
+        self.daemon_args = None
+        self.process = None
+        self.sampler = None
+        self.return_code = None
+        self.report_path = None
+        self.classifier = LogClassifier(rules=config.get('log_rules'))
+        self.timeline = BuildTimeline()
+        self.line_count = 0
+        self.read_elapsed = 0.0
+        # PyInstaller进程从启动到退出的时间（没有启动进程时为None）
+        self.process_time = None
+        self._lock = threading.Lock()
+    
+    def attach(self, start):
+        """未请求停止时调用 start() 启动进程并记录，返回该进程；已请求停止时返回None"""
+        with self._lock:
+            if self.cancelled.is_set():
+                return None
+            self.process = start()
+            return self.process
+    
+    def request_stop(self):
+        """记录停止请求，返回当前进程（没有时为None）"""
+        with self._lock:
+            self.cancelled.set()
+            return self.process
+    
+    def feed(self, line):
+        """分级一行构建输出并写入日志，时间线共用同一次匹配结果，返回级别"""
+        self.line_count += 1
+        level, ms, message = self.classifier.classify(line)
+        self.log.log(line, level)
+        if ms is not None:
+            self.timeline.feed_parsed(ms, message)
+        return level
+
 
 class PackerCore:
     """打包核心逻辑"""
     
-    def __init__(self):
-        self.process = None
+    def __init__(self, wheelhouse=None, index_url=None):
         self.is_running = False
         self.thread = None
+        # 停止请求可能早于进程启动，启动前在锁内检查
+        self._process_lock = threading.Lock()
+        self._stop_requested = threading.Event()
+        # 当前同步构建的 BuildRun（stop() 结束其中正在运行的进程）
+        self._run = None
+        # 当前构建进程组的资源采样（界面状态栏定时读取最新样本）
+        self.sampler = None
+        self.classifier = LogClassifier()
+        # 最近一次写入的构建报告内容
+        self.last_report = None
+        # 离线安装：本地wheel仓库目录或本地索引地址（也可通过环境变量配置）
+        self.wheelhouse = wheelhouse or os.environ.get("ANSPACKER_WHEELHOUSE") or None
+        self.index_url = index_url or os.environ.get("ANSPACKER_INDEX_URL") or None
+    
+    def _probe_pyinstaller(self):
+        """实际检查PyInstaller是否已安装（可能需要启动子进程）"""
+        try:
+            # 方法1：检查模块是否可以导入
+            spec = importlib.util.find_spec("PyInstaller")
+            if spec is not None:
+                return True
+            
+            # 方法2：尝试执行pyinstaller命令
+            result = subprocess.run(
+                [sys.executable, "-m", "PyInstaller", "--version"],
+                capture_output=True,
+                text=True,
+                timeout=5
+            )
+            return result.returncode == 0
+        except:
+            return False
+    
+    def check_pyinstaller(self, use_cache=True):
+        """
+        检查PyInstaller是否已安装
+        结果按解释器路径与site-packages修改时间缓存（内存+磁盘），安装或卸载包后自动失效
+        """
+        from app_paths import get_app_dir
+        from fingerprint import site_packages_mtime
+        
+        mtime = site_packages_mtime()
+        cache_path = get_app_dir() / "pyinstaller_check.json"
+        
+        # 同一时间只做一次检查，后台预检查与打包前检查不会重复启动子进程
+        with _pyinstaller_lock:
+            if use_cache:
+                cached = _pyinstaller_status.get(sys.executable)
+                if cached is not None and cached[0] == mtime:
+                    return cached[1]
+                
+                try:
+                    with open(cache_path, 'r', encoding='utf-8') as f:
+                        disk_cache = json.load(f)
+                    entry = disk_cache.get(sys.executable)
+                    if entry and entry['mtime'] == mtime:
+                        _pyinstaller_status[sys.executable] = (mtime, entry['installed'])
+                        return entry['installed']
+                except (OSError, ValueError, KeyError):
+                    pass
+            
+            installed = self._probe_pyinstaller()
+            _pyinstaller_status[sys.executable] = (mtime, installed)
+            
+            try:
+                try:
+                    with open(cache_path, 'r', encoding='utf-8') as f:
+                        disk_cache = json.load(f)
+                except (OSError, ValueError):
+                    disk_cache = {}
+                disk_cache[sys.executable] = {'mtime': mtime, 'installed': installed}
+                with open(cache_path, 'w', encoding='utf-8') as f:
+                    json.dump(disk_cache, f, ensure_ascii=False, indent=1)
+            except OSError:
+                pass
+            return installed
+    
+    def prefetch_pyinstaller_check(self):
+        """在后台线程中提前检查PyInstaller，应用启动时调用"""
+        thread = threading.Thread(target=self.check_pyinstaller, daemon=True)
+        thread.start()
+        return thread
     
     def ensure_pyinstaller(self, log_callback):
         """
         确保PyInstaller已安装，如果没有则自动安装
         所有消息都会输出到GUI日志中
         """
-        def check_pyinstaller_installed():
-            """检查PyInstaller是否已安装"""
-            try:
-                # 方法1：检查模块是否可以导入
-                spec = importlib.util.find_spec("PyInstaller")
-                if spec is not None:
-                    return True
-                
-                # 方法2：尝试执行pyinstaller命令
-                result = subprocess.run(
-                    [sys.executable, "-m", "PyInstaller", "--version"],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                return result.returncode == 0
-            except:
-                return False
-        
         # 检查是否已安装
         log_callback.log("正在检查PyInstaller安装状态...", "info")
         
-        if check_pyinstaller_installed():
+        if self.check_pyinstaller():
             log_callback.log("✓ PyInstaller已安装", "success")
             return True
         
         # 未安装，开始自动安装
         log_callback.log("✗ PyInstaller未安装", "warning")
         log_callback.log("正在尝试自动安装PyInstaller...", "info")
-        log_callback.log("注意：这需要网络连接和pip配置正确", "info")
+        if self.wheelhouse:
+            log_callback.log(f"使用本地wheel仓库离线安装: {self.wheelhouse}", "info")
+        elif self.index_url:
+            log_callback.log(f"使用本地索引安装: {self.index_url}", "info")
+        else:
+            log_callback.log("注意：这需要网络连接和pip配置正确", "info")
+        
+        if not self.pip_install(["pyinstaller"], log_callback):
+            return False
+        
+        log_callback.log("="*50, "success")
+        log_callback.log("✓ PyInstaller安装成功！", "success")
+        log_callback.log("="*50, "success")
+        
+        # 验证安装
+        if self.check_pyinstaller(use_cache=False):
+            log_callback.log("✓ 安装验证通过", "success")
+            return True
+        else:
+            log_callback.log("✗ 安装验证失败，可能未正确安装", "error")
+            return False
+    
+    def build_pip_command(self, packages=None, requirements=None):
+        """构建pip安装命令：配置了wheel仓库时完全离线（--no-index），否则使用指定索引或默认索引"""
+        install_cmd = [
+            sys.executable, "-m", "pip", "install",
+            "--disable-pip-version-check", "--no-input", "--progress-bar", "off"
+        ]
+        
+        if self.wheelhouse:
+            install_cmd.extend(["--no-index", "--find-links", str(self.wheelhouse)])
+        elif self.index_url:
+            install_cmd.extend(["--index-url", self.index_url])
+        
+        if requirements:
+            install_cmd.extend(["-r", str(requirements)])
+        install_cmd.extend(packages or [])
+        return install_cmd
+    
+    def install_build_dependencies(self, log_callback, requirements=None, packages=None):
+        """安装构建所需的依赖（requirements文件和/或包列表），用于快速准备新的构建机"""
+        if not requirements and not packages:
+            return True
+        if requirements and not os.path.isfile(requirements):
+            log_callback.log(f"依赖文件不存在: {requirements}", "error")
+            return False
+        
+        if not self.pip_install(packages or [], log_callback, requirements=requirements):
+            return False
+        log_callback.log("✓ 构建依赖安装完成", "success")
+        return True
+    
+    def pip_install(self, packages, log_callback, requirements=None):
+        """运行pip安装并把输出实时写入日志，返回是否成功"""
+        if self.wheelhouse and not os.path.isdir(self.wheelhouse):
+            log_callback.log(f"✗ wheel仓库目录不存在: {self.wheelhouse}", "error")
+            return False
         
+        target = ' '.join(packages) if packages else str(requirements)
         try:
-            # 尝试使用pip安装PyInstaller
-            install_cmd = [sys.executable, "-m", "pip", "install", "pyinstaller"]
+            install_cmd = self.build_pip_command(packages, requirements)
             
             log_callback.log(f"执行命令: {' '.join(install_cmd)}", "info")
             
@@ -72,9 +269,10 @@ class PackerCore:
             
             # 实时显示安装日志
             log_callback.log("="*50, "info")
-            log_callback.log("开始安装PyInstaller...", "info")
+            log_callback.log(f"开始安装 {target}...", "info")
             log_callback.log("="*50, "info")
             
+            start = time.perf_counter()
             for line in install_process.stdout:
                 if line.strip():
                     log_callback.log(f"[PIP] {line.strip()}", "info")
@@ -83,20 +281,13 @@ class PackerCore:
             return_code = install_process.wait()
             
             if return_code == 0:
-                log_callback.log("="*50, "success")
-                log_callback.log("✓ PyInstaller安装成功！", "success")
-                log_callback.log("="*50, "success")
-                
-                # 验证安装
-                if check_pyinstaller_installed():
-                    log_callback.log("✓ 安装验证通过", "success")
-                    return True
-                else:
-                    log_callback.log("✗ 安装验证失败，可能未正确安装", "error")
-                    return False
+                log_callback.log(f"pip安装用时 {time.perf_counter() - start:.1f}s", "info")
+                return True
             else:
                 log_callback.log("="*50, "error")
-                log_callback.log(f"✗ PyInstaller安装失败！返回码: {return_code}", "error")
+                log_callback.log(f"✗ {target} 安装失败！返回码: {return_code}", "error")
+                if self.wheelhouse:
+                    log_callback.log("请确认wheel仓库中包含所需的包及其全部依赖（匹配当前平台与Python版本）", "warning")
                 log_callback.log("="*50, "error")
                 return False
                 
@@ -112,7 +303,7 @@ class PackerCore:
             log_callback.log("="*50, "error")
             log_callback.log("✗ 执行超时：网络连接太慢或卡住", "error")
             log_callback.log(f"详细信息: {str(e)}", "error")
-            log_callback.log("建议: 1. 检查网络连接 2. 使用国内镜像源", "warning")
+            log_callback.log("建议: 1. 检查网络连接 2. 使用国内镜像源 3. 配置本地wheel仓库离线安装", "warning")
             log_callback.log("="*50, "error")
             return False
             
@@ -127,7 +318,7 @@ class PackerCore:
             
         except Exception as e:
             log_callback.log("="*50, "error")
-            log_callback.log("✗ 安装PyInstaller时发生未知错误", "error")
+            log_callback.log(f"✗ 安装{target}时发生未知错误", "error")
             log_callback.log(f"错误类型: {type(e).__name__}", "error")
             log_callback.log(f"错误信息: {str(e)}", "error")
             log_callback.log("详细堆栈:", "error")
@@ -147,9 +338,57 @@ class PackerCore:
             log_callback.log("="*50, "error")
             return False
     
+    def get_build_dirs(self, config):
+        """返回 (distpath, workpath, specpath)，未指定的项为None"""
+        dist_dir = work_dir = spec_dir = None
+        if config['output_dir']:
+            dist_dir = str(Path(config['output_dir']) / "dist")
+            work_dir = str(Path(config['output_dir']) / "build")
+            spec_dir = config['output_dir']
+        
+        # 显式指定的distpath/workpath/specpath优先
+        dist_dir = config.get('distpath') or dist_dir
+        work_dir = config.get('workpath') or work_dir
+        spec_dir = config.get('specpath') or spec_dir
+        return dist_dir, work_dir, spec_dir
+    
+    def get_app_name(self, config):
+        """打包产物名称：未指定时与PyInstaller一致，使用主程序文件名"""
+        return config.get('name') or Path(config['main_file']).stem
+    
+    def get_dist_dir(self, config):
+        """dist输出目录（未指定输出目录时为当前目录下的dist）"""
+        dist_dir, _, _ = self.get_build_dirs(config)
+        return Path(dist_dir) if dist_dir else Path("dist")
+    
+    def get_member_names(self, config):
+        """多程序构建中各程序的名称：主程序使用配置的名称，其余程序使用各自的文件名"""
+        return [self.get_app_name(config)] + [Path(path).stem for path in config.get('group_members') or []]
+    
+    def get_artifact_paths(self, config):
+        """dist目录中属于本配置的产物（onefile可执行文件或onedir目录）"""
+        dist_dir = self.get_dist_dir(config)
+        names = {self.get_app_name(config)}
+        # MERGE构建的每个程序各有一个产物，共享目录构建只有一个目录
+        if config.get('group_members') and config.get('group_mode') == 'merge':
+            names.update(self.get_member_names(config))
+        if not dist_dir.is_dir():
+            return []
+        return sorted(p for p in dist_dir.iterdir() if p.name in names or p.stem in names)
+    
+    def get_current_artifacts(self, config):
+        """与当前打包模式一致的产物（dist中可能同时留有另一种模式的旧产物）"""
+        return [path for path in self.get_artifact_paths(config) if path.is_dir() != bool(config['onefile'])]
+    
+    def get_current_artifact(self, config):
+        """与当前打包模式一致的第一个产物，不存在时返回None"""
+        artifacts = self.get_current_artifacts(config)
+        return artifacts[0] if artifacts else None
+    
     def build_command(self, config):
         """构建PyInstaller命令"""
-        cmd = [sys.executable, "-m", "PyInstaller"]
+        # 以子进程方式运行时没有可交互的stdin，覆盖输出目录时不能等待确认
+        cmd = [sys.executable, "-m", "PyInstaller", "--noconfirm"]
         
         # 基本参数
         if config['onefile']:
@@ -164,6 +403,10 @@ class PackerCore:
         if config['clean']:
             cmd.append("--clean")
         
+        # 由构建后的并行压缩代替PyInstaller内部串行的UPX
+        if config.get('upx_compress'):
+            cmd.append("--noupx")
+        
         # 程序名称
         if config['name']:
             cmd.extend(["--name", config['name']])
@@ -172,91 +415,172 @@ class PackerCore:
         if config['icon_file']:
             cmd.extend(["--icon", config['icon_file']])
         
-        # 资源文件
-        for resource in config['resources']:
-            resource_path = Path(resource)
-            if platform.system() == "Windows":
-                # Windows格式: src;dest
-                cmd.extend(["--add-data", f"{resource_path};."])
-            else:
-                # Linux/macOS格式: src:dest
-                cmd.extend(["--add-data", f"{resource_path}:."])
+        # 资源文件（按目录合并为最少的条目）
+        separator = ";" if platform.system() == "Windows" else ":"
+        for src, dest in collapse_resources(config):
+            # Windows格式: src;dest  Linux/macOS格式: src:dest
+            cmd.extend(["--add-data", f"{src}{separator}{dest}"])
+        
+        # 启动分析探针（只用于启动分析单独构建的产物，不进入正式产物）
+        if config.get('startup_probe'):
+            from startup_profiler import PROBE_HOOK
+            cmd.extend(["--runtime-hook", str(PROBE_HOOK)])
         
         # 额外参数
         if config['extra_params']:
             cmd.extend(config['extra_params'].split())
         
-        # 输出目录
-        if config['output_dir']:
-            cmd.extend(["--distpath", str(Path(config['output_dir']) / "dist")])
-            cmd.extend(["--workpath", str(Path(config['output_dir']) / "build")])
-            cmd.extend(["--specpath", config['output_dir']])
+        # 输出目录（批量构建时每个任务使用独立的workpath/specpath）
+        dist_dir, work_dir, spec_dir = self.get_build_dirs(config)
+        if dist_dir:
+            cmd.extend(["--distpath", dist_dir])
+        if work_dir:
+            cmd.extend(["--workpath", work_dir])
+        if spec_dir:
+            cmd.extend(["--specpath", spec_dir])
         
         # 主程序文件
         cmd.append(config['main_file'])
         
         return cmd
     
+    def spec_build_command(self, cmd, config, log_callback):
+        """把完整的PyInstaller命令换成基于缓存spec的构建命令，生成spec失败时返回原命令"""
+        from spec_cache import SpecCache, split_args
+        
+        makespec_args, build_args = split_args(cmd[3:])
+        try:
+            start = time.perf_counter()
+            spec_path, cached = SpecCache().get_or_generate(makespec_args, self.get_app_name(config))
+        except Exception as e:
+            log_callback.log(f"生成spec文件失败，改用命令行参数构建: {str(e)}", "warning")
+            return cmd
+        if cached:
+            log_callback.log(f"使用缓存的spec文件: {spec_path}", "info")
+        else:
+            log_callback.log(f"已生成spec文件: {spec_path} ({time.perf_counter() - start:.2f}s)", "info")
+        return cmd[:3] + build_args + [str(spec_path)]
+    
+    def group_build_command(self, config, log_callback):
+        """多程序构建：各程序生成（或复用）自己的spec，组合为一个多程序spec后在同一个PyInstaller进程中构建"""
+        from spec_cache import SpecCache, split_args
+        
+        cache = SpecCache()
+        mode = config.get('group_mode') or 'shared'
+        start = time.perf_counter()
+        parts = []
+        build_args = None
+        for main_file, name in zip([config['main_file']] + list(config['group_members']), self.get_member_names(config)):
+            member = dict(config, main_file=main_file, name=name)
+            makespec_args, member_build_args = split_args(self.build_command(member)[3:])
+            if build_args is None:
+                build_args = member_build_args
+            spec_path, _ = cache.get_or_generate(makespec_args, name)
+            parts.append((spec_path, Path(main_file).stem, name if member['onefile'] else f"{name}/{name}"))
+        spec_path = cache.write_merged(parts, self.get_app_name(config), mode)
+        
+        names = {'shared': "共享目录", 'merge': "MERGE"}
+        log_callback.log(
+            f"多程序构建（{names[mode]}，{len(parts)} 个程序）: {spec_path} ({time.perf_counter() - start:.2f}s)", "info"
+        )
+        return [sys.executable, "-m", "PyInstaller"] + build_args + [str(spec_path)]
+    
+    def spill_long_command(self, cmd, config):
+        """命令行过长时把PyInstaller参数写入JSON参数文件，返回 (实际执行的命令, 参数文件或None)"""
+        if sum(len(arg) + 1 for arg in cmd) <= ARGS_FILE_THRESHOLD:
+            return cmd, None
+        
+        _, work_dir, _ = self.get_build_dirs(config)
+        args_path = Path(work_dir or "build") / f"{self.get_app_name(config)}-args.json"
+        args_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(args_path, 'w', encoding='utf-8') as f:
+            # 去掉开头的 python -m PyInstaller
+            json.dump(cmd[3:], f, ensure_ascii=False, indent=1)
+        return [sys.executable, "-c", PYINSTALLER_LAUNCHER, str(args_path)], args_path
+    
     def pack(self, config, log_callback):
         """执行打包"""
         if self.is_running:
             log_callback.log("已有打包任务正在进行！", "warning")
             return
         
-        # 确保PyInstaller已安装
-        if not self.ensure_pyinstaller(log_callback):
-            log_callback.log("无法继续打包，请先手动安装PyInstaller", "error")
-            self.is_running = False
-            return
-        
-        self.is_running = True
+        self._begin_run()
         
-        # 在新线程中执行打包，避免阻塞GUI
+        # 在新线程中检查PyInstaller并执行打包，避免阻塞GUI
         self.thread = threading.Thread(
-            target=self._run_pack_process,
+            target=self._pack_worker,
             args=(config, log_callback),
             daemon=True
         )
         self.thread.start()
     
+    def _pack_worker(self, config, log_callback):
+        """打包线程：确保PyInstaller已安装后运行打包进程"""
+        try:
+            if not self.ensure_pyinstaller(log_callback):
+                log_callback.log("无法继续打包，请先手动安装PyInstaller", "error")
+                self.is_running = False
+                return
+        except Exception as e:
+            log_callback.log(f"检查PyInstaller失败: {str(e)}", "error")
+            self.is_running = False
+            return
+        
+        self._run_pack_process(config, log_callback)
+    
+    def run(self, config, log_callback, keep_stop_request=False):
+        """在当前线程中同步执行打包，返回进程返回码（未能启动时为None）
+        
+        keep_stop_request为真时保留调用前已记录的停止请求（构建队列在任务开始前就可能被取消）。
+        """
+        if self.is_running:
+            log_callback.log("已有打包任务正在进行！", "warning")
+            return None
+        
+        self._begin_run(keep_stop_request)
+        return self._run_pack_process(config, log_callback)
+    
+    def _begin_run(self, keep_stop_request=False):
+        """标记任务开始，并清除上一个任务遗留的停止请求"""
+        with self._process_lock:
+            self.is_running = True
+            if not keep_stop_request:
+                self._stop_requested.clear()
+    
     def _run_pack_process(self, config, log_callback):
-        """运行打包进程"""
+        """运行打包进程，返回进程返回码"""
+        run = self._run = self.open_run(config, log_callback)
+        log_callback = run.log
         try:
-            cmd = self.build_command(config)
-            log_callback.log("="*50, "info")
-            log_callback.log("开始构建PyInstaller命令...", "info")
-            cmd_display = ' '.join(cmd)
-            log_callback.log(f"命令: {cmd_display}", "info")
-            log_callback.log("="*50, "info")
+            if not self.prepare_run(run):
+                return run.return_code
             
-            # 启动进程
-            self.process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True,
-                bufsize=1,
-                encoding='utf-8',
-                errors='backslashreplace'
-            )
+            # 启动进程（独立进程组，取消时连同PyInstaller派生的子进程一起结束）
+            process = run.attach(lambda: self.start_process(run))
+            if process is None:
+                log_callback.log("打包已取消", "warning")
+                return run.return_code
+            process_start = time.perf_counter()
+            run.sampler = self.sampler = ResourceSampler(process.pid)
+            run.sampler.start()
             
-            # 实时读取输出
-            for line in self.process.stdout:
+            # 实时读取输出（log_callback只负责入队，不会阻塞读取）
+            # 分级与时间线共用一次正则匹配的结果
+            self.classifier = run.classifier
+            read_start = time.perf_counter()
+            for line in process.stdout:
                 if line:
-                    self._process_log_line(line.strip(), log_callback)
+                    run.feed(line.strip())
+            run.read_elapsed = time.perf_counter() - read_start
             
             # 等待进程结束
-            return_code = self.process.wait()
-            
-            if return_code == 0:
-                log_callback.log("="*50, "success")
-                log_callback.log("打包成功完成！", "success")
-                log_callback.log(f"输出目录: {config.get('output_dir', 'dist')}", "success")
-                log_callback.log("="*50, "success")
-            else:
-                log_callback.log("="*50, "error")
-                log_callback.log(f"打包失败！返回码: {return_code}", "error")
-                log_callback.log("="*50, "error")
+            return_code = process.wait()
+            run.process_time = time.perf_counter() - process_start
+            if run.cancelled.is_set():
+                run.return_code = return_code
+                self.discard_partial_output(run.config, log_callback, run.started_at)
+                return return_code
+            self.finish_run(run, return_code)
         
         except FileNotFoundError:
             log_callback.log("错误: 未找到PyInstaller或Python！请检查安装", "error")
@@ -264,36 +588,614 @@ class PackerCore:
             log_callback.log(f"异常错误: {str(e)}", "error")
             log_callback.log(f"错误类型: {type(e).__name__}", "error")
         finally:
+            # 异常退出（如命令行下的Ctrl+C）时进程组仍在运行，结束它并移走未完成的输出
+            process = run.process
+            if process is not None and process.poll() is None:
+                terminate_tree(process)
+                self.discard_partial_output(run.config, log_callback, run.started_at)
+            self.close_run(run)
             self.is_running = False
-            self.process = None
+            self._run = None
+            self.sampler = None
+        
+        return run.return_code
     
-    def _process_log_line(self, line, log_callback):
-        """处理日志行，根据内容设置级别"""
-        lower_line = line.lower()
-        
-        if "error" in lower_line or "failed" in lower_line or "traceback" in lower_line:
-            log_callback.log(line, "error")
-        elif "warning" in lower_line or "warn" in lower_line:
-            log_callback.log(line, "warning")
-        elif "success" in lower_line or "complete" in lower_line or "finished" in lower_line:
-            log_callback.log(line, "success")
-        elif "info" in lower_line or "processing" in lower_line or "analyzing" in lower_line:
-            log_callback.log(line, "info")
+    def open_run(self, config, log_callback, cancelled=None):
+        """开始一次构建，返回 BuildRun（同步与异步构建共用）
+        
+        创建本次的日志文件（log_callback 换成同时写入文件的 TeeLog）；
+        cancelled 为该构建的停止请求（threading.Event），默认使用本对象的停止请求。
+        """
+        # 每次构建的日志同时写入日志文件（后台线程批量写入，不阻塞输出读取）
+        build_log = self._open_build_log(config, log_callback)
+        if build_log is not None:
+            log_callback = TeeLog(log_callback, build_log)
+        # 多个程序共用一个目录时只能是目录模式
+        if config.get('group_members') and config.get('group_mode', 'shared') == 'shared' and config['onefile']:
+            log_callback.log("多程序共享目录构建只支持目录模式，已改为 --onedir", "warning")
+            config = dict(config, onefile=False)
+        return BuildRun(config, log_callback, cancelled or self._stop_requested, build_log)
+            
+    def prepare_run(self, run):
+        """构建前的共用步骤：构建缓存、增量构建与生成命令，返回是否需要启动PyInstaller
+            
+        已取消或缓存命中（run.return_code 为0）时返回False；否则设置 run.cmd，
+        run.daemon_args 不为None时改由常驻构建进程执行。
+        """
+        config = run.config
+        log_callback = run.log
+        if run.cancelled.is_set():
+            log_callback.log("打包已取消", "warning")
+            return False
+            
+        # 构建缓存：输入未变化时直接恢复上次的产物
+        if config.get('use_cache'):
+            run.cache_key, restored = self._restore_from_cache(config, log_callback)
+            if restored:
+                run.history['from_cache'] = True
+                run.return_code = 0
+                return False
+            
+        # 增量构建：保留workpath，只在分析缓存可能失效时才 --clean
+        if config.get('incremental'):
+            run.incremental_plan = self._plan_incremental(config, log_callback)
+            if run.incremental_plan is not None:
+                run.config = config = dict(config, clean=run.incremental_plan.clean_required)
+            
+        cmd = self.build_command(config)
+        log_callback.log("="*50, "info")
+        log_callback.log("开始构建PyInstaller命令...", "info")
+        # 多程序构建使用组合的spec；spec缓存：同一配置只生成一次spec，之后直接构建spec
+        if config.get('group_members'):
+            cmd = self.group_build_command(config, log_callback)
+        elif config.get('spec_cache'):
+            cmd = self.spec_build_command(cmd, config, log_callback)
+        # 常驻构建进程通过socket接收参数，不受命令行长度限制
+        if self._use_daemon(config, log_callback):
+            run.daemon_args = cmd[3:]
         else:
-            log_callback.log(line)
+            cmd, args_path = self.spill_long_command(cmd, config)
+            if args_path is not None:
+                log_callback.log(f"命令行过长，PyInstaller参数已写入: {args_path}", "info")
+        run.cmd = cmd
+        log_callback.log(f"命令: {' '.join(cmd)}", "info")
+        log_callback.log("="*50, "info")
+        return True
+            
+    def start_process(self, run):
+        """启动PyInstaller：交给常驻构建进程，不可用时直接启动子进程（独立进程组）"""
+        process = None
+        if run.daemon_args is not None:
+            process = self.start_daemon_build(run.daemon_args, run.log)
+        if process is None:
+            process = subprocess.Popen(
+                run.cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                universal_newlines=True,
+                bufsize=1,
+                encoding='utf-8',
+                errors='backslashreplace',
+                **popen_group_kwargs()
+            )
+        return process
+            
+    def finish_run(self, run, return_code):
+        """PyInstaller结束后的共用步骤：日志统计、UPX压缩、体积与启动分析、构建报告，
+        成功时保存增量构建状态并写入构建缓存"""
+        config = run.config
+        log_callback = run.log
+        run.return_code = return_code
+        if run.sampler is not None:
+            run.sampler.stop()
+            
+        rate = run.line_count / run.read_elapsed if run.read_elapsed > 0 else 0
+        log_callback.log(f"日志读取: {run.line_count} 行, 用时 {run.read_elapsed:.2f}s, {rate:.0f} 行/秒", "info")
+        counts = run.classifier.summary()
+        log_callback.log(
+            f"日志统计: 错误 {counts['error']} / 警告 {counts['warning']} / "
+            f"成功 {counts['success']} / 信息 {counts['info']}",
+            "warning" if counts['error'] or counts['warning'] else "info"
+        )
+        
+        sections = run.history['sections']
+        if run.sampler is not None:
+            sample_line = run.sampler.summary_line()
+            if sample_line:
+                log_callback.log(sample_line, "info")
+            sections['resources'] = run.sampler.report_section()
+        if run.build_log is not None:
+            sections['log_file'] = str(run.build_log.path)
+            
+        # 构建后的并行UPX压缩（需在体积分析与写入缓存之前完成）
+        if return_code == 0 and config.get('upx_compress'):
+            sections['upx'] = self._compress_binaries(config, log_callback)
+            
+        # 阶段耗时报告（失败的构建同样有参考价值），成功时附带产物体积分析
+        run.timeline.finish()
+        if return_code == 0:
+            sections['bundle'] = self._analyze_bundle(config, log_callback)
+            if config.get('profile_startup'):
+                sections['startup'] = self._profile_startup(run)
+        run.report_path = self._write_build_report(
+            config, run.timeline, return_code, run.read_elapsed, log_callback, sections, run.classifier
+        )
+            
+        if return_code == 0:
+            log_callback.log("="*50, "success")
+            log_callback.log("打包成功完成！", "success")
+            log_callback.log(f"输出目录: {config.get('output_dir', 'dist')}", "success")
+            log_callback.log("="*50, "success")
+                
+            if run.incremental_plan is not None:
+                run.incremental_plan.save()
+            if run.cache_key and not run.cancelled.is_set():
+                self._store_to_cache(run.cache_key, config, log_callback)
+        else:
+            log_callback.log("="*50, "error")
+            log_callback.log(f"打包失败！返回码: {return_code}", "error")
+            log_callback.log("="*50, "error")
+        
+    def close_run(self, run):
+        """构建结束（含失败、取消与异常）时的共用步骤：停止资源采样、写入构建历史、关闭日志文件"""
+        if run.sampler is not None:
+            run.sampler.stop()
+        self._record_history(run)
+        if run.build_log is not None:
+            run.build_log.close()
+    
+    def _write_build_report(self, config, timeline, return_code, wall_time, log_callback, sections=None, classifier=None):
+        """把阶段/钩子耗时写入输出目录下的JSON报告，并在日志中输出摘要，返回报告路径（失败时为None）"""
+        try:
+            log_callback.log("="*50, "info")
+            for line in timeline.summary_lines():
+                log_callback.log(line, "info")
+            
+            name = self.get_app_name(config)
+            self.last_report = {
+                'name': name,
+                'main_file': config['main_file'],
+                'return_code': return_code,
+                'wall_time_s': round(wall_time, 3),
+                'log_levels': (classifier or self.classifier).summary(),
+                'timing': timeline.to_dict(),
+                **(sections or {})
+            }
+            path = write_report(report_path(config.get('output_dir'), name), self.last_report)
+            log_callback.log(f"构建耗时报告: {path}", "info")
+            return path
+        except Exception as e:
+            log_callback.log(f"写入构建耗时报告失败: {str(e)}", "warning")
+            return None
+    
+    def _open_build_log(self, config, log_callback):
+        """为本次构建创建日志文件（config['build_log'] 为False时不创建），失败时返回None"""
+        if not config.get('build_log', True):
+            return None
+        try:
+            build_log = LogFileWriter.for_build(self.get_app_name(config))
+        except OSError as e:
+            log_callback.log(f"无法创建构建日志文件: {str(e)}", "warning")
+            return None
+        log_callback.log(f"构建日志: {build_log.path}", "info")
+        return build_log
+    
+    def _record_history(self, run):
+        """把本次打包写入本地构建历史，并与同一配置最近的中位数比较，提示耗时/体积回归"""
+        from build_history import BuildHistory, config_key, describe_regression, path_size
+        config = run.config
+        try:
+            sections = run.history['sections']
+            levels = run.classifier.summary()
+            cancelled = run.cancelled.is_set()
+            artifact_size = None
+            if run.return_code == 0 and not cancelled:
+                bundle = sections.get('bundle')
+                artifact = None if bundle else self.get_current_artifact(config)
+                if bundle:
+                    artifact_size = bundle['disk_size']
+                elif artifact is not None:
+                    artifact_size = path_size(artifact)
+            resources = sections.get('resources') or {}
+            
+            store = BuildHistory()
+            # 耗时取PyInstaller进程的运行时间，UPX压缩、体积与启动分析等可选步骤不计入
+            duration = run.process_time
+            if duration is None:
+                duration = time.perf_counter() - run.history['start']
+            entry = {
+                'config_key': config_key(config, self.get_dist_dir(config)),
+                'name': self.get_app_name(config),
+                'main_file': os.path.abspath(config['main_file']),
+                'layout': "onefile" if config['onefile'] else "onedir",
+                'fingerprint': run.cache_key,
+                'started_at': run.started_at,
+                'duration': duration,
+                'return_code': run.return_code,
+                'cancelled': int(cancelled),
+                'from_cache': int(run.history['from_cache']),
+                'artifact_size': artifact_size,
+                'errors': levels.get('error', 0),
+                'warnings': levels.get('warning', 0),
+                'peak_rss': resources.get('peak_rss')
+            }
+            entry['id'] = store.record(entry)
+            for regression in store.regressions(entry):
+                run.log.log(f"⚠ 回归: {describe_regression(regression)}", "warning")
+        except Exception as e:
+            run.log.log(f"写入构建历史失败: {str(e)}", "warning")
+    
+    def _analyze_bundle(self, config, log_callback):
+        """分析产物体积并与同一配置的上一次构建对比，返回写入构建报告的部分"""
+        from bundle_analyzer import (
+            analyze_artifact, config_id, diff_reports, history_path, load_previous, report_section,
+            save_report, summary_lines
+        )
+        try:
+            artifact = self.get_current_artifact(config)
+            if artifact is None:
+                return None
+            
+            start = time.perf_counter()
+            report = analyze_artifact(artifact)
+            history = history_path(config_id(config['main_file'], self.get_app_name(config), self.get_dist_dir(config)))
+            previous = load_previous(history)
+            diff = diff_reports(previous, report) if previous else None
+            save_report(history, report)
+            
+            log_callback.log("="*50, "info")
+            for line in summary_lines(report, diff):
+                log_callback.log(line, "info")
+            log_callback.log(f"体积分析用时 {time.perf_counter() - start:.2f}s", "info")
+            return report_section(report, diff)
+        except Exception as e:
+            log_callback.log(f"产物体积分析失败: {str(e)}", "warning")
+            return None
+    
+    def _profile_startup(self, run):
+        """另外构建一份带启动探针的产物，在沙箱目录中多次启动，测量冷/热启动与解压耗时，并列出最慢的导入
+        
+        探针产物输出到临时目录，分析后删除，不会进入输出目录与构建缓存；
+        其workpath独立保留在 build/startup-probe 下，之后的分析可以复用Analysis结果。
+        """
+        from startup_profiler import find_executable, profile_startup, summary_lines
+        
+        config = run.config
+        log_callback = run.log
+        _, work_dir, _ = self.get_build_dirs(config)
+        probe_dir = Path(work_dir or "build") / "startup-probe"
+        dist_dir = tempfile.mkdtemp(prefix="anspacker-probe-")
+        probe_config = dict(
+            config, startup_probe=True, group_members=[], clean=False,
+            distpath=dist_dir, workpath=str(probe_dir), specpath=str(probe_dir)
+        )
+        try:
+            log_callback.log("="*50, "info")
+            log_callback.log("正在构建启动分析用的产物（带探针，输出到临时目录）...", "info")
+            start = time.perf_counter()
+            if not self._run_probe_build(run, probe_config):
+                return None
+            log_callback.log(f"探针产物构建用时 {time.perf_counter() - start:.1f}s", "info")
+            
+            artifact = self.get_current_artifact(probe_config)
+            executable = find_executable(artifact, self.get_app_name(config)) if artifact else None
+            if executable is None:
+                log_callback.log("没有找到可运行的探针产物，跳过启动分析", "warning")
+                return None
+            log_callback.log(f"正在分析启动耗时: {executable}", "info")
+            result = profile_startup(executable)
+            for line in summary_lines(result):
+                log_callback.log(line, "info")
+            return result
+        except Exception as e:
+            log_callback.log(f"启动分析失败: {str(e)}", "warning")
+            return None
+        finally:
+            shutil.rmtree(dist_dir, ignore_errors=True)
+    
+    def _run_probe_build(self, run, config):
+        """运行探针产物的PyInstaller构建（输出只保留最后几行用于报错），返回是否成功"""
+        cmd, _ = self.spill_long_command(self.build_command(config), config)
+        process = run.attach(lambda: subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+            encoding='utf-8',
+            errors='backslashreplace',
+            **popen_group_kwargs()
+        ))
+        if process is None:
+            return False
+        try:
+            tail = deque((line.rstrip() for line in process.stdout), maxlen=10)
+            return_code = process.wait()
+        finally:
+            if process.poll() is None:
+                terminate_tree(process)
+        if return_code != 0 and not run.cancelled.is_set():
+            run.log.log(f"探针产物构建失败，返回码: {return_code}", "warning")
+            for line in tail:
+                run.log.log(f"  {line}", "warning")
+        return return_code == 0
     
-    def stop(self):
-        """停止打包进程"""
-        if self.process and self.is_running:
+    def _compress_binaries(self, config, log_callback):
+        """onedir产物中的动态库并行UPX压缩，按内容哈希缓存结果"""
+        from upx_compress import compress_binaries, find_upx, supported_platform
+        
+        log_callback.log("="*50, "info")
+        if config['onefile']:
+            log_callback.log("并行UPX压缩只支持目录模式，单文件模式请使用PyInstaller自带的UPX", "warning")
+            return None
+        if not supported_platform():
+            log_callback.log("macOS下UPX会破坏代码签名，已跳过压缩", "warning")
+            return None
+        
+        # 沿用PyInstaller的 --upx-dir / --upx-exclude 参数
+        tokens = config.get('extra_params', '').split()
+        upx_dirs = [tokens[i + 1] for i, token in enumerate(tokens[:-1]) if token == '--upx-dir']
+        excludes = [tokens[i + 1] for i, token in enumerate(tokens[:-1]) if token == '--upx-exclude']
+        upx = find_upx(upx_dirs[-1] if upx_dirs else None)
+        if upx is None:
+            log_callback.log("未找到upx，跳过压缩（可安装upx或通过 --upx-dir 指定目录）", "warning")
+            return None
+        
+        artifact = self.get_current_artifact(config)
+        if artifact is None:
+            return None
+        try:
+            log_callback.log(f"正在并行压缩动态库: {upx}", "info")
+            exe_name = self.get_app_name(config)
+            exe_path = next(
+                (p for p in (artifact / exe_name, artifact / f"{exe_name}.exe") if p.is_file()), None
+            )
+            stats = compress_binaries(artifact, upx, exe_path=exe_path, excludes=excludes)
+            log_callback.log(
+                f"UPX压缩: {stats['files']} 个文件，压缩 {stats['compressed']} 个，缓存命中 {stats['cache_hits']} 个，"
+                f"{stats['before'] / 1024 ** 2:.1f}MB -> {stats['after'] / 1024 ** 2:.1f}MB，"
+                f"节省 {stats['saved'] / 1024 ** 2:.1f}MB，用时 {stats['elapsed']:.2f}s",
+                "success"
+            )
+            return stats
+        except Exception as e:
+            log_callback.log(f"UPX压缩失败: {str(e)}", "warning")
+            return None
+    
+    def suggest_imports(self, config, log_callback):
+        """对比主程序的静态导入图与上一次打包实际收集的模块，返回 ImportSuggestions，无法分析时返回None"""
+        from bundle_analyzer import analyze_artifact
+        from fingerprint import extra_param_paths
+        from import_analyzer import suggest_imports
+        
+        artifact = self.get_current_artifact(config)
+        if artifact is None:
+            log_callback.log("没有找到上一次的打包产物，请先完成一次打包再分析导入", "warning")
+            return None
+        
+        try:
+            start = time.perf_counter()
+            log_callback.log("="*50, "info")
+            log_callback.log(f"正在分析导入: {config['main_file']} / {artifact}", "info")
+            # 额外参数中的 --paths/-p 同样是导入搜索路径
+            search_paths = extra_param_paths(config.get('extra_params')).get('--paths', [])
+            suggestions = suggest_imports(
+                config['main_file'], analyze_artifact(artifact, measure=False), search_paths
+            )
+            for line in suggestions.summary_lines():
+                log_callback.log(line, "info")
+            log_callback.log(f"导入分析用时 {time.perf_counter() - start:.2f}s", "info")
+            return suggestions
+        except Exception as e:
+            log_callback.log(f"导入分析失败: {str(e)}", "error")
+            return None
+    
+    def benchmark_layouts(self, config, log_callback):
+        """同一配置分别以目录模式与单文件模式打包，对比体积与冷/热启动耗时并给出推荐
+        
+        两次构建共用workpath，第二次不加 --clean 以复用Analysis结果；产物分别输出到
+        dist/onedir 与 dist/onefile。返回结果字典，未能完成时返回None。
+        """
+        from layout_benchmark import LAYOUTS, measurement, recommend, summary_lines, variant_config
+        
+        if self.is_running:
+            log_callback.log("已有打包任务正在进行！", "warning")
+            return None
+        
+        self._begin_run()
+        if config.get('group_members'):
+            log_callback.log("模式对比只构建主程序，其他程序不参与对比", "warning")
+        dist_root = self.get_dist_dir(config)
+        results = {}
+        for index, layout in enumerate(LAYOUTS):
+            log_callback.log("="*50, "info")
+            log_callback.log(f"模式对比 {index + 1}/{len(LAYOUTS)}: {layout}", "info")
+            variant = variant_config(config, layout, dist_root, clean=config['clean'] and index == 0)
+            self.last_report = None
+            self.is_running = True
+            return_code = self._run_pack_process(variant, log_callback)
+            results[layout] = measurement(return_code, self.last_report)
+            if return_code != 0 or self._stop_requested.is_set():
+                break
+        
+        layout, reason = recommend(results)
+        log_callback.log("="*50, "info")
+        for line in summary_lines(results, layout, reason):
+            log_callback.log(line, "success" if line.startswith("推荐") else "info")
+        
+        name = self.get_app_name(config)
+        result = {'name': name, 'main_file': config['main_file'], 'layouts': results,
+                  'recommended': layout, 'reason': reason}
+        try:
+            path = write_report(Path(config.get('output_dir') or ".") / f"{name}-layout-benchmark.json", result)
+            log_callback.log(f"模式对比结果: {path}", "info")
+        except OSError as e:
+            log_callback.log(f"写入模式对比结果失败: {str(e)}", "warning")
+        return result
+    
+    def _restore_from_cache(self, config, log_callback):
+        """计算输入指纹并尝试从缓存恢复，返回 (指纹键, 是否命中)"""
+        from build_cache import get_build_cache
+        from fingerprint import build_fingerprint
+        
+        try:
+            start = time.perf_counter()
+            cache_key, _ = build_fingerprint(config)
+            fingerprint_time = time.perf_counter() - start
+            log_callback.log(f"构建指纹: {cache_key[:16]} (计算用时 {fingerprint_time * 1000:.0f}ms)", "info")
+            
+            cache = get_build_cache()
+            start = time.perf_counter()
+            restored = cache.restore(cache_key, self.get_dist_dir(config))
+            if restored is None:
+                log_callback.log("缓存未命中，开始完整构建", "info")
+                self._log_cache_stats(cache, log_callback)
+                return cache_key, False
+            
+            restore_time = time.perf_counter() - start
+            log_callback.log("="*50, "success")
+            log_callback.log(f"✓ 缓存命中，已在 {restore_time * 1000:.0f}ms 内恢复产物，跳过PyInstaller构建", "success")
+            for path in restored:
+                log_callback.log(f"  {path}", "success")
+            log_callback.log("="*50, "success")
+            self._log_cache_stats(cache, log_callback)
+            return cache_key, True
+        except Exception as e:
+            log_callback.log(f"构建缓存不可用，将完整构建: {str(e)}", "warning")
+            return None, False
+    
+    def _plan_incremental(self, config, log_callback):
+        """对比上次构建状态，决定本次是否需要 --clean"""
+        from incremental import plan_incremental_build
+        
+        try:
+            _, work_dir, _ = self.get_build_dirs(config)
+            plan = plan_incremental_build(config, work_dir or "build", self.get_app_name(config))
+        except Exception as e:
+            log_callback.log(f"增量构建状态分析失败，按原设置构建: {str(e)}", "warning")
+            return None
+        
+        if plan.clean_required:
+            log_callback.log("增量构建: 需要清理分析缓存 (--clean)", "warning")
+            for reason in plan.reasons:
+                log_callback.log(f"  - {reason}", "warning")
+        else:
+            log_callback.log("增量构建: 环境与参数未变化，复用已有分析缓存", "success")
+            log_callback.log(
+                f"  变化的源码 {len(plan.changed_sources)} 个，变化的资源 {len(plan.changed_resources)} 个",
+                "info"
+            )
+            for name in (plan.changed_sources + plan.changed_resources)[:20]:
+                log_callback.log(f"  * {name}", "info")
+        return plan
+    
+    def _store_to_cache(self, cache_key, config, log_callback):
+        """把成功构建的产物写入缓存"""
+        from build_cache import get_build_cache
+        
+        try:
+            cache = get_build_cache()
+            artifacts = self.get_artifact_paths(config)
+            if cache.store(cache_key, artifacts, meta={'name': self.get_app_name(config)}):
+                log_callback.log(f"产物已写入构建缓存 ({len(artifacts)} 项)", "info")
+                self._log_cache_stats(cache, log_callback)
+            else:
+                log_callback.log("未在dist中找到产物，跳过写入缓存", "warning")
+        except Exception as e:
+            log_callback.log(f"写入构建缓存失败: {str(e)}", "warning")
+    
+    def _log_cache_stats(self, cache, log_callback):
+        """输出缓存命中统计"""
+        stats = cache.stats()
+        log_callback.log(
+            f"缓存统计: 命中 {stats['hits']} / 未命中 {stats['misses']} / 淘汰 {stats['evictions']}，"
+            f"{stats['entries']} 项，占用 {stats['size'] / 1024 ** 2:.1f}MB / {stats['max_size'] / 1024 ** 2:.0f}MB",
+            "info"
+        )
+    
+    def _process_log_line(self, line, log_callback):
+        """处理日志行，根据PyInstaller级别前缀或内容设置级别，返回 (时间戳毫秒, 消息)"""
+        level, ms, message = self.classifier.classify(line)
+        log_callback.log(line, level)
+        return ms, message
+    
+    def _use_daemon(self, config, log_callback):
+        """是否通过常驻构建进程运行本次构建（首次使用时在此启动常驻进程，不占用进程锁）"""
+        if not config.get('build_daemon'):
+            return False
+        from build_daemon import ensure_daemon, supported
+        if not supported():
+            log_callback.log("当前系统不支持常驻构建进程（需要fork），改为直接启动PyInstaller", "warning")
+            return False
+        if not ensure_daemon():
+            log_callback.log("常驻构建进程启动超时，改为直接启动PyInstaller", "warning")
+            return False
+        return True
+    
+    def start_daemon_build(self, args, log_callback):
+        """把构建交给常驻进程，失败时返回None（随后改为直接启动PyInstaller）"""
+        from build_daemon import run_build
+        try:
+            start = time.perf_counter()
+            process = run_build(args)
+            log_callback.log(f"已交给常驻构建进程 (pid {process.pid}, 用时 {time.perf_counter() - start:.2f}s)", "info")
+            return process
+        except (OSError, ValueError) as e:
+            log_callback.log(f"常驻构建进程不可用: {str(e)}，改为直接启动PyInstaller", "warning")
+            return None
+    
+    def discard_partial_output(self, config, log_callback, since):
+        """取消后移走未完成的workpath与产物，避免下一次构建复用不完整的分析缓存
+        
+        只处理在本次构建开始（since，time.time()的值）之后被修改过的路径，
+        PyInstaller还没有写入时取消不会移走上一次完整的产物。
+        """
+        _, work_dir, _ = self.get_build_dirs(config)
+        paths = [Path(work_dir or "build") / self.get_app_name(config)]
+        artifact = self.get_current_artifact(config)
+        if artifact is not None:
+            paths.append(artifact)
+        moved = quarantine(path for path in paths if modified_since(path, since))
+        log_callback.log("="*50, "warning")
+        log_callback.log("打包已取消", "warning")
+        for path in moved:
+            log_callback.log(f"已移除未完成的输出: {path}", "warning")
+    
+    def stop(self, wait=False, grace=STOP_GRACE_PERIOD):
+        """停止打包：向进程组发送终止信号，宽限期后强制结束
+        
+        默认在后台线程中结束进程，不阻塞界面；wait为真时等待进程组退出。
+        进程尚未启动时只记录停止请求，启动前会检查。返回是否有任务被停止。
+        """
+        with self._process_lock:
+            self._stop_requested.set()
+            run = self._run
+            running = self.is_running
+        process = run.request_stop() if run is not None else None
+        if process is None:
+            return running
+        
+        def worker():
             try:
-                self.process.terminate()
-                self.process.kill()
-                self.is_running = False
-                return True
+                terminate_tree(process, grace)
             except Exception as e:
                 print(f"停止进程失败: {e}")
-                return False
-        return False
+        
+        thread = threading.Thread(target=worker, name="anspacker-stop", daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+        return True
+    
+    @property
+    def process(self):
+        """同步构建中正在运行的进程（PyInstaller、常驻进程中的构建或启动分析的探针构建）"""
+        run = self._run
+        return run.process if run is not None else None
+    
+    def current_resources(self):
+        """正在运行的构建进程组的最新资源样本，没有时返回None"""
+        sampler = self.sampler
+        return sampler.latest if sampler is not None else None
     
     def is_process_running(self):
         """检查进程是否正在运行"""
@@ -0,0 +1,194 @@
+# process_control.py
+import asyncio
+import os
+import platform
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+# 发出终止信号后等待进程组自行退出的秒数，超时后强制结束
+STOP_GRACE_PERIOD = 5.0
+# 判断输出是否由本次构建写入时允许的时间戳误差（秒）
+MTIME_TOLERANCE = 0.1
+
+IS_WINDOWS = platform.system() == "Windows"
+
+
+def popen_group_kwargs():
+    """让子进程成为新进程组的组长，取消时可以一并结束它派生的所有进程"""
+    if IS_WINDOWS:
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {'start_new_session': True}
+
+
+def _group_alive(pgid):
+    try:
+        os.killpg(pgid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _wait_group(process, pgid, timeout):
+    """等待组长与组内其他进程全部退出，返回是否在超时前退出"""
+    deadline = time.monotonic() + timeout
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return False
+    while _group_alive(pgid):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def _terminate_posix(process, grace):
+    pgid = process.pid
+    try:
+        os.killpg(pgid, signal.SIGTERM)
+    except ProcessLookupError:
+        return "exited"
+    if _wait_group(process, pgid, grace):
+        return "terminated"
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except ProcessLookupError:
+        return "terminated"
+    process.wait()
+    return "killed"
+
+
+def _taskkill(pid, force):
+    cmd = ["taskkill", "/T", "/PID", str(pid)]
+    if force:
+        cmd.insert(1, "/F")
+    subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def _terminate_windows(process, grace):
+    try:
+        # 只有与本进程共用控制台时才能收到 Ctrl+Break（GUI下改用 taskkill）
+        process.send_signal(signal.CTRL_BREAK_EVENT)
+    except (OSError, ValueError):
+        _taskkill(process.pid, force=False)
+    try:
+        process.wait(timeout=grace)
+        return "terminated"
+    except subprocess.TimeoutExpired:
+        pass
+    _taskkill(process.pid, force=True)
+    process.wait()
+    return "killed"
+
+
+def terminate_tree(process, grace=STOP_GRACE_PERIOD):
+    """结束进程及其进程组：先发送终止信号，宽限期后强制结束
+    
+    返回 "exited"（已经结束）、"terminated"（宽限期内退出）或 "killed"（被强制结束）。
+    """
+    if IS_WINDOWS:
+        # 组长已退出时 taskkill /T 无法再找到它的子进程
+        if process.poll() is not None:
+            return "exited"
+        return _terminate_windows(process, grace)
+    return _terminate_posix(process, grace)
+
+
+async def terminate_tree_async(process, grace=STOP_GRACE_PERIOD):
+    """terminate_tree 的asyncio版本，process 为 asyncio.subprocess.Process"""
+    if IS_WINDOWS:
+        if process.returncode is not None:
+            return "exited"
+        try:
+            process.send_signal(signal.CTRL_BREAK_EVENT)
+        except (OSError, ValueError):
+            await asyncio.to_thread(_taskkill, process.pid, False)
+        try:
+            await asyncio.wait_for(process.wait(), grace)
+            return "terminated"
+        except asyncio.TimeoutError:
+            pass
+        await asyncio.to_thread(_taskkill, process.pid, True)
+        await process.wait()
+        return "killed"
+    
+    pgid = process.pid
+    try:
+        os.killpg(pgid, signal.SIGTERM)
+    except ProcessLookupError:
+        return "exited"
+    deadline = time.monotonic() + grace
+    try:
+        await asyncio.wait_for(process.wait(), grace)
+        while _group_alive(pgid) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if not _group_alive(pgid):
+            return "terminated"
+    except asyncio.TimeoutError:
+        pass
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except ProcessLookupError:
+        return "terminated"
+    await process.wait()
+    return "killed"
+
+
+def modified_since(path, since):
+    """路径本身或（目录时）其直接子项的修改时间是否不早于since（time.time()的值）"""
+    # 文件系统的时间戳取自粗粒度时钟，可能比 time.time() 略早
+    since -= MTIME_TOLERANCE
+    path = Path(path)
+    try:
+        if path.stat().st_mtime >= since:
+            return True
+        if path.is_dir() and not path.is_symlink():
+            return any(child.lstat().st_mtime >= since for child in path.iterdir())
+    except OSError:
+        pass
+    return False
+
+
+def quarantine(paths):
+    """把未完成的输出改名移开并在后台删除，原位置可以立即用于新的构建
+    
+    返回成功移开的原路径列表；改名失败（如文件仍被占用）的路径保持原样。
+    """
+    moved = []
+    targets = []
+    stamp = time.time_ns()
+    for path in paths:
+        path = Path(path)
+        if not path.exists():
+            continue
+        target = path.with_name(f".{path.name}.cancelled-{stamp}")
+        try:
+            os.replace(path, target)
+        except OSError:
+            continue
+        moved.append(path)
+        targets.append(target)
+        # 上次进程退出前没来得及删除的隔离目录一并清理
+        targets.extend(
+            p for p in path.parent.glob(f".{path.name}.cancelled-*") if p not in targets
+        )
+    
+    def remove():
+        for target in targets:
+            if target.is_dir():
+                shutil.rmtree(target, ignore_errors=True)
+            else:
+                try:
+                    target.unlink()
+                except OSError:
+                    pass
+    
+    if targets:
+        threading.Thread(target=remove, name="anspacker-quarantine", daemon=True).start()
+    return moved
@@ -0,0 +1,116 @@
+# resource_layout.py
+import os
+from pathlib import Path
+
+
+def resource_root(config):
+    """保留目录结构时资源相对路径的基准目录：未指定时为主程序所在目录"""
+    root = config.get('resource_root') or os.path.dirname(os.path.abspath(config['main_file']))
+    return os.path.abspath(root)
+
+
+def _list_dir(path, cache):
+    """目录中的条目（绝对路径），同一次计算中只读取一次"""
+    entries = cache.get(path)
+    if entries is None:
+        try:
+            entries = sorted(os.path.join(path, name) for name in os.listdir(path))
+        except OSError:
+            entries = []
+        cache[path] = entries
+    return entries
+
+
+def _is_under(path, root):
+    return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+
+
+def _collapse_flat(resources, listing):
+    """平铺模式：全部内容都是已选文件的目录合并为一条 目录 -> . 的条目"""
+    files_by_dir = {}
+    entries = []
+    for resource in resources:
+        if os.path.isdir(resource):
+            entries.append((resource, '.'))
+        else:
+            files_by_dir.setdefault(os.path.dirname(resource), set()).add(resource)
+    
+    for directory, files in files_by_dir.items():
+        children = _list_dir(directory, listing)
+        # 目录下还有未选中的文件或子目录时不能整体加入
+        if len(files) > 1 and len(children) == len(files) and files.issuperset(children):
+            entries.append((directory, '.'))
+        else:
+            entries.extend((path, '.') for path in sorted(files))
+    return entries
+
+
+def _collapse_tree(resources, root, listing):
+    """保留目录结构：从基准目录向下，整个子树都被选中的目录只生成一条条目"""
+    selected = set()
+    entries = []
+    for resource in resources:
+        if _is_under(resource, root) and resource != root:
+            selected.add(resource)
+        elif os.path.isdir(resource):
+            # 基准目录之外的目录保留目录名，文件放到根目录
+            entries.append((resource, os.path.basename(resource.rstrip(os.sep))))
+        else:
+            entries.append((resource, '.'))
+    
+    # 所有选中路径的上级目录（基准目录本身除外）
+    ancestors = set()
+    for path in selected:
+        parent = os.path.dirname(path)
+        while parent != root and parent not in ancestors and _is_under(parent, root):
+            ancestors.add(parent)
+            parent = os.path.dirname(parent)
+    
+    covered = {}
+    
+    def is_covered(path):
+        if path in selected:
+            return True
+        if path not in ancestors:
+            return False
+        if path not in covered:
+            children = _list_dir(path, listing)
+            covered[path] = bool(children) and all(is_covered(child) for child in children)
+        return covered[path]
+    
+    def emit(directory):
+        for child in _list_dir(directory, listing):
+            if child in selected or (child in ancestors and is_covered(child)):
+                if os.path.isdir(child):
+                    entries.append((child, os.path.relpath(child, root)))
+                else:
+                    entries.append((child, os.path.relpath(os.path.dirname(child), root)))
+            elif child in ancestors:
+                emit(child)
+    
+    emit(root)
+    return entries
+
+
+def collapse_resources(config):
+    """计算资源对应的最少 --add-data 条目，返回 [(源路径, 目标目录), ...]
+    
+    默认（平铺）与之前一致，所有资源都放到程序根目录；resource_tree 为真时
+    按相对 resource_root 的路径保留目录结构。
+    """
+    resources = []
+    seen = set()
+    for resource in config.get('resources', []):
+        path = os.path.abspath(resource)
+        if path not in seen:
+            seen.add(path)
+            resources.append(path)
+    if not resources:
+        return []
+    
+    listing = {}
+    if config.get('resource_tree'):
+        entries = _collapse_tree(resources, resource_root(config), listing)
+    else:
+        entries = _collapse_flat(resources, listing)
+    return [(str(Path(src)), dest) for src, dest in entries]
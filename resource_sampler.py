@@ -0,0 +1,179 @@
+# resource_sampler.py
+import os
+import threading
+import time
+
+DEFAULT_INTERVAL = 1.0
+# 报告中时间序列的最大点数，超过后间隔加倍（长时间构建的报告不会无限增大）
+MAX_SAMPLES = 600
+
+_CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def supported():
+    """只在有 /proc 的系统（Linux）上采样"""
+    return os.path.isfile("/proc/self/stat")
+
+
+def _read_stat(pid):
+    """返回 (进程组, CPU时钟数, 常驻内存字节)，进程已退出时返回None"""
+    try:
+        with open(f"/proc/{pid}/stat", 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    # 进程名可能包含空格和括号，从最后一个右括号之后开始解析
+    fields = data[data.rfind(b')') + 2:].split()
+    return int(fields[2]), int(fields[11]) + int(fields[12]), int(fields[21]) * _PAGE_SIZE
+
+
+def _read_io(pid):
+    """返回 (读取字节, 写入字节)，无权限或已退出时为 (0, 0)
+    
+    使用 rchar/wchar（所有读写调用的字节数，含页缓存命中），
+    read_bytes/write_bytes 只统计真正落盘的部分，构建期间大多为0。
+    shutil 在Linux下复制文件使用的零拷贝调用不计入。
+    """
+    read_bytes = write_bytes = 0
+    try:
+        with open(f"/proc/{pid}/io", 'rb') as f:
+            for line in f:
+                if line.startswith(b'rchar:'):
+                    read_bytes = int(line.split()[1])
+                elif line.startswith(b'wchar:'):
+                    write_bytes = int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return read_bytes, write_bytes
+
+
+def format_sample(sample):
+    """界面状态栏中显示的一行"""
+    return (
+        f"CPU {sample['cpu']:.0f}% | 内存 {sample['rss'] / 1024 ** 2:.0f}MB | "
+        f"读 {sample['read'] / 1024 ** 2:.0f}MB 写 {sample['write'] / 1024 ** 2:.0f}MB | "
+        f"{sample['procs']} 个进程"
+    )
+
+
+class ResourceSampler:
+    """后台线程按固定间隔读取 /proc，统计构建进程组（PyInstaller及其子进程）的CPU、内存与I/O
+    
+    构建进程作为新会话的组长启动，进程组号即其pid，组内所有进程都计入。
+    已退出进程的CPU与I/O累计值保留，内存只统计当前仍在运行的进程。
+    """
+    
+    def __init__(self, pid, interval=DEFAULT_INTERVAL, max_samples=MAX_SAMPLES):
+        self.pgid = pid
+        self.interval = interval
+        self.max_samples = max_samples
+        self.samples = []
+        self.latest = None
+        self.peak_rss = 0
+        self.peak_cpu = 0.0
+        self._stride = 1
+        self._count = 0
+        self._last = {}
+        self._gone = [0, 0, 0]
+        self._start = None
+        self._stop_event = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """启动采样线程；不支持的平台上什么也不做"""
+        if not supported():
+            return False
+        self._start = time.monotonic()
+        self._prev_time = self._start
+        self._prev_ticks = 0
+        self._thread = threading.Thread(target=self._run, name="anspacker-sampler", daemon=True)
+        self._thread.start()
+        return True
+    
+    def stop(self):
+        """停止采样线程"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+    
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+    
+    def _group_processes(self):
+        """进程组内的 {pid: (CPU时钟数, 内存, 读取字节, 写入字节)}"""
+        processes = {}
+        for name in os.listdir("/proc"):
+            if not name.isdigit():
+                continue
+            stat = _read_stat(name)
+            if stat is None or stat[0] != self.pgid:
+                continue
+            processes[int(name)] = (stat[1], stat[2]) + _read_io(name)
+        return processes
+    
+    def sample(self):
+        """采样一次，返回样本字典"""
+        processes = self._group_processes()
+        now = time.monotonic()
+        
+        # 退出的进程保留最后一次的累计值
+        for pid, (ticks, _, read_bytes, write_bytes) in self._last.items():
+            if pid not in processes:
+                self._gone[0] += ticks
+                self._gone[1] += read_bytes
+                self._gone[2] += write_bytes
+        self._last = processes
+        
+        ticks = self._gone[0] + sum(item[0] for item in processes.values())
+        elapsed = now - self._prev_time
+        cpu = (ticks - self._prev_ticks) / _CLOCK_TICKS / elapsed * 100 if elapsed > 0 else 0.0
+        self._prev_time = now
+        self._prev_ticks = ticks
+        
+        sample = {
+            't': round(now - self._start, 2),
+            'cpu': round(cpu, 1),
+            'rss': sum(item[1] for item in processes.values()),
+            'read': self._gone[1] + sum(item[2] for item in processes.values()),
+            'write': self._gone[2] + sum(item[3] for item in processes.values()),
+            'procs': len(processes)
+        }
+        self.latest = sample
+        self.peak_rss = max(self.peak_rss, sample['rss'])
+        self.peak_cpu = max(self.peak_cpu, sample['cpu'])
+        
+        self._count += 1
+        if self._count % self._stride == 0:
+            self.samples.append(sample)
+            if len(self.samples) > self.max_samples:
+                self.samples = self.samples[::2]
+                self._stride *= 2
+        return sample
+    
+    def summary_line(self):
+        """日志中显示的资源占用摘要"""
+        if self.latest is None:
+            return None
+        duration = self.latest['t']
+        average = self._prev_ticks / _CLOCK_TICKS / duration * 100 if duration > 0 else 0.0
+        return (
+            f"资源占用: 峰值内存 {self.peak_rss / 1024 ** 2:.0f}MB，平均CPU {average:.0f}%（峰值 {self.peak_cpu:.0f}%），"
+            f"读取 {self.latest['read'] / 1024 ** 2:.0f}MB，写入 {self.latest['write'] / 1024 ** 2:.0f}MB"
+        )
+    
+    def report_section(self):
+        """写入构建报告的资源部分"""
+        if self.latest is None:
+            return None
+        return {
+            'interval_s': self.interval * self._stride,
+            'peak_rss': self.peak_rss,
+            'peak_cpu': self.peak_cpu,
+            'read_bytes': self.latest['read'],
+            'write_bytes': self.latest['write'],
+            'samples': self.samples
+        }
@@ -0,0 +1,245 @@
+# spec_cache.py
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+from app_paths import get_app_dir
+from fingerprint import site_packages_mtime
+
+# 只在构建阶段生效的PyInstaller选项（给出.spec时仍可使用）及其是否带参数
+BUILD_OPTIONS = {
+    '--distpath': True,
+    '--workpath': True,
+    '-y': False,
+    '--noconfirm': False,
+    '--upx-dir': True,
+    '--clean': False,
+    '--log-level': True
+}
+# 两个阶段都接受的选项
+SHARED_OPTIONS = {'--log-level'}
+# 由缓存决定、不能从配置传给makespec的选项
+DROPPED_OPTIONS = {'--specpath': True}
+
+# 最多保留的spec数量，超过后删除最久未使用的
+MAX_SPECS = 200
+GENERATE_TIMEOUT = 120
+
+# 在子进程内读取参数文件并调用 pyi-makespec，只生成spec不构建
+MAKESPEC_LAUNCHER = (
+    "import json, sys; from PyInstaller.utils.cliutils.makespec import run; "
+    "sys.argv[1:] = json.load(open(sys.argv[1], encoding='utf-8')); run()"
+)
+
+# 多程序的组合方式
+GROUP_MODES = ('shared', 'merge')
+
+# 多程序spec：分别执行各程序spec中的Analysis部分，再按组合方式执行其余部分
+# shared: 所有程序的COLLECT合并为一个目录，共用同一个 _internal
+# merge: MERGE 后相同的依赖只收集到第一个程序中
+MERGE_TEMPLATE = """# -*- mode: python ; coding: utf-8 -*-
+# 由 AnsPacker 生成的多程序spec
+import os
+from PyInstaller.config import CONF
+
+MODE = %(mode)r
+NAME = %(name)r
+PARTS = %(parts)s
+
+
+def _exec_part(source, spec, namespace):
+    # 各程序spec中的相对路径相对其所在目录
+    specpath = CONF['specpath']
+    CONF['specpath'] = os.path.dirname(spec)
+    try:
+        exec(compile(source, spec, 'exec'), namespace)
+    finally:
+        CONF['specpath'] = specpath
+
+
+def _exe_with_dependencies(analysis):
+    # 单程序spec的EXE不包含MERGE产生的依赖引用
+    def exe(*args, **kwargs):
+        return EXE(*args, analysis.dependencies, **kwargs)
+    return exe
+
+
+_collected = []
+
+
+def _record_collect(*args, **kwargs):
+    # 各程序的COLLECT只记录参数，最后合并为一个
+    _collected.append((args, kwargs))
+
+
+_parts = []
+for _spec, _identifier, _exe in PARTS:
+    with open(_spec, encoding='utf-8') as _f:
+        _analysis, _marker, _rest = _f.read().partition("\\npyz = PYZ(")
+    _namespace = dict(globals(), SPEC=_spec, SPECPATH=os.path.dirname(_spec))
+    _exec_part(_analysis, _spec, _namespace)
+    _parts.append((_spec, _identifier, _exe, _namespace, _marker + _rest))
+
+if MODE == 'merge':
+    MERGE(*[(_namespace['a'], _identifier, _exe) for _spec, _identifier, _exe, _namespace, _rest in _parts])
+
+for _spec, _identifier, _exe, _namespace, _rest in _parts:
+    if MODE == 'merge':
+        _namespace['EXE'] = _exe_with_dependencies(_namespace['a'])
+    else:
+        _namespace['COLLECT'] = _record_collect
+    _exec_part(_rest, _spec, _namespace)
+
+if MODE == 'shared':
+    coll = COLLECT(*[item for args, _ in _collected for item in args], **dict(_collected[0][1], name=NAME))
+"""
+
+
+def split_args(args):
+    """把PyInstaller参数（不含开头的 python -m PyInstaller）拆成 (makespec参数, 构建参数)"""
+    makespec_args = []
+    build_args = []
+    index = 0
+    while index < len(args):
+        arg = args[index]
+        option = arg.split('=', 1)[0]
+        takes_value = '=' not in arg
+        if option in DROPPED_OPTIONS:
+            index += 2 if takes_value and DROPPED_OPTIONS[option] else 1
+            continue
+        if option in BUILD_OPTIONS:
+            count = 2 if takes_value and BUILD_OPTIONS[option] else 1
+            build_args.extend(args[index:index + count])
+            if option in SHARED_OPTIONS:
+                makespec_args.extend(args[index:index + count])
+            index += count
+            continue
+        makespec_args.append(arg)
+        index += 1
+    return makespec_args, build_args
+
+
+def spec_key(makespec_args, cwd=None):
+    """spec的缓存键：makespec参数、解析相对路径的工作目录与PyInstaller安装状态"""
+    data = {
+        'args': list(makespec_args),
+        'cwd': os.path.abspath(cwd or os.getcwd()),
+        'python': sys.executable,
+        # 升级PyInstaller后spec模板可能变化
+        'site_packages': site_packages_mtime()
+    }
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+class SpecCache:
+    """按配置哈希缓存由 pyi-makespec 生成的 .spec 文件
+    
+    每个键一个目录（<键>/<程序名>.spec），之后的构建直接 `pyinstaller <spec>`，
+    跳过参数解析与spec生成；多个spec可以组合为一个用 MERGE 共享依赖的多程序spec。
+    """
+    
+    def __init__(self, root=None, max_specs=MAX_SPECS):
+        self.root = Path(root) if root else get_app_dir("specs")
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_specs = max_specs
+    
+    def spec_path(self, key, name):
+        return self.root / key / f"{name}.spec"
+    
+    def lookup(self, key, name):
+        """已缓存的spec路径，不存在时返回None；命中时刷新目录的使用时间"""
+        path = self.spec_path(key, name)
+        if not path.is_file():
+            return None
+        try:
+            os.utime(path.parent)
+        except OSError:
+            pass
+        return path
+    
+    def generate(self, makespec_args, key, name, cwd=None):
+        """运行 pyi-makespec 生成spec并放入缓存，返回spec路径，失败时抛出RuntimeError
+        
+        先生成到临时目录再改名，并行构建同一配置时不会读到写了一半的spec。
+        """
+        tmp_dir = self.root / f".tmp-{key}-{os.getpid()}-{time.time_ns()}"
+        tmp_dir.mkdir(parents=True)
+        try:
+            args_path = tmp_dir / "makespec-args.json"
+            with open(args_path, 'w', encoding='utf-8') as f:
+                json.dump(list(makespec_args) + ["--specpath", str(tmp_dir)], f, ensure_ascii=False, indent=1)
+            result = subprocess.run(
+                [sys.executable, "-c", MAKESPEC_LAUNCHER, str(args_path)],
+                cwd=cwd,
+                capture_output=True,
+                text=True,
+                encoding='utf-8',
+                errors='backslashreplace',
+                timeout=GENERATE_TIMEOUT
+            )
+            if result.returncode != 0 or not (tmp_dir / f"{name}.spec").is_file():
+                output = (result.stderr or result.stdout).strip().splitlines()
+                raise RuntimeError(output[-1] if output else f"pyi-makespec 返回码 {result.returncode}")
+            # spec中的相对路径相对临时目录生成，与最终目录同级，改名后仍然有效
+            try:
+                os.replace(tmp_dir, self.root / key)
+            except OSError:
+                # 其他进程已经生成了同一个spec
+                if self.lookup(key, name) is None:
+                    raise
+        finally:
+            if tmp_dir.exists():
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.prune()
+        return self.spec_path(key, name)
+    
+    def get_or_generate(self, makespec_args, name, cwd=None):
+        """返回 (spec路径, 是否命中缓存)"""
+        key = spec_key(makespec_args, cwd)
+        path = self.lookup(key, name)
+        if path is not None:
+            return path, True
+        return self.generate(makespec_args, key, name, cwd), False
+    
+    def write_merged(self, parts, name, mode='merge'):
+        """组合多个已缓存的spec为一个多程序spec，返回其路径
+        
+        parts: [(spec路径, 入口脚本名（不含.py）, 产物相对dist的路径)]，
+        目录模式的产物路径为 程序名/程序名，单文件模式为 程序名。
+        mode 为 'merge' 时相同的文件只收集到第一个程序中，之后的程序运行时从它解压（即使是目录模式）；
+        为 'shared' 时各程序（须为目录模式）放在同一个名为 name 的目录中，共用全部依赖。
+        """
+        if mode not in GROUP_MODES:
+            raise ValueError(f"未知的多程序组合方式: {mode}")
+        parts = [(str(Path(spec).resolve()), identifier, exe) for spec, identifier, exe in parts]
+        source = MERGE_TEMPLATE % {
+            'mode': mode,
+            'name': name,
+            'parts': json.dumps(parts, ensure_ascii=False, indent=4)
+        }
+        key = hashlib.sha256(source.encode('utf-8')).hexdigest()[:16]
+        path = self.spec_path(key, name)
+        if self.lookup(key, name) is None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(source)
+            os.replace(tmp_path, path)
+        return path
+    
+    def prune(self):
+        """删除最久未使用的spec目录，保留 max_specs 个"""
+        entries = []
+        for path in self.root.iterdir():
+            if path.is_dir() and not path.name.startswith('.'):
+                try:
+                    entries.append((path.stat().st_mtime, path))
+                except OSError:
+                    pass
+        entries.sort(reverse=True)
+        for _, path in entries[self.max_specs:]:
+            shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,83 @@
+# startup_probe_hook.py
+# PyInstaller运行时钩子：只有启动分析器设置了 ANSPACKER_PROBE_FILE 时才生效，
+# 正常运行产物时仅多一次环境变量读取。
+import os
+
+_probe_file = os.environ.get("ANSPACKER_PROBE_FILE")
+
+if _probe_file:
+    import builtins
+    import json
+    import sys
+    import threading
+    import time
+    
+    _started = time.time()
+    _meipass = getattr(sys, '_MEIPASS', None)
+    _mode = os.environ.get("ANSPACKER_PROBE_MODE", "startup")
+    _imports = []
+    _stack = []
+    _written = []
+    
+    def _extracted():
+        """单文件模式解压目录中最晚写入文件的时间，近似为解压完成的时刻"""
+        if not _meipass or not os.path.basename(_meipass).startswith("_MEI"):
+            return None
+        latest = None
+        for current, _, files in os.walk(_meipass):
+            for name in files:
+                try:
+                    mtime = os.stat(os.path.join(current, name)).st_mtime
+                except OSError:
+                    continue
+                latest = mtime if latest is None else max(latest, mtime)
+        return latest
+    
+    def _write():
+        if _written:
+            return
+        _written.append(True)
+        data = {
+            'pid': os.getpid(),
+            'started': _started,
+            'meipass': _meipass,
+            'extracted': _extracted(),
+            'imports': _imports
+        }
+        with open(_probe_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+    
+    if _mode == "startup":
+        # 只测量到主脚本开始执行为止的启动耗时
+        _write()
+        os._exit(0)
+    
+    # 类似 -X importtime：记录每个首次导入模块的自身与累计耗时（微秒）
+    _original_import = builtins.__import__
+    
+    def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return _original_import(name, globals, locals, fromlist, level)
+        _stack.append(0)
+        start = time.perf_counter()
+        try:
+            return _original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = int((time.perf_counter() - start) * 1e6)
+            children = _stack.pop()
+            _imports.append([name, elapsed - children, elapsed, len(_stack)])
+            if _stack:
+                _stack[-1] += elapsed
+    
+    builtins.__import__ = _timed_import
+    
+    def _stop_later():
+        # 主程序运行一段时间后（导入基本完成）写出结果并退出
+        time.sleep(float(os.environ.get("ANSPACKER_PROBE_SECONDS", "3")))
+        builtins.__import__ = _original_import
+        _write()
+        os._exit(0)
+    
+    import atexit
+    atexit.register(_write)
+    threading.Thread(target=_stop_later, daemon=True).start()
@@ -0,0 +1,168 @@
+# startup_profiler.py
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+# 打包时通过 --runtime-hook 加入产物的探针脚本
+PROBE_HOOK = Path(__file__).resolve().with_name("startup_probe_hook.py")
+
+DEFAULT_RUNS = 5
+# 导入分析时主程序最多运行的秒数（GUI程序不会自行退出）
+IMPORT_PROFILE_SECONDS = 3
+RUN_TIMEOUT = 30
+TOP_IMPORTS = 20
+
+
+def find_executable(artifact, name):
+    """产物中可直接运行的程序：单文件模式为产物本身，目录模式为目录中的同名程序"""
+    artifact = Path(artifact)
+    if artifact.is_file():
+        return artifact
+    for path in (artifact / name, artifact / f"{name}.exe"):
+        if path.is_file():
+            return path
+    return None
+
+
+def _probe_env(sandbox, probe_file, mode):
+    """子进程环境：临时目录指向沙箱（单文件模式解压到这里），去掉PyInstaller的内部变量"""
+    env = {
+        key: value for key, value in os.environ.items()
+        if not key.startswith("_PYI_") and key != "_MEIPASS2"
+    }
+    tmp_dir = str(Path(sandbox) / "tmp")
+    env.update({
+        'TMP': tmp_dir, 'TEMP': tmp_dir, 'TMPDIR': tmp_dir,
+        'ANSPACKER_PROBE_FILE': str(probe_file),
+        'ANSPACKER_PROBE_MODE': mode,
+        'ANSPACKER_PROBE_SECONDS': str(IMPORT_PROFILE_SECONDS)
+    })
+    return env
+
+
+def _launch(executable, sandbox, mode, index):
+    """运行一次产物，返回 (启动时刻, 探针数据或None, 进程总耗时, 返回码)"""
+    probe_file = Path(sandbox) / f"probe-{index}.json"
+    env = _probe_env(sandbox, probe_file, mode)
+    timeout = RUN_TIMEOUT + (IMPORT_PROFILE_SECONDS if mode == "imports" else 0)
+    
+    launched = time.time()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [str(executable)], cwd=sandbox, env=env,
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        return_code = process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        return_code = process.wait()
+    elapsed = time.perf_counter() - start
+    
+    try:
+        with open(probe_file, 'r', encoding='utf-8') as f:
+            probe = json.load(f)
+    except (OSError, ValueError):
+        probe = None
+    return launched, probe, elapsed, return_code
+
+
+def _extract_time(probe, launched):
+    """单文件模式的解压耗时：解压目录中最晚写入的文件距启动的时间"""
+    meipass = probe.get('meipass')
+    if not meipass or not Path(meipass).name.startswith("_MEI"):
+        return None
+    extracted = probe.get('extracted')
+    if extracted is None or extracted < launched:
+        return None
+    return extracted - launched
+
+
+def _merge_imports(records):
+    """汇总导入记录 [模块, 自身微秒, 累计微秒, 嵌套深度]，按累计耗时排序"""
+    imports = [
+        {'module': name, 'self_ms': self_us / 1000, 'cumulative_ms': cumulative_us / 1000, 'depth': depth}
+        for name, self_us, cumulative_us, depth in records
+    ]
+    imports.sort(key=lambda item: item['cumulative_ms'], reverse=True)
+    return imports
+
+
+def profile_startup(executable, runs=DEFAULT_RUNS, profile_imports=True):
+    """在临时沙箱目录中多次启动产物，测量冷/热启动耗时、单文件解压耗时与导入耗时
+    
+    首次运行记为冷启动，其余为热启动；启动耗时为进程创建到主脚本即将执行的时间
+    （由打包时加入的探针钩子记录，探针随即退出进程，不运行主程序）。
+    导入分析另外运行一次主程序，IMPORT_PROFILE_SECONDS 秒后由探针结束进程。
+    """
+    sandbox = tempfile.mkdtemp(prefix="anspacker-startup-")
+    (Path(sandbox) / "tmp").mkdir()
+    try:
+        samples = []
+        for index in range(max(runs, 1)):
+            launched, probe, elapsed, return_code = _launch(executable, sandbox, "startup", index)
+            if probe is None:
+                samples.append({'phase': 'cold' if index == 0 else 'warm', 'ok': False, 'return_code': return_code})
+                continue
+            extract = _extract_time(probe, launched)
+            samples.append({
+                'phase': 'cold' if index == 0 else 'warm',
+                'ok': True,
+                'startup_ms': round((probe['started'] - launched) * 1000, 1),
+                'process_ms': round(elapsed * 1000, 1),
+                'extract_ms': round(extract * 1000, 1) if extract is not None else None
+            })
+        
+        imports = []
+        if profile_imports:
+            _, probe, _, _ = _launch(executable, sandbox, "imports", "imports")
+            if probe is not None:
+                imports = _merge_imports(probe.get('imports', []))
+    finally:
+        shutil.rmtree(sandbox, ignore_errors=True)
+    
+    ok = [sample for sample in samples if sample['ok']]
+    warm = [sample['startup_ms'] for sample in ok if sample['phase'] == 'warm']
+    extracts = [sample['extract_ms'] for sample in ok if sample['extract_ms'] is not None]
+    return {
+        'executable': str(executable),
+        'platform': platform.system(),
+        'runs': samples,
+        'cold_ms': ok[0]['startup_ms'] if ok and ok[0]['phase'] == 'cold' else None,
+        'warm_median_ms': round(statistics.median(warm), 1) if warm else None,
+        'extract_median_ms': round(statistics.median(extracts), 1) if extracts else None,
+        'import_total_ms': round(sum(item['self_ms'] for item in imports), 1),
+        'imports_profiled': len(imports),
+        'slowest_imports': imports[:TOP_IMPORTS]
+    }
+
+
+def summary_lines(result, limit=10):
+    """日志中显示的启动分析摘要"""
+    def fmt(value):
+        return f"{value:.0f}ms" if value is not None else "-"
+    
+    failed = sum(1 for sample in result['runs'] if not sample['ok'])
+    lines = [
+        f"启动耗时: 冷启动 {fmt(result['cold_ms'])}，热启动中位数 {fmt(result['warm_median_ms'])}"
+        f"（共 {len(result['runs'])} 次）"
+    ]
+    if result['extract_median_ms'] is not None:
+        lines.append(f"单文件解压耗时中位数: {fmt(result['extract_median_ms'])}")
+    if failed:
+        lines.append(f"{failed} 次运行没有得到探针数据（程序启动失败或未包含探针钩子）")
+    if result['slowest_imports']:
+        lines.append(
+            f"主程序导入: {result['imports_profiled']} 个模块，合计 {fmt(result['import_total_ms'])}，最慢的导入:"
+        )
+        for item in result['slowest_imports'][:limit]:
+            lines.append(
+                f"  {item['cumulative_ms']:>8.1f}ms  (自身 {item['self_ms']:>7.1f}ms)  {item['module']}"
+            )
+    return lines
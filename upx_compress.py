@@ -0,0 +1,283 @@
+# upx_compress.py
+import fnmatch
+import hashlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from app_paths import get_app_dir
+from bundle_analyzer import BINARY_PATTERN
+from fingerprint import hash_file
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+DEFAULT_MAX_BYTES = 1024 ** 3
+
+# 压缩后无法加载或会被系统拒绝的常见库；PyInstaller自身的自动排除规则见 auto_excluded
+DEFAULT_EXCLUDES = (
+    "vcruntime*.dll", "msvcp*.dll", "ucrtbase.dll", "api-ms-win-*.dll",
+    "python3*.dll", "qwindows.dll", "libpython*", "ld-linux*", "libc.so*"
+)
+
+
+def find_upx(upx_dir=None):
+    """查找upx可执行文件：优先使用指定目录（与PyInstaller的 --upx-dir 一致），其次PATH"""
+    if upx_dir:
+        return shutil.which("upx", path=upx_dir)
+    return shutil.which("upx")
+
+
+def upx_version(upx):
+    """upx版本号，作为缓存键的一部分"""
+    try:
+        output = subprocess.run([upx, "--version"], capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return output.splitlines()[0].strip() if output else None
+
+
+def auto_excluded(path):
+    """PyInstaller自身也不会用UPX处理的文件（规则与 PyInstaller.building.utils.process_collected_binary 一致）
+    
+    Qt插件（压缩会去掉插件加载器需要的元数据）、Windows下启用了CFG的库、
+    Linux下带有 .hmac/.chk 签名文件的库（如libcrypto的FIPS模块）。
+    """
+    system = platform.system()
+    if system == "Linux" and (
+        path.with_name(f".{path.name}.hmac").is_file() or path.with_suffix(".chk").is_file()
+    ):
+        return True
+    if system == "Windows":
+        from PyInstaller.utils.win32.versioninfo import pefile_check_control_flow_guard
+        if pefile_check_control_flow_guard(str(path)):
+            return True
+    from PyInstaller.utils.misc import is_file_qt_plugin
+    try:
+        return is_file_qt_plugin(str(path))
+    except OSError:
+        return True
+
+
+def find_binaries(root, exe_path=None, excludes=()):
+    """onedir输出中可压缩的动态库（主程序本身带有归档，不能压缩）
+    
+    excludes 与PyInstaller的 --upx-exclude 相同，按 PurePath.match 从右向左匹配路径。
+    """
+    patterns = [pattern.lower() for pattern in DEFAULT_EXCLUDES]
+    binaries = []
+    for current, _, files in os.walk(root):
+        for name in files:
+            path = Path(current) / name
+            if path == exe_path or path.is_symlink() or not BINARY_PATTERN.search(name):
+                continue
+            if name.endswith(('.hmac', '.chk')):
+                continue
+            if any(fnmatch.fnmatch(name.lower(), pattern) for pattern in patterns):
+                continue
+            if any(path.match(pattern) for pattern in excludes) or auto_excluded(path):
+                continue
+            binaries.append(path)
+    return sorted(binaries)
+
+
+def _run_upx(upx, args, src, dst):
+    """在子进程中压缩单个文件，结果写到dst；返回是否成功且确实变小"""
+    try:
+        result = subprocess.run(
+            [upx, *args, "-o", str(dst), str(src)],
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors='replace'
+        )
+    except OSError:
+        return False
+    return result.returncode == 0 and dst.is_file() and dst.stat().st_size < src.stat().st_size
+
+
+@contextmanager
+def _file_lock(path):
+    """跨进程的排他锁（多个AnsPacker进程共用同一个缓存目录）"""
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class UpxCache:
+    """按文件内容哈希缓存UPX压缩结果，不可压缩的文件同样记录，避免重复尝试"""
+    
+    def __init__(self, root=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = Path(root) if root else get_app_dir("upx-cache")
+        self.objects_dir = self.root / "objects"
+        self.index_path = self.root / "index.json"
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self._index = self._load_index()
+    
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def save(self):
+        """与磁盘上的索引（其他进程可能已写入新条目）合并后写回，并按最近使用时间淘汰超出上限的条目"""
+        with self._lock, _file_lock(self.root / "index.lock"):
+            for key, entry in self._load_index().items():
+                current = self._index.get(key)
+                if current is None or current['last_used'] < entry['last_used']:
+                    self._index[key] = entry
+            
+            total = sum(entry['size'] for entry in self._index.values())
+            for key, entry in sorted(self._index.items(), key=lambda item: item[1]['last_used']):
+                if total <= self.max_bytes:
+                    break
+                if entry['size']:
+                    self.object_path(key).unlink(missing_ok=True)
+                    total -= entry['size']
+                del self._index[key]
+            
+            tmp_path = self.index_path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, self.index_path)
+    
+    def object_path(self, key):
+        return self.objects_dir / key[:2] / key
+    
+    def lookup(self, key):
+        """返回 (是否命中, 压缩结果路径或None)；None表示该文件不值得压缩"""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return False, None
+            path = self.object_path(key) if entry['size'] else None
+            if path is not None and not path.is_file():
+                del self._index[key]
+                return False, None
+            entry['last_used'] = time.time()
+            return True, path
+    
+    def store(self, key, compressed_path):
+        """记录压缩结果；compressed_path为None表示不可压缩"""
+        size = 0
+        if compressed_path is not None:
+            target = self.object_path(key)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            # 先复制到唯一的临时文件再改名，同时写入同一个键时不会读到写了一半的文件
+            fd, tmp_name = tempfile.mkstemp(dir=target.parent, prefix=f".{key[:16]}-")
+            os.close(fd)
+            shutil.copy2(compressed_path, tmp_name)
+            os.replace(tmp_name, target)
+            size = target.stat().st_size
+        with self._lock:
+            self._index[key] = {'size': size, 'last_used': time.time()}
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_upx_cache():
+    """进程内共享的缓存实例，并行任务使用同一个索引与同一把锁"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = UpxCache()
+        return _shared_cache
+
+
+def _replace_file(path, source):
+    """用source的副本替换path（新inode，不原地修改可能与构建缓存共享的硬链接）"""
+    tmp_path = path.with_name(path.name + ".anspacker-tmp")
+    shutil.copy2(source, tmp_path)
+    shutil.copymode(path, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _compress_one(path, upx, args, cache, cache_prefix, tmp_dir):
+    """压缩单个文件，返回 (原大小, 新大小, 是否命中缓存)"""
+    original_size = path.stat().st_size
+    key = hash_file(path)
+    key = f"{cache_prefix}-{key}" if cache_prefix else key
+    hit, cached = cache.lookup(key)
+    if hit:
+        if cached is None:
+            return original_size, original_size, True
+        _replace_file(path, cached)
+        return original_size, cached.stat().st_size, True
+    
+    # 每次调用使用独立的临时目录：同一构建中的相同库或并行任务压缩同一个库时互不干扰
+    work_dir = Path(tempfile.mkdtemp(dir=tmp_dir))
+    try:
+        output = work_dir / path.name
+        if _run_upx(upx, args, path, output):
+            cache.store(key, output)
+            _replace_file(path, output)
+            new_size = output.stat().st_size
+        else:
+            cache.store(key, None)
+            new_size = original_size
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return original_size, new_size, False
+
+
+def compress_binaries(root, upx, exe_path=None, args=("-q",), excludes=(), max_workers=None, cache=None):
+    """并行压缩onedir输出中的动态库，返回统计字典
+    
+    每个文件由一个upx子进程处理，线程池只负责调度这些子进程，
+    因此无需在（可能带有Tk的）主进程中再派生Python工作进程。
+    """
+    start = time.perf_counter()
+    cache = cache or get_upx_cache()
+    binaries = find_binaries(root, exe_path, excludes)
+    args = list(args)
+    # 缓存键包含upx版本与参数，升级upx或改变参数后重新压缩
+    cache_prefix = hashlib.sha256(f"{upx_version(upx)}|{' '.join(args)}".encode('utf-8')).hexdigest()[:12]
+    stats = {'files': len(binaries), 'compressed': 0, 'cache_hits': 0, 'before': 0, 'after': 0}
+    
+    tmp_dir = cache.root / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as executor:
+        futures = [
+            executor.submit(_compress_one, path, upx, args, cache, cache_prefix, tmp_dir)
+            for path in binaries
+        ]
+        for future in futures:
+            before, after, hit = future.result()
+            stats['before'] += before
+            stats['after'] += after
+            stats['compressed'] += after < before
+            stats['cache_hits'] += hit
+    cache.save()
+    
+    stats['saved'] = stats['before'] - stats['after']
+    stats['elapsed'] = time.perf_counter() - start
+    return stats
+
+
+def supported_platform():
+    """macOS下UPX会破坏代码签名，不做压缩"""
+    return platform.system() != "Darwin"